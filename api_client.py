@@ -1,46 +1,588 @@
+import asyncio
 import logging
 import json
-from urllib.request import urlopen
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.error import HTTPError
 
-from utils import CITIES, ERR_MESSAGE_TEMPLATE
+from cache import CacheEntry, ResponseCache
+from metrics import run_metrics
+from resilience import AdaptiveConcurrencyLimiter, CircuitBreaker, RequestSlotTimeoutError, RetryPolicy
+from city_registry import get_city_registry
+from utils import ERR_MESSAGE_TEMPLATE
+
+if TYPE_CHECKING:
+    import ssl
 
 logger = logging.getLogger()
 
+HostKey = Tuple[str, str, int]
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+RETRYABLE_STATUSES = {408, 429}
+
+ResponseParser = Callable[[bytes], Dict]
+
+
+def parse_json(body: bytes) -> Dict:
+    return json.loads(body.decode("utf-8"))
+
+
+def parse_downloaded(response_parser: ResponseParser, body: bytes) -> Dict:
+    """Разбор загруженного тела ответа, его размер и время разбора учитываются в run_metrics."""
+    run_metrics.increment("downloaded_bytes", len(body))
+    started = time.perf_counter()
+    resp = response_parser(body)
+    run_metrics.observe("parse_seconds", time.perf_counter() - started)
+    return resp
+
+
+class ApiRequestError(Exception):
+    """
+    Ошибка запроса. reason - исходная причина,
+    retryable - имеет ли смысл повторять запрос
+    """
+
+    def __init__(self, reason: str, retryable: bool = True) -> None:
+        super().__init__(f"{ERR_MESSAGE_TEMPLATE} {reason}")
+        self.reason = reason
+        self.retryable = retryable
+
+    @classmethod
+    def from_exception(cls, ex: BaseException) -> "ApiRequestError":
+        if isinstance(ex, ApiRequestError):
+            return ex
+        if isinstance(ex, HTTPError):
+            return cls.from_status(ex.code, ex.reason)
+        if isinstance(
+            ex, (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+        ):
+            return cls(repr(ex))
+        return cls(repr(ex), retryable=False)
+
+    @classmethod
+    def from_status(cls, status: int, reason: str) -> "ApiRequestError":
+        return cls(
+            "Error during execute request. {}: {}".format(status, reason),
+            retryable=status in RETRYABLE_STATUSES or status >= 500,
+        )
+
 
 class YandexWeatherAPI:
     """
-    Base class for requests
+    Базовый класс запросов к API
     """
 
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        response_parser: Optional[ResponseParser] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ) -> None:
+        self.cache = cache
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.response_parser = response_parser or parse_json
+        self.concurrency_limiter = concurrency_limiter
+
     @staticmethod
-    def _do_req(url):
-        """Base request method"""
+    def _do_req(
+        url,
+        timeout: Optional[float] = None,
+        response_parser: ResponseParser = parse_json,
+    ):
+        """Базовый метод запроса"""
+        from urllib.request import urlopen
+
         try:
-            with urlopen(url) as req:
-                resp = req.read().decode("utf-8")
-                resp = json.loads(resp)
+            with urlopen(url, timeout=timeout) as req:
+                resp = parse_downloaded(response_parser, req.read())
             if req.status != 200:
-                raise Exception(
-                    "Error during execute request. {}: {}".format(
-                        resp.status, resp.reason
-                    )
-                )
+                raise ApiRequestError.from_status(req.status, req.reason)
             return resp
         except Exception as ex:
             logger.error(ex)
-            raise Exception(ERR_MESSAGE_TEMPLATE)
+            raise ApiRequestError.from_exception(ex)
+
+    def _do_cached_req(
+        self, url: str, timeout: Optional[float] = None, entry: Optional[CacheEntry] = None
+    ) -> Dict:
+        """
+        Запрос с кэшем, когда свежей записи нет: устаревшая запись entry
+        проверяется по ETag/Last-Modified (ответ 304 продлевает ее), иначе
+        ответ загружается и сохраняется в кэш
+        """
+        from urllib.request import Request, urlopen
+
+        cache = self.cache
+        started = time.perf_counter()
+        try:
+            request = Request(url, headers=cache.conditional_headers(entry))
+            try:
+                with urlopen(request, timeout=timeout) as req:
+                    body = req.read()
+                    etag = req.headers.get("ETag")
+                    last_modified = req.headers.get("Last-Modified")
+            except HTTPError as http_error:
+                if http_error.code != 304 or entry is None:
+                    raise
+                cache.touch(url)
+                cache.record_revalidation(time.perf_counter() - started)
+                return self.response_parser(entry.body)
+            resp = parse_downloaded(self.response_parser, body)
+        except Exception as ex:
+            logger.error(ex)
+            raise ApiRequestError.from_exception(ex)
+        cache.set(url, body, etag, last_modified)
+        cache.record_miss(time.perf_counter() - started)
+        return resp
+
+    def _do_req_with_retries(
+        self, url: str, deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        Запрос с повторами, circuit breaker и ограничением одновременных запросов.
+        Свежая запись кэша отдается без сети, даже если цепь хоста разомкнута.
+        deadline - значение time.monotonic(), после которого попытки не делаются
+        """
+        host = urlsplit(url).netloc
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_hit()
+            return self.response_parser(entry.body)
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                with breaker_attempt(self.circuit_breaker, host):
+                    timeout = request_timeout(self.timeout, deadline)
+                    with limited_request(self.concurrency_limiter, deadline):
+                        if self.cache is not None:
+                            resp = self._do_cached_req(url, timeout, entry)
+                        else:
+                            resp = self._do_req(url, timeout, self.response_parser)
+            except ApiRequestError as error:
+                delay = self.retry_policy.backoff(attempt)
+                if (
+                    not error.retryable
+                    or attempt == self.retry_policy.attempts
+                    or not has_time_for(delay, deadline)
+                ):
+                    raise
+                logger.warning(
+                    "Retry %s for %s in %.2fs: %s", attempt, url, delay, error.reason
+                )
+                time.sleep(delay)
+            else:
+                return resp
+        raise AssertionError("RetryPolicy.attempts must be positive")
 
     @staticmethod
     def _get_url_by_city_name(city_name: str) -> str:
-        try:
-            return CITIES[city_name]
-        except KeyError:
-            raise Exception("Please check that city {} exists".format(city_name))
+        """url города из реестра; города нет в реестре - city_registry.UnknownCityError"""
+        return get_city_registry().url_for(city_name)
 
-    def get_forecasting(self, city_name: str):
+    def resolve_cities(self, city_names: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Пакетный поиск городов перед загрузкой: основные названия известных
+        реестру городов (без повторов) и названия, которых в реестре нет
         """
-        :param city_name: key as str
-        :return: response data as json
+        known, unknown = get_city_registry().split_known(city_names)
+        return list(known), unknown
+
+    def get_forecasting(self, city_name: str, deadline: Optional[float] = None):
+        """
+        :param city_name: название города
+        :param deadline: значение time.monotonic(), после которого повторы прекращаются
+        :return: данные ответа в виде json
         """
         city_url = self._get_url_by_city_name(city_name)
-        return self._do_req(city_url)
+        return self._do_req_with_retries(city_url, deadline)
+
+
+def request_timeout(
+    timeout: Optional[float], deadline: Optional[float]
+) -> Optional[float]:
+    """Таймаут запроса с учетом общего дедлайна."""
+    if deadline is None:
+        return timeout
+    remaining = max(deadline - time.monotonic(), 0.001)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def has_time_for(delay: float, deadline: Optional[float]) -> bool:
+    """Успеет ли пауза delay закончиться до дедлайна."""
+    return deadline is None or time.monotonic() + delay < deadline
+
+
+def record_breaker_result(
+    circuit_breaker: Optional[CircuitBreaker],
+    host: str,
+    error: Optional[ApiRequestError],
+) -> None:
+    """Учет ответа хоста в circuit breaker: error - ошибка запроса, None - успешный ответ."""
+    if circuit_breaker is None:
+        return
+    # ответ с неповторяемой ошибкой (например, 404) означает, что хост доступен
+    if error is not None and error.retryable:
+        circuit_breaker.record_failure(host)
+    else:
+        circuit_breaker.record_success(host)
+
+
+@contextmanager
+def breaker_attempt(circuit_breaker: Optional[CircuitBreaker], host: str) -> Iterator[None]:
+    """
+    Одна попытка запроса под circuit breaker: check перед попыткой, затем учет
+    ответа хоста. Попытка без ответа хоста (RequestSlotTimeoutError, отмена
+    asyncio) ничего не учитывает, но возвращает пробную попытку разомкнутого
+    хоста, иначе цепь осталась бы разомкнутой навсегда.
+    """
+    if circuit_breaker is None:
+        yield
+        return
+    is_trial = circuit_breaker.check(host)
+    try:
+        yield
+    except ApiRequestError as error:
+        record_breaker_result(circuit_breaker, host, error)
+        raise
+    except BaseException:
+        if is_trial:
+            circuit_breaker.abort_trial(host)
+        raise
+    record_breaker_result(circuit_breaker, host, None)
+
+
+@contextmanager
+def limited_request(
+    limiter: Optional[AdaptiveConcurrencyLimiter], deadline: Optional[float]
+) -> Iterator[None]:
+    """
+    Одна попытка запроса под адаптивным ограничением одновременных запросов:
+    место ждет не дольше дедлайна, пауза между попытками места не занимает.
+    Место не получено - RequestSlotTimeoutError: это не ApiRequestError, поэтому
+    попытка не повторяется и не учитывается circuit breaker, хост не запрашивался.
+    """
+    if limiter is None:
+        yield
+        return
+    if not limiter.acquire(None if deadline is None else deadline - time.monotonic()):
+        raise RequestSlotTimeoutError("deadline exceeded waiting for a request slot")
+    started = time.monotonic()
+    overloaded = False
+    try:
+        yield
+    except ApiRequestError as error:
+        overloaded = error.retryable
+        raise
+    finally:
+        limiter.release(time.monotonic() - started, overloaded)
+
+
+class AsyncYandexWeatherAPI:
+    """
+    Асинхронный класс запросов. Хранит keep-alive соединения по хостам.
+    С concurrency_limiter количество одновременных запросов подстраивается
+    так же, как в YandexWeatherAPI; без него оно не больше concurrency_limit
+    """
+
+    DEFAULT_PORTS = {"http": 80, "https": 443}
+
+    def __init__(
+        self,
+        concurrency_limit: int = 100,
+        max_idle_per_host: int = 100,
+        cache: Optional[ResponseCache] = None,
+        timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        response_parser: Optional[ResponseParser] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ) -> None:
+        self.concurrency_limit = concurrency_limit
+        self.max_idle_per_host = max_idle_per_host
+        self.cache = cache
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.response_parser = response_parser or parse_json
+        self.concurrency_limiter = concurrency_limiter
+        self._idle_connections: Dict[HostKey, List[Connection]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # запросы, ждущие места в concurrency_limiter, в порядке очереди
+        self._slot_waiters: Deque[asyncio.Future] = deque()
+        self._ssl_context: Optional["ssl.SSLContext"] = None
+
+    async def __aenter__(self) -> "AsyncYandexWeatherAPI":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Закрывает все простаивающие соединения"""
+        for connections in self._idle_connections.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle_connections.clear()
+
+    async def _do_req(
+        self, url: str, timeout: Optional[float] = None, entry: Optional[CacheEntry] = None
+    ) -> Dict:
+        """
+        Базовый асинхронный запрос, когда свежей записи кэша нет. Устаревшая
+        запись entry проверяется по ETag/Last-Modified, как в YandexWeatherAPI
+        """
+        cache = self.cache
+        started = time.perf_counter()
+        try:
+            status, reason, headers, body = await asyncio.wait_for(
+                self._request(url, ResponseCache.conditional_headers(entry)),
+                timeout,
+            )
+            if status == 304 and cache is not None and entry is not None:
+                cache.touch(url)
+                cache.record_revalidation(time.perf_counter() - started)
+                return self.response_parser(entry.body)
+            if status != 200:
+                raise ApiRequestError.from_status(status, reason)
+            resp = parse_downloaded(self.response_parser, body)
+        except Exception as ex:
+            logger.error(ex)
+            raise ApiRequestError.from_exception(ex)
+        if cache is not None:
+            cache.set(url, body, headers.get("etag"), headers.get("last-modified"))
+            cache.record_miss(time.perf_counter() - started)
+        return resp
+
+    async def _request(
+        self, url: str, extra_headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, str, Dict[str, str], bytes]:
+        """Выполняет GET запрос, переиспользуя keep-alive соединение с хостом"""
+        parsed_url = urlsplit(url)
+        host_key = (
+            parsed_url.scheme,
+            parsed_url.hostname or "",
+            parsed_url.port or self.DEFAULT_PORTS[parsed_url.scheme],
+        )
+        path = parsed_url.path or "/"
+        if parsed_url.query:
+            path = f"{path}?{parsed_url.query}"
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parsed_url.netloc}\r\n"
+            "Connection: keep-alive\r\n"
+            "Accept-Encoding: identity\r\n"
+            + "".join(
+                f"{name}: {value}\r\n"
+                for name, value in (extra_headers or {}).items()
+            )
+            + "\r\n"
+        ).encode("latin-1")
+
+        connection, reused = await self._acquire_connection(host_key)
+        try:
+            try:
+                status, reason, headers, body = await self._send(
+                    connection, request
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # сервер мог закрыть простаивающее соединение, пробуем новое
+                connection[1].close()
+                connection = await self._open_connection(host_key)
+                status, reason, headers, body = await self._send(
+                    connection, request
+                )
+        except BaseException:
+            connection[1].close()
+            raise
+
+        if headers.get("connection", "").lower() == "close":
+            connection[1].close()
+        else:
+            self._release_connection(host_key, connection)
+        return status, reason, headers, body
+
+    async def _acquire_connection(
+        self, host_key: HostKey
+    ) -> Tuple[Connection, bool]:
+        idle_connections = self._idle_connections.get(host_key)
+        while idle_connections:
+            reader, writer = idle_connections.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        return await self._open_connection(host_key), False
+
+    async def _open_connection(self, host_key: HostKey) -> Connection:
+        scheme, host, port = host_key
+        if scheme != "https":
+            return await asyncio.open_connection(host, port)
+        if self._ssl_context is None:
+            import ssl
+
+            # контекст загружает сертификаты, поэтому создается один раз на клиент
+            self._ssl_context = ssl.create_default_context()
+        return await asyncio.open_connection(host, port, ssl=self._ssl_context)
+
+    @asynccontextmanager
+    async def _limited_request(self, deadline: Optional[float]) -> AsyncIterator[None]:
+        """
+        Асинхронная версия limited_request. Без concurrency_limiter запросы
+        ограничены семафором на concurrency_limit мест
+        """
+        limiter = self.concurrency_limiter
+        if limiter is None:
+            if self._semaphore is None:
+                # семафор создается внутри event loop, в котором он будет использоваться
+                self._semaphore = asyncio.Semaphore(self.concurrency_limit)
+            async with self._semaphore:
+                yield
+            return
+        await self._acquire_slot(limiter, deadline)
+        started = time.monotonic()
+        overloaded = False
+        try:
+            yield
+        except ApiRequestError as error:
+            overloaded = error.retryable
+            raise
+        finally:
+            limiter.release(time.monotonic() - started, overloaded)
+            self._wake_slot_waiters()
+
+    async def _acquire_slot(self, limiter: AdaptiveConcurrencyLimiter, deadline: Optional[float]) -> None:
+        """
+        Место в limiter без блокировки event loop: limiter.acquire(0) не ждет,
+        а запрос без места ждет в очереди, пока освобождение места не разбудит его
+        """
+        while not limiter.acquire(0):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise RequestSlotTimeoutError("deadline exceeded waiting for a request slot")
+            waiter = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                raise RequestSlotTimeoutError("deadline exceeded waiting for a request slot") from None
+            except BaseException:
+                # разбуженный, но отмененный запрос передает место следующему
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_slot_waiters()
+                raise
+
+    def _wake_slot_waiters(self) -> None:
+        """Будит столько ждущих запросов, сколько в limiter свободных мест."""
+        available = self.concurrency_limiter.available
+        while available > 0 and self._slot_waiters:
+            waiter = self._slot_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def _release_connection(
+        self, host_key: HostKey, connection: Connection
+    ) -> None:
+        idle_connections = self._idle_connections.setdefault(host_key, [])
+        if len(idle_connections) < self.max_idle_per_host:
+            idle_connections.append(connection)
+        else:
+            connection[1].close()
+
+    @classmethod
+    async def _send(
+        cls, connection: Connection, request: bytes
+    ) -> Tuple[int, str, Dict[str, str], bytes]:
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by remote host")
+        _, status, *reason = status_line.decode("latin-1").split(None, 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if int(status) in (204, 304) or int(status) < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await cls._read_chunked(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+        return int(status), " ".join(reason).strip(), headers, body
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # пропускаем trailer-заголовки
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def get_forecasting(
+        self, city_name: str, deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        :param city_name: название города
+        :param deadline: значение time.monotonic(), после которого повторы прекращаются
+        :return: данные ответа в виде json
+        """
+        city_url = YandexWeatherAPI._get_url_by_city_name(city_name)
+        return await self._do_req_with_retries(city_url, deadline)
+
+    async def _do_req_with_retries(
+        self, url: str, deadline: Optional[float] = None
+    ) -> Dict:
+        """Асинхронная версия YandexWeatherAPI._do_req_with_retries"""
+        host = urlsplit(url).netloc
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_hit()
+            return self.response_parser(entry.body)
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                # отмена по дедлайну (CancelledError) проходит через breaker_attempt
+                # и возвращает пробную попытку разомкнутого хоста
+                with breaker_attempt(self.circuit_breaker, host):
+                    async with self._limited_request(deadline):
+                        timeout = request_timeout(self.timeout, deadline)
+                        resp = await self._do_req(url, timeout, entry)
+            except ApiRequestError as error:
+                delay = self.retry_policy.backoff(attempt)
+                if (
+                    not error.retryable
+                    or attempt == self.retry_policy.attempts
+                    or not has_time_for(delay, deadline)
+                ):
+                    raise
+                logger.warning(
+                    "Retry %s for %s in %.2fs: %s", attempt, url, delay, error.reason
+                )
+                await asyncio.sleep(delay)
+            else:
+                return resp
+        raise AssertionError("RetryPolicy.attempts must be positive")
@@ -0,0 +1,91 @@
+"""
+Запись csv таблицы прежним способом (открытие файла и блокировка на каждую
+строку в пуле потоков) против одного буферизированного потока-писателя
+(DataAggregationTask.save_data_to_csv).
+
+Прежний способ не гарантирует порядок строк, поэтому сравнивается только
+состав строк, а не содержимое файлов побайтно.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_aggregation --cities 100000 --days 5
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from models import CalculatedCityWeatherDataModel, CityDayWeatherModel
+from output_writers import city_rows, table_headers
+from tasks import DataAggregationTask
+
+
+def make_calculated_cities(cities_count: int, days_count: int):
+    return [
+        CalculatedCityWeatherDataModel.construct(
+            city_name=f"CITY_{city_index}",
+            days=[
+                CityDayWeatherModel.construct(
+                    date=f"2022-05-{day_index + 10}",
+                    average_temp=(city_index + day_index) % 40 / 3,
+                    good_weather_hours=(city_index + day_index) % 11,
+                )
+                for day_index in range(days_count)
+            ],
+            total_average_temp=city_index % 40 / 3,
+            total_average_good_weather_hours=city_index % 11,
+            rating=city_index + 1,
+        )
+        for city_index in range(cities_count)
+    ]
+
+
+def save_per_row(task: DataAggregationTask, file_name: str) -> None:
+    """Прежняя реализация: каждая строка открывает файл в режиме 'a' под общей блокировкой."""
+    locker = Lock()
+
+    def write_row(row):
+        with open(file_name, "a") as file:
+            with locker:
+                csv.writer(file, quoting=csv.QUOTE_NONNUMERIC).writerow(row)
+
+    with open(file_name, "w") as file:
+        csv.writer(file, quoting=csv.QUOTE_NONNUMERIC).writerow(
+            table_headers([city_day.date for city_day in task.data[0].days])
+        )
+    rows = [row for city in task.data for row in city_rows(city)]
+    with ThreadPoolExecutor() as pool:
+        for row in rows:
+            pool.submit(write_row, row)
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    task = DataAggregationTask(make_calculated_cities(cities_count, days_count))
+    with tempfile.TemporaryDirectory() as directory:
+        per_row_file = os.path.join(directory, "per_row.csv")
+        buffered_file = os.path.join(directory, "buffered.csv")
+
+        started = time.perf_counter()
+        save_per_row(task, per_row_file)
+        per_row_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        task.save_data_to_csv(buffered_file)
+        buffered_time = time.perf_counter() - started
+
+        with open(per_row_file) as per_row, open(buffered_file) as buffered:
+            assert sorted(per_row) == sorted(buffered), "Состав строк не совпадает"
+
+    print(f"cities={cities_count} days={days_count} rows={cities_count * 2}")
+    print(f"per-row open + lock: {per_row_time:.3f}s")
+    print(f"single writer:       {buffered_time:.3f}s ({per_row_time / buffered_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
@@ -0,0 +1,49 @@
+"""
+Полная сортировка с рейтингом (DataAnalyzingTask.analyze_data) против
+отбора k лучших городов через кучу (DataAnalyzingTask.get_top_cities).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_analyzing --cities 300000 --top 10
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from models import CalculatedCityWeatherDataModel
+from tasks import DataAnalyzingTask
+
+
+def make_cities(cities_count: int):
+    return [
+        CalculatedCityWeatherDataModel.construct(
+            city_name=f"CITY_{index}",
+            days=[],
+            total_average_temp=round(random.uniform(-20, 40), 1),
+            total_average_good_weather_hours=round(random.uniform(0, 11), 1),
+            rating=None,
+        )
+        for index in range(cities_count)
+    ]
+
+
+def measure(name: str, method) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    method()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name}: {elapsed:.3f}s, peak {peak / 1024 / 1024:.1f}MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=300_000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    cities = make_cities(args.cities)
+    print(f"cities={args.cities} top={args.top}")
+    measure("full sort + rating", lambda: DataAnalyzingTask(cities).analyze_data())
+    measure("full dense ranking", lambda: DataAnalyzingTask(cities).analyze_data(dense_ranking=True))
+    measure(f"top-{args.top} heap      ", lambda: DataAnalyzingTask(cities).get_top_cities(args.top))
@@ -0,0 +1,77 @@
+"""
+Просчет в текущем процессе против общего пула процессов с компактной
+передачей данных пачками, а также прежний способ: новый пул на каждый
+запуск и pickle связанного метода вместе со всеми моделями.
+По результатам видно, с какого количества городов пул окупается
+(CALCULATION_INPROCESS_THRESHOLD в config.py).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_calculation --sizes 10 50 100 200 500 1000 5000
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from benchmarks.bench_columnar import make_city_forecasts
+from calculation import calculate_chunk, to_payload, worker_pool
+from models import CityWeatherDataModel
+from tasks import DataCalculationTask
+
+# прежний способ квадратичен по количеству городов, большие наборы пропускаем
+LEGACY_MAX_CITIES = 100
+
+
+def in_process(calc_data_service: DataCalculationTask) -> list:
+    payloads = [to_payload(city) for city in calc_data_service.cities_forecasts]
+    return calculate_chunk(payloads, calc_data_service.MIN_HOUR, calc_data_service.MAX_HOUR)
+
+
+def pooled(calc_data_service: DataCalculationTask) -> list:
+    payloads = [to_payload(city) for city in calc_data_service.cities_forecasts]
+    chunk_size = DataCalculationTask._get_chunk_size(len(payloads))
+    chunks = [payloads[start:start + chunk_size] for start in range(0, len(payloads), chunk_size)]
+    return [
+        city
+        for chunk in worker_pool.executor.map(
+            calculate_chunk, chunks, repeat(calc_data_service.MIN_HOUR), repeat(calc_data_service.MAX_HOUR)
+        )
+        for city in chunk
+    ]
+
+
+def legacy(calc_data_service: DataCalculationTask) -> list:
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(calc_data_service._calculate_data, calc_data_service.cities_forecasts))
+
+
+def measure(method, calc_data_service: DataCalculationTask) -> float:
+    started = time.perf_counter()
+    method(calc_data_service)
+    return time.perf_counter() - started
+
+
+def run_benchmark(sizes) -> None:
+    cities_forecasts = [
+        CityWeatherDataModel(**city.__dict__) for city in make_city_forecasts(max(sizes), days_count=7)
+    ]
+    # прогрев пула: в долгоживущем процессе он уже запущен
+    pooled(DataCalculationTask(cities_forecasts[:1]))
+
+    print(f"{'cities':>8} {'in-process':>11} {'pool':>8} {'legacy':>8}")
+    for size in sizes:
+        calc_data_service = DataCalculationTask(cities_forecasts[:size])
+        assert in_process(calc_data_service) == pooled(calc_data_service), "Результаты просчета не совпадают"
+        in_process_time = measure(in_process, calc_data_service)
+        pooled_time = measure(pooled, calc_data_service)
+        legacy_time = (
+            f"{measure(legacy, calc_data_service):7.3f}s" if size <= LEGACY_MAX_CITIES else f"{'-':>8}"
+        )
+        print(f"{size:>8} {in_process_time:10.3f}s {pooled_time:7.3f}s {legacy_time}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 500, 1000, 5000])
+    args = parser.parse_args()
+    run_benchmark(args.sizes)
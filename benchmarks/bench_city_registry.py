@@ -0,0 +1,92 @@
+"""
+Реестр городов (city_registry.py) на --entries городах: время загрузки
+файла CSV и JSON при первом обращении, память реестра (tracemalloc)
+и время пакетного поиска всех городов по основным названиям
+в другом регистре и по альтернативным названиям.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_city_registry --entries 100000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from city_registry import CityRegistry
+
+FIELDS = ("name", "url", "latitude", "longitude", "aliases")
+
+
+def generate_entries(entries_count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"CITY_{index}",
+            "url": f"https://example.com/forecasts/city-{index}-response.json",
+            "latitude": round(rng.uniform(-90, 90), 4),
+            "longitude": round(rng.uniform(-180, 180), 4),
+            "aliases": [f"Город {index}", f"city-{index}"],
+        }
+        for index in range(entries_count)
+    ]
+
+
+def write_files(entries: List[Dict], directory: str) -> Dict[str, str]:
+    csv_file = os.path.join(directory, "cities.csv")
+    with open(csv_file, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, FIELDS)
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow({**entry, "aliases": "|".join(entry["aliases"])})
+    json_file = os.path.join(directory, "cities.json")
+    with open(json_file, "w", encoding="utf-8") as file:
+        json.dump(entries, file, ensure_ascii=False)
+    return {"csv": csv_file, "json": json_file}
+
+
+def run_benchmark(entries_count: int) -> None:
+    entries = generate_entries(entries_count)
+    queries = {
+        "names": [entry["name"] for entry in entries],
+        "lowercase": [entry["name"].lower() for entry in entries],
+        "aliases": [entry["aliases"][0].upper() for entry in entries],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format, file_name in write_files(entries, directory).items():
+            size = os.path.getsize(file_name) / 1024 / 1024
+            started = time.perf_counter()
+            registry = CityRegistry(file_name)
+            cities_count = len(registry)
+            load_seconds = time.perf_counter() - started
+            assert cities_count == entries_count, "Загружены не все города"
+            # память - отдельной загрузкой: tracemalloc замедляет загрузку в разы
+            tracemalloc.start()
+            measured_registry = CityRegistry(file_name)
+            len(measured_registry)
+            memory, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{file_format:>4} {size:.1f}MiB: load {load_seconds:.3f}s, "
+                f"registry {memory / 1024 / 1024:.1f}MiB (peak {peak / 1024 / 1024:.1f}MiB)"
+            )
+            for query_name, names in queries.items():
+                started = time.perf_counter()
+                urls = registry.resolve(names)
+                elapsed = time.perf_counter() - started
+                assert len(urls) == entries_count, "Найдены не все города"
+                print(
+                    f"     resolve {query_name:>9}: {elapsed:.3f}s "
+                    f"({elapsed / entries_count * 1e6:.2f}us per city)"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+    run_benchmark(args.entries)
@@ -0,0 +1,104 @@
+"""
+Просчет данных циклами Python (DataCalculationTask._calculate_data) против
+векторизованного просчета над колоночным представлением (columnar.py).
+
+Сначала сравнивается только сам просчет, без пула процессов. Затем - этап
+просчета целиком, как в forecast_weather: DataCalculationTask.get_calculated_data
+(пул процессов) против get_calculated_data_vectorized (forecast_weather(vectorized=True)),
+включая перевод в колоночное представление и построение записей результата.
+Оба сравнения - над записями CityForecastRecord, как после этапа загрузки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_columnar --cities 10000 --days 7
+"""
+import argparse
+import random
+import time
+
+from calculation import worker_pool
+from columnar import ColumnarForecasts, calculate_columnar
+from config import WEATHER_CONDITIONS
+from models import CalculatedCityWeatherDataModel, CityWeatherDataModel
+from records import CityForecastRecord
+from tasks import DataCalculationTask
+
+
+def make_city_forecasts(cities_count: int, days_count: int):
+    conditions = sorted(WEATHER_CONDITIONS)
+    return [
+        CityWeatherDataModel.construct(
+            city_name=f"CITY_{city_index}",
+            forecasts=[
+                {
+                    "date": f"2022-05-{day_index + 10}",
+                    "hours": [
+                        {"hour": hour, "temp": random.randint(-30, 40), "condition": random.choice(conditions)}
+                        for hour in range(24)
+                    ],
+                }
+                for day_index in range(days_count)
+            ],
+        )
+        for city_index in range(cities_count)
+    ]
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    # записи CityForecastRecord, как после этапа загрузки forecast_weather
+    cities_forecasts = [
+        CityForecastRecord.from_model(CityWeatherDataModel(**city.__dict__))
+        for city in make_city_forecasts(cities_count, days_count)
+    ]
+    calc_data_service = DataCalculationTask(cities_forecasts)
+
+    started = time.perf_counter()
+    python_raw_result = [calc_data_service._calculate_data(city) for city in cities_forecasts]
+    python_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    forecasts = ColumnarForecasts.from_models(cities_forecasts)
+    convert_time = time.perf_counter() - started
+    started = time.perf_counter()
+    vectorized_raw_result = calculate_columnar(
+        forecasts, DataCalculationTask.MIN_HOUR, DataCalculationTask.MAX_HOUR
+    )
+    calculate_time = time.perf_counter() - started
+
+    # построение моделей результата одинаково для обоих способов
+    started = time.perf_counter()
+    vectorized_result = [CalculatedCityWeatherDataModel(**city) for city in vectorized_raw_result]
+    models_time = time.perf_counter() - started
+
+    assert [CalculatedCityWeatherDataModel(**city) for city in python_raw_result] == vectorized_result, (
+        "Результаты просчета не совпадают"
+    )
+    vectorized_time = convert_time + calculate_time
+    print(f"cities={cities_count} days={days_count} hours=24")
+    print(f"python loops: {python_time:.3f}s")
+    print(f"vectorized:   {vectorized_time:.3f}s ({python_time / vectorized_time:.1f}x)")
+    print(f"  to columnar: {convert_time:.3f}s, numpy calculation: {calculate_time:.3f}s")
+    print(f"result models (both paths): {models_time:.3f}s")
+
+    try:
+        started = time.perf_counter()
+        default_result = calc_data_service.get_calculated_data()
+        default_time = time.perf_counter() - started
+        started = time.perf_counter()
+        vectorized_records = calc_data_service.get_calculated_data_vectorized()
+        end_to_end_time = time.perf_counter() - started
+    finally:
+        worker_pool.shutdown()
+    assert [city.dict() for city in default_result] == [city.dict() for city in vectorized_records], (
+        "Результаты этапа просчета не совпадают"
+    )
+    print("calculation stage end to end:")
+    print(f"  default (process pool): {default_time:.3f}s")
+    print(f"  vectorized:             {end_to_end_time:.3f}s ({default_time / end_to_end_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
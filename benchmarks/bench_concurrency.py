@@ -0,0 +1,67 @@
+"""
+Загрузка городов пулом потоков с количеством потоков по умолчанию против
+адаптивного ограничения одновременных запросов (resilience.AdaptiveConcurrencyLimiter,
+create_api_client) против локального сервера с задержкой ответа latency.
+
+Второй сценарий - сервер с ограничением одновременных запросов
+(--server-limit): запросы сверх него получают 429 и повторяются клиентом.
+Печатается время загрузки, количество загруженных городов, запросов
+к серверу и итоговый лимит адаптивного ограничения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_concurrency --cities 1000 --latency 0.05 --server-limit 16
+"""
+import argparse
+import time
+
+import utils
+from api_client import YandexWeatherAPI
+from local_server import LocalWeatherServer
+from tasks import DataFetchingTask, create_api_client
+
+
+def measure(api_client: YandexWeatherAPI, server: LocalWeatherServer) -> str:
+    requests_before = server.request_count
+    fetch_data_service = DataFetchingTask(list(server.responses), api_client)
+    started = time.perf_counter()
+    cities_forecasts = fetch_data_service.fetch_forecasts()
+    elapsed = time.perf_counter() - started
+    line = (
+        f"{elapsed:.2f}s, cities {len(cities_forecasts)}/{len(server.responses)}, "
+        f"requests {server.request_count - requests_before}"
+    )
+    limiter = api_client.concurrency_limiter
+    if limiter is not None:
+        line += f", limit {limiter.limit} (peak {limiter.peak_limit}, decreases {limiter.decreases})"
+    return line
+
+
+def run_benchmark(cities_count: int, latency: float, server_limit: int) -> None:
+    cities = [f"CITY_{index}" for index in range(cities_count)]
+    previous_cities = dict(utils.CITIES)
+    try:
+        for concurrency_limit in (None, server_limit):
+            with LocalWeatherServer.from_synthetic(
+                cities, 1, latency, concurrency_limit=concurrency_limit
+            ) as server:
+                utils.CITIES.clear()
+                utils.CITIES.update(server.urls())
+                adaptive_client = create_api_client()
+                default_client = YandexWeatherAPI(
+                    timeout=adaptive_client.timeout, retry_policy=adaptive_client.retry_policy
+                )
+                print(f"cities={cities_count} latency={latency}s server limit={concurrency_limit}")
+                print(f"  default pool: {measure(default_client, server)}")
+                print(f"      adaptive: {measure(adaptive_client, server)}")
+    finally:
+        utils.CITIES.clear()
+        utils.CITIES.update(previous_cities)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--server-limit", type=int, default=16)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.latency, args.server_limit)
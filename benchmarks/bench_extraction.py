@@ -0,0 +1,66 @@
+"""
+Разбор и валидация ответов API: полный json.loads + pydantic против
+извлечения только нужных полей (extraction.extract_forecasts).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_extraction --responses 3000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, List
+
+from config import WEATHER_CONDITIONS
+from extraction import build_city_weather_model, extract_forecasts
+from local_server import EXAMPLE_RESPONSE_PATH
+from models import CityWeatherDataModel
+
+
+def make_responses(count: int) -> List[bytes]:
+    document = json.loads(EXAMPLE_RESPONSE_PATH.read_bytes())
+    conditions = sorted(WEATHER_CONDITIONS)
+    responses = []
+    for _ in range(count):
+        for forecast in document["forecasts"]:
+            for hour in forecast["hours"]:
+                hour["temp"] = random.randint(-30, 40)
+                hour["condition"] = random.choice(conditions)
+        responses.append(json.dumps(document, indent=2).encode())
+    return responses
+
+
+def full_path(body: bytes) -> CityWeatherDataModel:
+    return CityWeatherDataModel(**json.loads(body), city_name="CITY")
+
+
+def lean_path(body: bytes) -> CityWeatherDataModel:
+    return build_city_weather_model({**extract_forecasts(body), "city_name": "CITY"})
+
+
+def measure(name: str, parse: Callable, responses: List[bytes]) -> None:
+    started = time.perf_counter()
+    for body in responses:
+        parse(body)
+    elapsed = time.perf_counter() - started
+
+    # пиковая память на один город: разбор одного ответа под tracemalloc
+    tracemalloc.start()
+    parse(responses[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_city_us = elapsed / len(responses) * 1e6
+    print(f"{name}: {elapsed:.3f}s total, {per_city_us:.0f}us/city, peak {peak / 1024:.0f}KiB/city")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--responses", type=int, default=3000)
+    args = parser.parse_args()
+    responses = make_responses(args.responses)
+    assert all(full_path(body) == lean_path(body) for body in responses[:100]), "Модели не совпадают"
+    print(f"responses={len(responses)} size={len(responses[0]) / 1024:.0f}KiB")
+    measure("json.loads + pydantic", full_path, responses)
+    measure("lean extraction      ", lean_path, responses)
@@ -0,0 +1,41 @@
+"""
+Сравнение загрузки данных пулом потоков и в одном event loop.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_fetch --cities 500 --latency 0.02
+"""
+import argparse
+import time
+
+import utils
+from local_server import LocalWeatherServer
+from tasks import DataFetchingTask
+
+
+def run_benchmark(cities_count: int, latency: float, concurrency: int) -> None:
+    cities = [f"CITY_{index}" for index in range(cities_count)]
+    with LocalWeatherServer.from_example(cities, latency) as server:
+        utils.CITIES.update(server.urls())
+        fetch_data_service = DataFetchingTask(cities)
+
+        started = time.perf_counter()
+        threads_result = fetch_data_service.fetch_forecasts()
+        threads_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        async_result = fetch_data_service.fetch_forecasts_async(concurrency)
+        async_time = time.perf_counter() - started
+
+    assert threads_result == async_result, "Результаты загрузки не совпадают"
+    print(f"cities={cities_count} latency={latency}s concurrency={concurrency}")
+    print(f"thread pool: {threads_time:.3f}s")
+    print(f"asyncio:     {async_time:.3f}s ({threads_time / async_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.latency, args.concurrency)
@@ -0,0 +1,97 @@
+"""
+Пиковая память загрузки и просчета: прогнозы в памяти родительского процесса
+(DataFetchingTask.fetch_forecasts, города передаются в пул через pickle)
+против файла прогнозов (fetch_forecasts_to_file, процессы пула читают свои
+города через mmap, forecast_weather(mmap_forecasts=True)).
+
+Каждый режим запускается в новом процессе, пиковая память берется из
+getrusage: ru_maxrss процесса и наибольший ru_maxrss процесса пула.
+Локальный сервер отдает всем городам один синтетический ответ на --days дней.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_forecast_file --cities 500 2000 8000 --days 7
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from local_server import LocalWeatherServer
+from replay import generate_responses
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("records", "file")
+
+MEASURE_SCRIPT = """
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import utils
+from calculation import worker_pool
+from tasks import DataCalculationTask, DataFetchingTask
+
+urls = json.load(sys.stdin)
+utils.CITIES.clear()
+utils.CITIES.update(urls)
+started = time.perf_counter()
+fetch_data_service = DataFetchingTask(list(urls))
+if sys.argv[1] == "file":
+    file_descriptor, file_name = tempfile.mkstemp(".wfraw")
+    os.close(file_descriptor)
+    cities_forecasts = fetch_data_service.fetch_forecasts_to_file(file_name)
+else:
+    cities_forecasts = fetch_data_service.fetch_forecasts()
+result = DataCalculationTask(cities_forecasts).get_calculated_data()
+elapsed = time.perf_counter() - started
+worker_pool.shutdown()
+if sys.argv[1] == "file":
+    os.remove(file_name)
+print(json.dumps({
+    "cities": len(result),
+    "seconds": elapsed,
+    "parent_max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "worker_max_rss_kib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+}))
+"""
+
+
+def measure(mode: str, urls) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT, mode],
+        input=json.dumps(urls),
+        cwd=ROOT_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def run_benchmark(cities_counts, days_count: int) -> None:
+    body = generate_responses(["CITY"], days_count)["CITY"]
+    print(f"days={days_count} response={len(body) / 1024:.0f}KiB")
+    for cities_count in cities_counts:
+        cities = [f"CITY_{index}" for index in range(cities_count)]
+        with LocalWeatherServer({city: body for city in cities}) as server:
+            urls = server.urls()
+            for mode in MODES:
+                stats = measure(mode, urls)
+                assert stats["cities"] == cities_count, "Посчитаны не все города"
+                print(
+                    f"cities={cities_count:>6} {mode:>7}: {stats['seconds']:.2f}s, "
+                    f"parent peak {stats['parent_max_rss_kib'] / 1024:.1f}MiB, "
+                    f"worker peak {stats['worker_max_rss_kib'] / 1024:.1f}MiB"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
@@ -0,0 +1,75 @@
+"""
+Пропускная способность DataCalculationTask.get_calculated_data при разных
+уровнях логирования: логирование выключено, INFO (сообщения по дням не
+форматируются) и DEBUG (все сообщения по дням и городам передаются из
+процессов пула через очередь в родительский процесс).
+
+Лог пишется во временный файл, пул процессов пересоздается для каждого
+режима: уровень логирования воркеров задается при создании пула.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_logging --cities 10000 --days 7
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.bench_columnar import make_city_forecasts
+from calculation import worker_pool
+from models import CityWeatherDataModel
+from tasks import DataCalculationTask
+
+LOGGING_MODES = {
+    "off": None,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG,
+}
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    cities_forecasts = [
+        CityWeatherDataModel(**city.__dict__)
+        for city in make_city_forecasts(cities_count, days_count)
+    ]
+    root_logger = logging.getLogger()
+    previous_handlers, previous_level = list(root_logger.handlers), root_logger.level
+    print(f"cities={cities_count} days={days_count}")
+    with tempfile.TemporaryDirectory() as directory:
+        log_file_name = os.path.join(directory, "bench.log")
+        file_handler = logging.FileHandler(log_file_name)
+        root_logger.handlers = [file_handler]
+        try:
+            for mode, level in LOGGING_MODES.items():
+                worker_pool.shutdown()
+                if level is None:
+                    logging.disable(logging.CRITICAL)
+                else:
+                    logging.disable(logging.NOTSET)
+                    root_logger.setLevel(level)
+                # первый запуск создает процессы пула
+                DataCalculationTask(cities_forecasts[:1000]).get_calculated_data()
+                log_size = os.path.getsize(log_file_name)
+                started = time.perf_counter()
+                DataCalculationTask(cities_forecasts).get_calculated_data()
+                elapsed = time.perf_counter() - started
+                worker_pool.shutdown()
+                written = os.path.getsize(log_file_name) - log_size
+                print(
+                    f"{mode:>5}: {elapsed:.3f}s, {cities_count / elapsed:,.0f} cities/s, "
+                    f"log {written / 1024:.0f}KiB"
+                )
+        finally:
+            logging.disable(logging.NOTSET)
+            file_handler.close()
+            root_logger.handlers = previous_handlers
+            root_logger.setLevel(previous_level)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
@@ -0,0 +1,48 @@
+"""
+Запись результата во всех форматах DataAggregationTask.save_data:
+время записи, размер файла и пик памяти, выделенной во время записи.
+Память измеряется отдельным запуском: tracemalloc замедляет запись в разы.
+
+Пик памяти не должен расти с количеством городов: писатели получают
+города пачками по AGGREGATION_BATCH_SIZE.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_output_formats --cities 100000 --days 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_aggregation import make_calculated_cities
+from output_writers import OUTPUT_WRITERS
+from tasks import DataAggregationTask
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    task = DataAggregationTask(make_calculated_cities(cities_count, days_count))
+    print(f"cities={cities_count} days={days_count}")
+    with tempfile.TemporaryDirectory() as directory:
+        for output_format in OUTPUT_WRITERS:
+            file_name = os.path.join(directory, f"table.{output_format}")
+            started = time.perf_counter()
+            task.save_data(output_format, file_name)
+            write_time = time.perf_counter() - started
+            tracemalloc.start()
+            task.save_data(output_format, file_name)
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            file_size = os.path.getsize(file_name)
+            print(
+                f"{output_format:>6}: {write_time:.3f}s, "
+                f"{file_size / 1024 / 1024:.1f}MiB, peak memory {peak_memory / 1024 / 1024:.1f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
@@ -0,0 +1,41 @@
+"""
+Сравнение последовательного запуска этапов с потоковым режимом.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pipeline --cities 200 --latency 0.05
+"""
+import argparse
+import time
+
+import utils
+from local_server import LocalWeatherServer
+from pipeline import StreamingForecastPipeline
+from tasks import DataCalculationTask, DataFetchingTask
+
+
+def run_benchmark(cities_count: int, latency: float) -> None:
+    cities = [f"CITY_{index}" for index in range(cities_count)]
+    with LocalWeatherServer.from_example(cities, latency) as server:
+        utils.CITIES.update(server.urls())
+
+        started = time.perf_counter()
+        cities_forecasts = DataFetchingTask(cities).fetch_forecasts()
+        staged_result = DataCalculationTask(cities_forecasts).get_calculated_data()
+        staged_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pipelined_result = StreamingForecastPipeline(DataFetchingTask(cities)).run()
+        pipelined_time = time.perf_counter() - started
+
+    assert staged_result == pipelined_result, "Результаты режимов не совпадают"
+    print(f"cities={cities_count} latency={latency}s")
+    print(f"staged:    {staged_time:.3f}s")
+    print(f"pipelined: {pipelined_time:.3f}s ({staged_time / pipelined_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.latency)
@@ -0,0 +1,103 @@
+"""
+Модели pydantic против внутренних записей со __slots__ (records.py):
+время создания и память на город для прогнозов (CityWeatherDataModel против
+CityForecastRecord.from_raw) и результатов просчета (CalculatedCityWeatherDataModel
+против CalculatedCityRecord.from_dict) на синтетических данных.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_records --cities 10000 --days 7
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from config import WEATHER_CONDITIONS
+from models import CalculatedCityWeatherDataModel, CityWeatherDataModel
+from records import CalculatedCityRecord, CityForecastRecord
+
+
+def make_raw_cities(cities_count: int, days_count: int) -> List[Dict]:
+    conditions = sorted(WEATHER_CONDITIONS)
+    return [
+        {
+            "city_name": f"CITY_{city_index}",
+            "forecasts": [
+                {
+                    "date": f"2022-05-{day_index + 10}",
+                    "hours": [
+                        # как в ответе API: час строкой
+                        {"hour": str(hour), "temp": random.randint(-30, 40), "condition": random.choice(conditions)}
+                        for hour in range(24)
+                    ],
+                }
+                for day_index in range(days_count)
+            ],
+        }
+        for city_index in range(cities_count)
+    ]
+
+
+def make_calculated_cities(cities_count: int, days_count: int) -> List[Dict]:
+    return [
+        {
+            "city_name": f"CITY_{city_index}",
+            "days": [
+                {"date": f"2022-05-{day_index + 10}", "average_temp": 10.5, "good_weather_hours": 4}
+                for day_index in range(days_count)
+            ],
+            "total_average_temp": 10.5,
+            "total_average_good_weather_hours": 4.0,
+            "rating": None,
+        }
+        for city_index in range(cities_count)
+    ]
+
+
+def measure(build: Callable, items: List[Dict]):
+    """Время создания (без tracemalloc) и память, удерживаемая созданными объектами."""
+    started = time.perf_counter()
+    build(items)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    result = build(items)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained / len(items)
+
+
+def report(title: str, items: List[Dict], before: Callable, after: Callable) -> None:
+    before_time, before_memory = measure(before, items)
+    after_time, after_memory = measure(after, items)
+    print(title)
+    print(f"  pydantic: {before_time:.3f}s, {before_memory / 1024:.1f}KiB per city")
+    print(
+        f"  records:  {after_time:.3f}s ({before_time / after_time:.1f}x), "
+        f"{after_memory / 1024:.1f}KiB per city ({before_memory / after_memory:.1f}x less)"
+    )
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    print(f"cities={cities_count} days={days_count} hours=24")
+    report(
+        "forecasts (validation of raw API data):",
+        make_raw_cities(cities_count, days_count),
+        lambda items: [CityWeatherDataModel(**item) for item in items],
+        lambda items: [CityForecastRecord.from_raw(item) for item in items],
+    )
+    report(
+        "calculated cities:",
+        make_calculated_cities(cities_count, days_count),
+        lambda items: [CalculatedCityWeatherDataModel(**item) for item in items],
+        lambda items: [CalculatedCityRecord.from_dict(item) for item in items],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.days)
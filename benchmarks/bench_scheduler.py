@@ -0,0 +1,87 @@
+"""
+Холодный запуск forecast_weather в новом процессе (как из cron) против
+цикла резидентного планировщика (scheduler.py), обновляющего те же города.
+
+Холодный запуск включает старт интерпретатора, импорт модулей, создание
+пулов и соединений. Планировщику задается batch_window не меньше interval,
+чтобы каждый цикл обновлял все города и работа совпадала с холодным запуском.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_scheduler --cities 200 --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import utils
+from local_server import LocalWeatherServer
+from scheduler import ForecastScheduler
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_RUN_SCRIPT = """
+import json
+import sys
+import utils
+utils.CITIES.clear()
+utils.CITIES.update(json.loads(sys.argv[1]))
+from forecasting import forecast_weather
+forecast_weather()
+"""
+
+
+def run_benchmark(cities_count: int, runs: int, latency: float) -> None:
+    cities = [f"CITY_{index}" for index in range(cities_count)]
+    with LocalWeatherServer.from_example(cities, latency) as server, tempfile.TemporaryDirectory() as work_dir:
+        urls = server.urls()
+        utils.CITIES.update(urls)
+
+        cold_times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", COLD_RUN_SCRIPT, json.dumps(urls)],
+                cwd=work_dir,
+                env={**os.environ, "PYTHONPATH": ROOT_DIR},
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            cold_times.append(time.perf_counter() - started)
+
+        scheduler = ForecastScheduler(
+            cities, interval=0.5, file_name=os.path.join(work_dir, "table.csv"), batch_window=0.5
+        )
+        warm_times = []
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        seen_cycles = 0
+        while len(warm_times) < runs + 1:
+            if scheduler.cycles > seen_cycles:
+                seen_cycles = scheduler.cycles
+                warm_times.append(scheduler.last_cycle["total_seconds"])
+            time.sleep(0.01)
+        scheduler.stop()
+        thread.join()
+
+    # первый цикл планировщика тоже холодный: создание пула и соединений
+    first_cycle, warm_times = warm_times[0], warm_times[1:]
+    cold_time = sum(cold_times) / len(cold_times)
+    warm_time = sum(warm_times) / len(warm_times)
+    print(f"cities={cities_count} latency={latency}s runs={runs}")
+    print(f"cold cron run:        {cold_time:.3f}s")
+    print(f"scheduler first cycle: {first_cycle:.3f}s")
+    print(f"scheduler warm cycle:  {warm_time:.3f}s ({cold_time / warm_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    run_benchmark(args.cities, args.runs, args.latency)
@@ -0,0 +1,90 @@
+"""
+Стоимость холодного старта: импорт forecasting.py в новом интерпретаторе
+и запуск процесса-воркера пула просчета методом spawn.
+
+Импорт измеряется как python -X importtime: суммарное время импорта модуля
+и модули с наибольшим собственным временем импорта. Запуск воркера -
+время от создания ProcessPoolExecutor (spawn) до результата первой задачи
+calculate_chunk: новый интерпретатор импортирует только calculation
+и его зависимости.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# модули, которые импортирует процесс при старте
+STARTUP_MODULES = ("forecasting", "calculation")
+
+
+def measure_import(module: str) -> Tuple[float, float, Dict[str, int]]:
+    """
+    Импорт module в новом процессе с -X importtime: время работы процесса,
+    суммарное время импорта module (с) и собственное время импорта модулей (мкс).
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.perf_counter() - started
+    self_times: Dict[str, int] = {}
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us)
+        if name.strip() == module:
+            cumulative = int(cumulative_us)
+    return wall_time, cumulative / 1_000_000, self_times
+
+
+def measure_worker_spawn() -> float:
+    """Время от создания пула (spawn) до результата первой задачи в воркере."""
+    from calculation import calculate_chunk
+
+    payload = ("CITY", [("2022-05-26", array("b", [9, 10]), array("h", [20, 21]), bytes([1, 2]))])
+    started = time.perf_counter()
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        executor.submit(calculate_chunk, [payload], 9, 19).result()
+        return time.perf_counter() - started
+
+
+def run_benchmark(runs: int, top: int) -> None:
+    print(f"runs={runs}")
+    for module in STARTUP_MODULES:
+        measurements = [measure_import(module) for _ in range(runs)]
+        wall_times: List[float] = sorted(wall for wall, _, _ in measurements)
+        import_times: List[float] = sorted(cumulative for _, cumulative, _ in measurements)
+        print(
+            f"import {module}: median import {import_times[runs // 2] * 1000:.1f}ms, "
+            f"median process {wall_times[runs // 2] * 1000:.1f}ms"
+        )
+        self_times = measurements[-1][2]
+        for name in sorted(self_times, key=self_times.get, reverse=True)[:top]:
+            print(f"    {self_times[name] / 1000:7.2f}ms  {name}")
+
+    spawn_times = sorted(measure_worker_spawn() for _ in range(runs))
+    print(f"worker spawn to first result: median {spawn_times[runs // 2] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="сколько самых долгих импортов показать")
+    args = parser.parse_args()
+    run_benchmark(args.runs, args.top)
@@ -0,0 +1,142 @@
+"""
+Набор бенчмарков всего прогноза: время этапов загрузки, просчета, анализа,
+записи и всего запуска forecast_weather против локального сервера
+с синтетическими ответами (replay.generate_responses) и задержкой latency.
+
+Время этапов берется из run_metrics (wall time, медиана по runs запускам
+после warmup прогревочных). Результат записывается в json вместе с коммитом
+и параметрами запуска; с --compare печатается отношение к прошлому результату,
+например к результату предыдущего коммита.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_suite --cities 1000 --days 7 --latency 0.01
+    python -m benchmarks.bench_suite --compare bench_results/<коммит>.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import utils
+from calculation import worker_pool
+from forecasting import forecast_weather
+from local_server import LocalWeatherServer
+from metrics import run_metrics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = "bench_results"
+# этапы, время которых сравнивается между коммитами; validation входит в fetch
+STAGES = ("fetch", "calculation", "analysis", "aggregation")
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_once(output_format: str, work_dir: str) -> Dict[str, float]:
+    """Один запуск forecast_weather: время этапов и всего запуска в секундах."""
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    run_metrics.enable()
+    started = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            forecast_weather(output_format=output_format)
+    finally:
+        os.chdir(previous_dir)
+    timings = {"end_to_end": time.perf_counter() - started}
+    # forecast_weather выключает метрики, но не сбрасывает собранные значения
+    run_metrics.disable()
+    stages = run_metrics.report()["stages"]
+    for stage in STAGES:
+        timings[stage] = stages.get(stage, {}).get("wall_seconds", 0.0)
+    return timings
+
+
+def run_suite(
+    cities_count: int, days_count: int, latency: float, runs: int, warmup: int, output_format: str
+) -> Dict:
+    cities = [f"CITY_{index}" for index in range(cities_count)]
+    previous_cities = dict(utils.CITIES)
+    samples: Dict[str, List[float]] = {}
+    with LocalWeatherServer.from_synthetic(cities, days_count, latency) as server, \
+            tempfile.TemporaryDirectory() as work_dir:
+        utils.CITIES.clear()
+        utils.CITIES.update(server.urls())
+        try:
+            for run in range(warmup + runs):
+                timings = run_once(output_format, work_dir)
+                if run < warmup:
+                    continue
+                for name, seconds in timings.items():
+                    samples.setdefault(name, []).append(seconds)
+        finally:
+            utils.CITIES.clear()
+            utils.CITIES.update(previous_cities)
+            worker_pool.shutdown()
+    return {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "cities": cities_count,
+            "days": days_count,
+            "latency": latency,
+            "runs": runs,
+            "warmup": warmup,
+            "output_format": output_format,
+        },
+        "timings": {
+            name: {"median": statistics.median(values), "min": min(values), "max": max(values), "runs": values}
+            for name, values in samples.items()
+        },
+    }
+
+
+def print_result(result: Dict, baseline: Optional[Dict]) -> None:
+    print(f"commit={result['commit']} " + " ".join(f"{key}={value}" for key, value in result["params"].items()))
+    if baseline is not None and baseline["params"] != result["params"]:
+        print(f"внимание: параметры {baseline['commit']} отличаются: {baseline['params']}")
+    for name, timing in result["timings"].items():
+        line = f"{name:>12}: median {timing['median']:.4f}s (min {timing['min']:.4f}s, max {timing['max']:.4f}s)"
+        if baseline is not None and name in baseline["timings"]:
+            baseline_median = baseline["timings"][name]["median"]
+            line += f", {baseline['commit']}: {baseline_median:.4f}s ({timing['median'] / baseline_median:.2f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--format", default="csv")
+    parser.add_argument("--output", help=f"файл результата, по умолчанию {RESULTS_DIR}/<коммит>.json")
+    parser.add_argument("--compare", help="json результат для сравнения")
+    args = parser.parse_args()
+
+    suite_result = run_suite(args.cities, args.days, args.latency, args.runs, args.warmup, args.format)
+    baseline_result = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline_result = json.load(file)
+    print_result(suite_result, baseline_result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{suite_result['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(suite_result, file, indent=2)
+    print(f"Результат записан в {output}")
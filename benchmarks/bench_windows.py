@@ -0,0 +1,68 @@
+"""
+Агрегаты окон за один проход по часам (calculate_payload с windows)
+против отдельного прохода по часам на каждое окно часов (calculate_day).
+Оба варианта собирают одинаковые агрегаты через build_aggregates,
+результаты сравниваются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_windows --cities 5000 --days 7
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_columnar import make_city_forecasts
+from calculation import calculate_day, calculate_payload, combine_days, to_payload
+from records import CityForecastRecord
+from tasks import DataCalculationTask
+from windows import DAYTIME_WINDOWS, HourWindow, build_aggregates, hour_bounds
+
+
+def calculate_per_window(payload, min_hour: int, max_hour: int, windows, bounds):
+    """Отдельный проход по часам дня для каждого окна часов."""
+    city_name, days = payload
+    dates = [day[0] for day in days]
+    window_day_results = [
+        [calculate_day(day, window_min_hour, window_max_hour) for day in days]
+        for window_min_hour, window_max_hour in bounds
+    ]
+    city_data_forecast = combine_days(city_name, dates, window_day_results[0], max_hour - min_hour)
+    city_data_forecast["aggregates"] = build_aggregates(dates, window_day_results, windows, bounds)
+    return city_data_forecast
+
+
+def run_benchmark(cities_count: int, days_count: int) -> None:
+    payloads = [
+        to_payload(CityForecastRecord.from_raw(city.__dict__))
+        for city in make_city_forecasts(cities_count, days_count)
+    ]
+    min_hour, max_hour = DataCalculationTask.MIN_HOUR, DataCalculationTask.MAX_HOUR
+    bounds = hour_bounds(DAYTIME_WINDOWS, min_hour, max_hour)
+
+    started = time.perf_counter()
+    per_window_result = [
+        calculate_per_window(payload, min_hour, max_hour, DAYTIME_WINDOWS, bounds)
+        for payload in payloads
+    ]
+    per_window_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single_pass_result = [
+        calculate_payload(payload, min_hour, max_hour, DAYTIME_WINDOWS) for payload in payloads
+    ]
+    single_pass_time = time.perf_counter() - started
+
+    assert single_pass_result == per_window_result, "Результаты просчета не совпадают"
+    hour_windows_count = sum(isinstance(window, HourWindow) for window in DAYTIME_WINDOWS) + 1
+    print(f"cities={cities_count} days={days_count} hour windows={hour_windows_count}")
+    print(f"pass per window: {per_window_time:.3f}s")
+    print(f"single pass:     {single_pass_time:.3f}s ({per_window_time / single_pass_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(0)
+    run_benchmark(args.cities, args.days)
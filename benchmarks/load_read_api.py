@@ -0,0 +1,130 @@
+"""
+Нагрузочный тест API чтения результатов (read_api.py).
+
+Без --url поднимает локальный ForecastReadServer со сгенерированными
+городами. Клиенты - потоки с keep-alive соединением, запросы - смесь /top,
+/cities/<город>, /cities?min_temp и /dates/<дата>, часть с If-None-Match.
+Выводит p50/p99 задержки запроса на клиенте и время ответа индекса
+(ForecastIndex.respond) без HTTP.
+
+Запуск из корня репозитория:
+    python -m benchmarks.load_read_api --cities 10000 --clients 8 --requests 2000
+    python -m benchmarks.load_read_api --url http://127.0.0.1:8085 --cities 15
+"""
+import argparse
+import http.client
+import random
+import statistics
+import threading
+import time
+from typing import List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.bench_aggregation import make_calculated_cities
+from read_api import ForecastIndex, ForecastReadServer
+
+
+def make_paths(cities_count: int, days_count: int, count: int) -> List[str]:
+    paths = []
+    for _ in range(count):
+        kind = random.randrange(4)
+        if kind == 0:
+            paths.append(f"/top?n={random.choice((1, 10, 50))}")
+        elif kind == 1:
+            paths.append(f"/cities/CITY_{random.randrange(cities_count)}")
+        elif kind == 2:
+            # порог в верхней части диапазона: ответ - десятки городов, а не все
+            paths.append(f"/cities?min_temp={random.uniform(12.5, 13.4):.1f}")
+        else:
+            paths.append(f"/dates/2022-05-{random.randrange(days_count) + 10}")
+    return paths
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_client(host: str, port: int, paths: List[str], latencies: List[float], statuses: List[int]) -> None:
+    connection = http.client.HTTPConnection(host, port)
+    etag = None
+    for number, path in enumerate(paths):
+        # каждый четвертый запрос - повторный с If-None-Match
+        headers = {"If-None-Match": etag} if etag and number % 4 == 0 else {}
+        started = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        statuses.append(response.status)
+        etag = response.getheader("ETag") or etag
+    connection.close()
+
+
+def run_load(url: str, paths_per_client: List[List[str]]) -> Tuple[List[float], List[int], float]:
+    address = urlsplit(url)
+    latencies: List[float] = []
+    statuses: List[int] = []
+    threads = [
+        threading.Thread(target=run_client, args=(address.hostname, address.port, paths, latencies, statuses))
+        for paths in paths_per_client
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def measure_index(index: ForecastIndex, paths: List[str]) -> List[float]:
+    timings = []
+    for path in paths:
+        url = urlsplit(path)
+        started = time.perf_counter()
+        index.respond(url.path, parse_qs(url.query))
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, values: List[float]) -> None:
+    print(
+        f"{name}: p50={percentile(values, 0.5) * 1000:.3f}ms p99={percentile(values, 0.99) * 1000:.3f}ms "
+        f"mean={statistics.mean(values) * 1000:.3f}ms"
+    )
+
+
+def run_benchmark(url: str, cities_count: int, days_count: int, clients: int, requests: int) -> None:
+    paths_per_client = [make_paths(cities_count, days_count, requests) for _ in range(clients)]
+    server = None
+    index = None
+    if url is None:
+        server = ForecastReadServer(port=0)
+        server.start()
+        server.publish(make_calculated_cities(cities_count, days_count))
+        url = server.url
+        index = server.index
+    try:
+        latencies, statuses, elapsed = run_load(url, paths_per_client)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"url={url} cities={cities_count} clients={clients} requests={len(latencies)}")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s, statuses: "
+          f"{ {status: statuses.count(status) for status in sorted(set(statuses))} }")
+    report("http request", latencies)
+    if index is not None:
+        report("index lookup", measure_index(index, paths_per_client[0]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url")
+    parser.add_argument("--cities", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    random.seed(0)
+    run_benchmark(args.url, args.cities, args.days, args.clients, args.requests)
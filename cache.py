@@ -0,0 +1,144 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в SQLite файле.
+    Ключ - url, запись считается свежей ttl секунд с момента сохранения
+    или последней ревалидации. При превышении max_entries вытесняются
+    записи, к которым дольше всего не обращались (LRU).
+    """
+
+    def __init__(
+        self, path: str, ttl: float = 3 * 60 * 60, max_entries: int = 10_000
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.network_time = 0.0
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, "
+            "last_modified TEXT, stored_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+            "ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Возвращает запись кэша (в том числе устаревшую) и отмечает обращение к ней."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, stored_at "
+                "FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+            self._connection.commit()
+        return CacheEntry(*row)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def set(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, body, etag, last_modified, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM responses WHERE url IN ("
+                "SELECT url FROM responses ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._connection.commit()
+
+    def touch(self, url: str) -> None:
+        """Продлевает жизнь записи после успешной ревалидации (ответ 304)."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? "
+                "WHERE url = ?",
+                (now, now, url),
+            )
+            self._connection.commit()
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, elapsed: float) -> None:
+        with self._lock:
+            self.misses += 1
+            self.network_time += elapsed
+
+    def record_revalidation(self, elapsed: float) -> None:
+        with self._lock:
+            self.revalidated += 1
+            self.network_time += elapsed
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Счетчики кэша. saved_time - оценка сэкономленного времени загрузки:
+        количество попаданий, умноженное на среднее время сетевого запроса.
+        """
+        requests = self.misses + self.revalidated
+        avg_network_time = self.network_time / requests if requests else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "network_time": round(self.network_time, 3),
+            "saved_time": round(self.hits * avg_network_time, 3),
+        }
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Заголовки условного запроса для ревалидации записи."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
@@ -0,0 +1,354 @@
+"""
+Просчет по городам и долгоживущий пул процессов.
+
+Модуль импортируется каждым процессом пула, поэтому тяжелые зависимости
+(pydantic, concurrent.futures.process, hashlib) загружаются только в функциях,
+которым они нужны.
+"""
+import atexit
+import logging
+import math
+import os
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+
+from config import (
+    logger,
+    CALCULATION_LOG_THROUGH_QUEUE,
+    CALCULATION_POOL_WORKERS,
+    GOOD_WEATHER_CODE_TABLE,
+)
+from records import CityForecastRecord, CityPayload, DayPayload, DayResult
+from windows import WindowSpec, build_aggregates, hour_bounds
+
+if TYPE_CHECKING:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from logging.handlers import QueueListener
+
+    from models import CityWeatherDataModel
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def to_payload(city_data: Union[CityForecastRecord, "CityWeatherDataModel"]) -> CityPayload:
+    """
+    Упаковка города в примитивы для передачи в процесс-воркер.
+    array и bytes сериализуются pickle одним буфером, без объектов на каждый час.
+    Запись CityForecastRecord уже хранит дни в этом виде.
+    """
+    if not isinstance(city_data, CityForecastRecord):
+        city_data = CityForecastRecord.from_model(city_data)
+    return city_data.to_payload()
+
+
+def calculate_payload(
+    payload: CityPayload,
+    min_hour: int,
+    max_hour: int,
+    windows: Sequence[WindowSpec] = (),
+) -> Dict:
+    """
+    Вычисление значений по городу из компактного представления.
+    Если заданы windows, все окна часов считаются за тот же проход по часам,
+    а агрегаты попадают в поле aggregates результата.
+    Сообщения по дням и городам пишутся на уровне DEBUG и форматируются,
+    только если этот уровень включен.
+    """
+    city_name, forecasts = payload
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    bounds = hour_bounds(windows, min_hour, max_hour) if windows else None
+    day_results = []
+    # результаты по дням для каждого окна часов из bounds
+    window_day_results: List[List[DayResult]] = [[] for _ in bounds or ()]
+    for day in forecasts:
+        if debug_enabled:
+            logger.debug("Начинаем считать данные для даты: %s г.%s", day[0], city_name)
+        if bounds is None:
+            day_results.append(calculate_day(day, min_hour, max_hour))
+            continue
+        day_window_results = calculate_day_windows(day, bounds)
+        day_results.append(day_window_results[0])
+        for results, day_result in zip(window_day_results, day_window_results):
+            results.append(day_result)
+    dates = [day[0] for day in forecasts]
+    city_data_forecast = combine_days(city_name, dates, day_results, max_hour - min_hour)
+    if bounds is not None:
+        city_data_forecast["aggregates"] = build_aggregates(
+            dates, window_day_results, windows, bounds
+        )
+    if debug_enabled:
+        logger.debug("Подсчет закончен для г.%s", city_name)
+    return city_data_forecast
+
+
+def calculate_day(day: DayPayload, min_hour: int, max_hour: int) -> DayResult:
+    """
+    Сумма температур и количество часов без осадков за день в периоде
+    min_hour..max_hour. None - по дню нет данных по времени.
+    """
+    _, hours, temps, conditions = day
+    if len(hours) == 0:
+        return None
+    total_temp = 0
+    good_weather_hours = 0
+    # признаки хорошей погоды по всем часам дня одним вызовом bytes.translate
+    for hour, temp, is_good_weather in zip(
+        hours, temps, conditions.translate(GOOD_WEATHER_CODE_TABLE)
+    ):
+        if min_hour <= hour <= max_hour:
+            total_temp += temp
+            good_weather_hours += is_good_weather
+    return total_temp, good_weather_hours
+
+
+def calculate_day_windows(
+    day: DayPayload, bounds: Sequence[Tuple[int, int]]
+) -> List[DayResult]:
+    """
+    Результаты calculate_day сразу для нескольких окон часов bounds
+    за один проход по часам дня: суммы раскладываются по часам суток,
+    окна затем суммируют срезы этих 24 значений.
+    """
+    _, hours, temps, conditions = day
+    if len(hours) == 0:
+        return [None] * len(bounds)
+    temp_by_hour = [0] * 24
+    good_by_hour = [0] * 24
+    for hour, temp, is_good_weather in zip(
+        hours, temps, conditions.translate(GOOD_WEATHER_CODE_TABLE)
+    ):
+        if 0 <= hour <= 23:
+            temp_by_hour[hour] += temp
+            good_by_hour[hour] += is_good_weather
+    return [
+        (sum(temp_by_hour[min_hour:max_hour + 1]), sum(good_by_hour[min_hour:max_hour + 1]))
+        for min_hour, max_hour in bounds
+    ]
+
+
+def combine_days(
+    city_name: str,
+    dates: Sequence[str],
+    day_results: Sequence[DayResult],
+    hours_period: int,
+) -> Dict:
+    """Сборка результата по городу из результатов по дням, без дополнительных агрегатов."""
+    city_data_forecast: Dict = {"city_name": city_name, "days": [], "aggregates": {}}
+    total_days_temp = 0.0
+    total_hours_good_weather = 0
+
+    for date, day_result in zip(dates, day_results):
+        # если нет данных по времени идем на другой день
+        if day_result is None:
+            continue
+        total_temp, good_weather_hours = day_result
+        days_avg_temp = total_temp / hours_period
+        city_data_forecast["days"].append(
+            {
+                "date": date,
+                "average_temp": round(days_avg_temp, 1),
+                "good_weather_hours": good_weather_hours,
+            }
+        )
+        total_days_temp += days_avg_temp
+        total_hours_good_weather += good_weather_hours
+
+    days = len(dates)
+    city_data_forecast["total_average_temp"] = round(total_days_temp / days, 1)
+    city_data_forecast["total_average_good_weather_hours"] = round(
+        total_hours_good_weather / days, 1
+    )
+    return city_data_forecast
+
+
+def calculate_days_chunk(
+    days: Sequence[DayPayload], min_hour: int, max_hour: int
+) -> List[DayResult]:
+    """Вычисление значений по пачке дней разных городов."""
+    return [calculate_day(day, min_hour, max_hour) for day in days]
+
+
+def day_fingerprint(day: DayPayload, min_hour: int, max_hour: int) -> str:
+    """Отпечаток данных дня, от которых зависит результат просчета."""
+    import hashlib
+
+    date, hours, temps, conditions = day
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+        f"{min_hour}:{max_hour}:{date}".encode("utf-8"),
+        hours.tobytes(),
+        temps.tobytes(),
+        conditions,
+    ):
+        digest.update(len(part).to_bytes(4, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def city_fingerprint(
+    city_name: str,
+    day_fingerprints: Sequence[str],
+    windows: Sequence[WindowSpec] = (),
+) -> str:
+    """Отпечаток города: имя, отпечатки всех его дней по порядку и дополнительные окна."""
+    import hashlib
+
+    digest = hashlib.blake2b(city_name.encode("utf-8"), digest_size=16)
+    for fingerprint in day_fingerprints:
+        digest.update(fingerprint.encode("ascii"))
+    if windows:
+        digest.update(repr(tuple(windows)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def calculate_chunk(
+    payloads: Sequence[CityPayload],
+    min_hour: int,
+    max_hour: int,
+    windows: Sequence[WindowSpec] = (),
+) -> List[Dict]:
+    """Вычисление значений по пачке городов - одна задача для процесса-воркера."""
+    return [
+        calculate_payload(payload, min_hour, max_hour, windows) for payload in payloads
+    ]
+
+
+class _ParentLogHandler(logging.Handler):
+    """Передача записи из процесса-воркера логгеру с тем же именем в родительском процессе."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        record_logger = logging.getLogger(record.name if record.name != "root" else None)
+        record_logger.handle(record)
+
+
+def init_worker_logging(log_queue: "multiprocessing.Queue", level: int) -> None:
+    """
+    Инициализация процесса-воркера: вместо унаследованных обработчиков
+    (файла лога) записи уходят в очередь к родительскому процессу.
+    """
+    from logging.handlers import QueueHandler
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+
+def cgroup_cpu_quota(cgroup_root: str = CGROUP_ROOT) -> Optional[float]:
+    """
+    Квота CPU cgroup в процессорах: cgroup v2 (cpu.max), затем cgroup v1
+    (cpu.cfs_quota_us и cpu.cfs_period_us). None - квота не задана или не читается.
+    """
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as file:
+            quota, period = file.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for controller in ("cpu", "cpu,cpuacct"):
+        directory = os.path.join(cgroup_root, controller)
+        try:
+            with open(os.path.join(directory, "cpu.cfs_quota_us")) as file:
+                quota = int(file.read())
+            with open(os.path.join(directory, "cpu.cfs_period_us")) as file:
+                period = int(file.read())
+        except (OSError, ValueError):
+            continue
+        # -1 в cgroup v1 - квота не задана
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpu_count(cgroup_root: str = CGROUP_ROOT) -> int:
+    """
+    Количество процессоров, которые процесс может занять: доступные ему CPU
+    (sched_getaffinity), ограниченные квотой cgroup с округлением вверх.
+    os.cpu_count() в контейнере возвращает CPU всей машины.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+class CalculationWorkerPool:
+    """
+    Долгоживущий пул процессов для просчета. Создается при первом обращении
+    и переиспользуется всеми запусками DataCalculationTask в процессе.
+    Без max_workers процессов столько, сколько допускает квота CPU (available_cpu_count).
+    Если log_through_queue, записи лога воркеров передаются через очередь
+    одному QueueListener в родительском процессе; уровень логирования воркеров
+    берется у корневого логгера при создании пула.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = CALCULATION_POOL_WORKERS,
+        log_through_queue: bool = CALCULATION_LOG_THROUGH_QUEUE,
+    ) -> None:
+        self.max_workers = max_workers
+        self.log_through_queue = log_through_queue
+        self._executor: Optional["ProcessPoolExecutor"] = None
+        self._log_listener: Optional["QueueListener"] = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> "ProcessPoolExecutor":
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                from logging.handlers import QueueListener
+
+                max_workers = self.max_workers or available_cpu_count()
+                logger.info(
+                    "Пул просчета: %s процессов (%s)", max_workers,
+                    "задано явно" if self.max_workers else "по квоте CPU",
+                )
+                if self.log_through_queue:
+                    log_queue = multiprocessing.Queue()
+                    self._log_listener = QueueListener(log_queue, _ParentLogHandler())
+                    self._log_listener.start()
+                    self._executor = ProcessPoolExecutor(
+                        max_workers,
+                        initializer=init_worker_logging,
+                        initargs=(log_queue, logging.getLogger().getEffectiveLevel()),
+                    )
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers)
+            return self._executor
+
+    @property
+    def workers_count(self) -> int:
+        return self.executor._max_workers
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._log_listener is not None:
+                # остановка дожидается передачи всех записей, уже попавших в очередь
+                self._log_listener.stop()
+                self._log_listener = None
+
+    def _forget_inherited(self) -> None:
+        """
+        Сброс пула, унаследованного через fork: процессы и поток управления
+        пула принадлежат родителю, дочерний процесс создает свой пул при первом обращении.
+        """
+        self._executor = None
+        self._log_listener = None
+        self._lock = Lock()
+
+
+worker_pool = CalculationWorkerPool()
+atexit.register(worker_pool.shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=worker_pool._forget_inherited)
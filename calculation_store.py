@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+from calculation import DayResult
+
+
+class CalculationStore:
+    """
+    Хранилище результатов просчета в SQLite файле.
+    Результаты по городам и по дням хранятся по отпечаткам исходных данных
+    (calculation.city_fingerprint / day_fingerprint), поэтому неизменившиеся
+    города и дни при повторном запуске не пересчитываются.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cities ("
+            "fingerprint TEXT PRIMARY KEY, result TEXT NOT NULL, "
+            "used_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS days ("
+            "fingerprint TEXT PRIMARY KEY, result TEXT NOT NULL, "
+            "used_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def get_cities(self, fingerprints: Iterable[str]) -> Dict[str, Dict]:
+        return {
+            fingerprint: json.loads(result)
+            for fingerprint, result in self._get("cities", fingerprints)
+        }
+
+    def get_days(self, fingerprints: Iterable[str]) -> Dict[str, DayResult]:
+        result: Dict[str, DayResult] = {}
+        for fingerprint, day_result in self._get("days", fingerprints):
+            values = json.loads(day_result)
+            result[fingerprint] = tuple(values) if values is not None else None
+        return result
+
+    def save_cities(self, results: Iterable[Tuple[str, Dict]]) -> None:
+        self._save(
+            "cities",
+            [(fingerprint, json.dumps(result)) for fingerprint, result in results],
+        )
+
+    def save_days(self, results: Iterable[Tuple[str, DayResult]]) -> None:
+        self._save(
+            "days",
+            [(fingerprint, json.dumps(result)) for fingerprint, result in results],
+        )
+
+    def prune(self, max_age: float) -> None:
+        """Удаляет результаты, которые не использовались дольше max_age секунд."""
+        threshold = time.time() - max_age
+        with self._lock:
+            for table in ("cities", "days"):
+                self._connection.execute(
+                    f"DELETE FROM {table} WHERE used_at < ?", (threshold,)
+                )
+            self._connection.commit()
+
+    def _get(self, table: str, fingerprints: Iterable[str]) -> List[Tuple[str, str]]:
+        fingerprints = list(fingerprints)
+        rows: List[Tuple[str, str]] = []
+        now = time.time()
+        with self._lock:
+            # ограничение SQLite на количество параметров в запросе
+            for start in range(0, len(fingerprints), 500):
+                batch = fingerprints[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows.extend(
+                    self._connection.execute(
+                        f"SELECT fingerprint, result FROM {table} "
+                        f"WHERE fingerprint IN ({placeholders})",
+                        batch,
+                    )
+                )
+                self._connection.execute(
+                    f"UPDATE {table} SET used_at = ? "
+                    f"WHERE fingerprint IN ({placeholders})",
+                    [now, *batch],
+                )
+            self._connection.commit()
+        return rows
+
+    def _save(self, table: str, rows: List[Tuple[str, str]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {table} (fingerprint, result, used_at) "
+                "VALUES (?, ?, ?)",
+                [(fingerprint, result, now) for fingerprint, result in rows],
+            )
+            self._connection.commit()
@@ -0,0 +1,242 @@
+"""
+Реестр городов: название -> url ответа API, координаты и альтернативные названия.
+
+Города загружаются из файла CSV или JSON (CITIES_FILE) при первом обращении,
+а не при импорте. Поверх файла действуют url из словаря urls (по умолчанию
+utils.CITIES): он читается при каждом обращении, поэтому подмены url в тестах
+и url из заданий шардов (sharding.py) видны сразу и имеют приоритет над файлом.
+
+Название ищется без учета регистра и лишних пробелов, по основному названию
+и по альтернативным; найденный город возвращается под основным названием.
+При совпадении альтернативного названия у нескольких городов побеждает
+основное название, затем первый город файла.
+
+Формат CSV (строка заголовка обязательна, aliases разделяются "|"):
+    name,url,latitude,longitude,aliases
+    MOSCOW,https://.../moscow-response.json,55.75,37.62,Москва|Moscow
+Формат JSON - список объектов с теми же полями (aliases - список)
+или словарь название -> url, как utils.CITIES.
+"""
+import csv
+import json
+import math
+from array import array
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import CITIES_FILE
+from utils import CITIES
+
+
+class UnknownCityError(LookupError):
+    """Города нет в реестре; cities - все неизвестные названия запроса."""
+
+    def __init__(self, cities: List[str]) -> None:
+        super().__init__(f"Unknown cities: {', '.join(cities)}")
+        self.cities = cities
+
+
+# поля города в файле; из них обязательны name и url
+_FIELDS = ("name", "url", "latitude", "longitude", "aliases")
+
+
+def normalize_city_name(city_name: str) -> str:
+    """Ключ поиска: без учета регистра и лишних пробелов."""
+    return " ".join(city_name.split()).casefold()
+
+
+def _parse_aliases(aliases) -> List[str]:
+    if not aliases:
+        return []
+    if isinstance(aliases, str):
+        aliases = aliases.split("|")
+    return [alias for alias in aliases if alias.strip()]
+
+
+def _parse_coordinate(value) -> float:
+    return math.nan if value in (None, "") else float(value)
+
+
+class CityRegistry:
+    """
+    Реестр городов из файла file_name и словаря urls. Города файла хранятся
+    в параллельных списках и массивах координат, для поиска - один словарь
+    ключ названия -> номер города. Файл читается при первом обращении.
+    """
+
+    def __init__(self, file_name: Optional[str] = None, urls: Optional[Dict[str, str]] = None) -> None:
+        self.file_name = file_name
+        self.urls = {} if urls is None else urls
+        self._names: List[str] = []
+        self._file_urls: List[str] = []
+        self._latitudes = array("d")
+        self._longitudes = array("d")
+        self._index: Dict[str, int] = {}
+        self._loaded = file_name is None
+        self._urls_index: Dict[str, str] = {}
+        self._urls_index_size = -1
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+    def __contains__(self, city_name: str) -> bool:
+        return self._find(city_name) is not None
+
+    def names(self) -> List[str]:
+        """Основные названия городов: сначала словаря urls, затем файла."""
+        self._ensure_loaded()
+        names = list(self.urls)
+        known = set(names)
+        names.extend(city_name for city_name in self._names if city_name not in known)
+        return names
+
+    def url_for(self, city_name: str) -> str:
+        found = self._find(city_name)
+        if found is None:
+            raise UnknownCityError([city_name])
+        return found[1]
+
+    def coordinates(self, city_name: str) -> Optional[Tuple[float, float]]:
+        """Широта и долгота города из файла; None - города нет в файле или координаты не заданы."""
+        position = self._find_in_file(city_name)
+        if position is None or math.isnan(self._latitudes[position]):
+            return None
+        return self._latitudes[position], self._longitudes[position]
+
+    def split_known(self, city_names: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Пакетный поиск: основное название -> url найденных городов в порядке
+        запроса (без повторов) и список неизвестных названий.
+        """
+        known: Dict[str, str] = {}
+        unknown: List[str] = []
+        for city_name in city_names:
+            found = self._find(city_name)
+            if found is None:
+                unknown.append(city_name)
+            else:
+                known.setdefault(*found)
+        return known, unknown
+
+    def resolve(self, city_names: Iterable[str]) -> Dict[str, str]:
+        """Как split_known, но неизвестные города - сразу UnknownCityError со всеми их названиями."""
+        known, unknown = self.split_known(city_names)
+        if unknown:
+            raise UnknownCityError(unknown)
+        return known
+
+    def _find(self, city_name: str) -> Optional[Tuple[str, str]]:
+        url = self.urls.get(city_name)
+        if url is not None:
+            return city_name, url
+        key = normalize_city_name(city_name)
+        canonical_name = self._find_in_urls(key)
+        if canonical_name is not None:
+            return canonical_name, self.urls[canonical_name]
+        position = self._find_in_file(city_name, key)
+        if position is None:
+            return None
+        canonical_name = self._names[position]
+        return canonical_name, self.urls.get(canonical_name, self._file_urls[position])
+
+    def _find_in_urls(self, key: str) -> Optional[str]:
+        canonical_name = self._urls_index.get(key)
+        if canonical_name in self.urls:
+            return canonical_name
+        # словарь urls меняется снаружи: индекс перестраивается, когда изменился его размер
+        # или найденное название из него пропало
+        if len(self.urls) != self._urls_index_size or canonical_name is not None:
+            with self._lock:
+                urls_index: Dict[str, str] = {}
+                for name in list(self.urls):
+                    urls_index.setdefault(normalize_city_name(name), name)
+                self._urls_index = urls_index
+                self._urls_index_size = len(self.urls)
+            canonical_name = urls_index.get(key)
+        return canonical_name
+
+    def _find_in_file(self, city_name: str, key: Optional[str] = None) -> Optional[int]:
+        self._ensure_loaded()
+        return self._index.get(normalize_city_name(city_name) if key is None else key)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.file_name.lower().endswith(".json"):
+                self._load_json()
+            else:
+                self._load_csv()
+            self._loaded = True
+
+    def _load_csv(self) -> None:
+        with open(self.file_name, newline="", encoding="utf-8") as file:
+            rows = csv.reader(file)
+            header = [column.strip() for column in next(rows, [])]
+            missing_columns = {"name", "url"} - set(header)
+            if missing_columns:
+                raise ValueError(f"{self.file_name}: no columns {', '.join(sorted(missing_columns))}")
+            columns = [header.index(column) if column in header else None for column in _FIELDS]
+            self._add_entries(
+                tuple(None if column is None or column >= len(row) else row[column] for column in columns)
+                for row in rows
+                if row
+            )
+
+    def _load_json(self) -> None:
+        with open(self.file_name, encoding="utf-8") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            self._add_entries((name, url, None, None, None) for name, url in data.items())
+        else:
+            self._add_entries(tuple(entry.get(field) for field in _FIELDS) for entry in data)
+
+    def _add_entries(self, entries: Iterable[Tuple]) -> None:
+        """
+        Добавление городов (name, url, latitude, longitude, aliases) из файла.
+        Города собираются в локальных списках и попадают в реестр только после
+        проверки всех записей: после ошибки реестр остается пустым, и повторное
+        обращение снова сообщает исходную ошибку файла.
+        """
+        index: Dict[str, int] = {}
+        names: List[str] = []
+        file_urls: List[str] = []
+        latitudes = array("d")
+        longitudes = array("d")
+        aliases_by_city = []
+        for city_name, url, latitude, longitude, aliases in entries:
+            city_name = (city_name or "").strip()
+            if not city_name or not url:
+                raise ValueError(f"{self.file_name}: city without name or url: {city_name or url}")
+            key = normalize_city_name(city_name)
+            if key in index:
+                raise ValueError(f"{self.file_name}: duplicate city {city_name}")
+            index[key] = len(names)
+            names.append(city_name)
+            file_urls.append(url)
+            latitudes.append(_parse_coordinate(latitude))
+            longitudes.append(_parse_coordinate(longitude))
+            aliases_by_city.append(aliases)
+        # альтернативные названия добавляются после всех основных, чтобы не перекрыть их
+        for position, aliases in enumerate(aliases_by_city):
+            for alias in _parse_aliases(aliases):
+                index.setdefault(normalize_city_name(alias), position)
+        self._index = index
+        self._names = names
+        self._file_urls = file_urls
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+
+
+_default_registry: Optional[CityRegistry] = None
+
+
+def get_city_registry() -> CityRegistry:
+    """Общий реестр: файл CITIES_FILE поверх utils.CITIES, создается при первом обращении."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = CityRegistry(CITIES_FILE, CITIES)
+    return _default_registry
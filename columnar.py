@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from config import GOOD_WEATHER_CODE_TABLE
+from calculation import to_payload
+from records import CityForecastRecord
+from windows import WindowSpec, build_aggregates, hour_bounds
+
+if TYPE_CHECKING:
+    from models import CityWeatherDataModel
+
+# таблица "код условия -> хорошая погода", код 0 - отсутствующий час
+GOOD_WEATHER_CODES = np.frombuffer(GOOD_WEATHER_CODE_TABLE, dtype=bool)
+
+
+@dataclass
+class ColumnarForecasts:
+    """
+    Колоночное представление прогнозов по городам.
+    Массивы hour/temp/condition имеют форму (города, дни, часы) и дополнены
+    нулями до максимального количества дней и часов; hour_mask отмечает
+    реальные часы, day_mask - реальные дни. condition хранит коды
+    из WEATHER_CONDITION_CODES.
+    """
+
+    city_names: List[str]
+    dates: List[List[str]]
+    hour: np.ndarray
+    temp: np.ndarray
+    condition: np.ndarray
+    hour_mask: np.ndarray
+    day_mask: np.ndarray
+
+    @classmethod
+    def from_models(
+        cls, cities_forecasts: Sequence[Union[CityForecastRecord, "CityWeatherDataModel"]]
+    ) -> "ColumnarForecasts":
+        payloads = [to_payload(city) for city in cities_forecasts]
+        days = [day for _, city_days in payloads for day in city_days]
+        days_per_city = np.fromiter((len(city_days) for _, city_days in payloads), np.int64, len(payloads))
+        hours_per_day = np.fromiter((len(day[1]) for day in days), np.int64, len(days))
+        cities_count = len(payloads)
+        days_count = int(days_per_city.max(initial=0))
+        hours_count = int(hours_per_day.max(initial=0))
+        shape = (cities_count, days_count, hours_count)
+        hour = np.zeros(shape, dtype=np.int8)
+        temp = np.zeros(shape, dtype=np.int16)
+        condition = np.zeros(shape, dtype=np.uint8)
+        hour_mask = np.zeros(shape, dtype=bool)
+        day_mask = np.zeros(shape[:2], dtype=bool)
+
+        # город и номер дня для каждого дня подряд, затем для каждого часа подряд:
+        # часы всех дней склеиваются в один буфер и раскладываются одним присваиванием
+        day_city = np.repeat(np.arange(cities_count), days_per_city)
+        day_index = np.arange(len(days)) - np.repeat(np.cumsum(days_per_city) - days_per_city, days_per_city)
+        day_mask[day_city, day_index] = True
+        # позиция каждого часа в плоском массиве (города, дни, часы): начало дня + номер часа в дне
+        day_starts = (day_city * days_count + day_index) * hours_count
+        hour_positions = np.arange(int(hours_per_day.sum())) + np.repeat(
+            day_starts - (np.cumsum(hours_per_day) - hours_per_day), hours_per_day
+        )
+        hour.reshape(-1)[hour_positions] = np.frombuffer(b"".join(day[1] for day in days), dtype=np.int8)
+        temp.reshape(-1)[hour_positions] = np.frombuffer(b"".join(day[2] for day in days), dtype=np.int16)
+        condition.reshape(-1)[hour_positions] = np.frombuffer(b"".join(day[3] for day in days), dtype=np.uint8)
+        hour_mask.reshape(-1)[hour_positions] = True
+
+        return cls(
+            city_names=[city_name for city_name, _ in payloads],
+            dates=[[day[0] for day in days] for _, days in payloads],
+            hour=hour,
+            temp=temp,
+            condition=condition,
+            hour_mask=hour_mask,
+            day_mask=day_mask,
+        )
+
+
+def _period_totals(
+    forecasts: ColumnarForecasts, min_hour: int, max_hour: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Суммы температур и часы без осадков по дням в периоде min_hour..max_hour."""
+    in_period = (
+        forecasts.hour_mask
+        & (forecasts.hour >= min_hour)
+        & (forecasts.hour <= max_hour)
+    )
+    days_temp = np.where(in_period, forecasts.temp, 0).sum(axis=2, dtype=np.int64)
+    days_good_hours = (
+        in_period & GOOD_WEATHER_CODES[forecasts.condition]
+    ).sum(axis=2)
+    return days_temp, days_good_hours
+
+
+def calculate_columnar(
+    forecasts: ColumnarForecasts,
+    min_hour: int,
+    max_hour: int,
+    windows: Sequence[WindowSpec] = (),
+) -> List[Dict]:
+    """
+    Векторизованный просчет средних температур и часов без осадков
+    сразу по всем дням и городам. Результат совпадает с
+    DataCalculationTask._calculate_data для каждого города,
+    включая агрегаты дополнительных окон windows.
+    """
+    hours_period = max_hour - min_hour
+    days_temp, days_good_hours = _period_totals(forecasts, min_hour, max_hour)
+    days_avg_temp = days_temp / hours_period
+    # дни без часов не попадают в результат, но учитываются в делителе
+    days_with_hours = forecasts.hour_mask.any(axis=2)
+    days_count = forecasts.day_mask.sum(axis=1)
+
+    # cumsum складывает дни последовательно, как цикл в _calculate_data,
+    # поэтому сумма с плавающей точкой совпадает до бита
+    total_days_temp = np.zeros(len(forecasts.city_names))
+    if days_avg_temp.shape[1]:
+        total_days_temp = np.cumsum(
+            np.where(days_with_hours, days_avg_temp, 0.0), axis=1
+        )[:, -1]
+    total_good_hours = np.where(days_with_hours, days_good_hours, 0).sum(axis=1)
+    total_avg_temp = total_days_temp / days_count
+    total_avg_good_hours = total_good_hours / days_count
+
+    bounds = hour_bounds(windows, min_hour, max_hour) if windows else []
+    # основное окно уже посчитано, остальные окна часов - теми же операциями над массивами
+    window_totals = [(days_temp, days_good_hours)] + [
+        _period_totals(forecasts, window_min_hour, window_max_hour)
+        for window_min_hour, window_max_hour in bounds[1:]
+    ]
+
+    result = []
+    for city_index, city_name in enumerate(forecasts.city_names):
+        city_days_avg_temp = days_avg_temp[city_index].tolist()
+        city_days_good_hours = days_good_hours[city_index].tolist()
+        city_days_with_hours = days_with_hours[city_index].tolist()
+        city_dates = forecasts.dates[city_index]
+        aggregates = {}
+        if windows:
+            window_day_results = []
+            for window_temp, window_good_hours in window_totals:
+                window_day_results.append(
+                    [
+                        (temp, good_hours) if with_hours else None
+                        for temp, good_hours, with_hours in zip(
+                            window_temp[city_index].tolist(),
+                            window_good_hours[city_index].tolist(),
+                            city_days_with_hours[:len(city_dates)],
+                        )
+                    ]
+                )
+            aggregates = build_aggregates(city_dates, window_day_results, windows, bounds)
+        result.append(
+            {
+                "city_name": city_name,
+                "days": [
+                    {
+                        "date": date,
+                        "average_temp": round(city_days_avg_temp[day_index], 1),
+                        "good_weather_hours": city_days_good_hours[day_index],
+                    }
+                    for day_index, date in enumerate(city_dates)
+                    if city_days_with_hours[day_index]
+                ],
+                "aggregates": aggregates,
+                "total_average_temp": round(float(total_avg_temp[city_index]), 1),
+                "total_average_good_weather_hours": round(
+                    float(total_avg_good_hours[city_index]), 1
+                ),
+            }
+        )
+    return result
@@ -1,4 +1,5 @@
 import logging
+import os
 
 WEATHER_CONDITIONS = {
     "clear", "partly-cloudy", "cloudy", "overcast", "drizzle", "light-rain",
@@ -11,15 +12,128 @@ GOOD_WEATHER_CONDITIONS = {
     "clear", "partly-cloudy", "cloudy", "overcast",
 }
 
+# компактные коды условий для колоночного представления, 0 - нет данных
+WEATHER_CONDITION_CODES = {
+    condition: code
+    for code, condition in enumerate(sorted(WEATHER_CONDITIONS), 1)
+}
+# обратная таблица: код условия -> условие (индекс 0 не используется)
+WEATHER_CONDITIONS_BY_CODE = ("", *sorted(WEATHER_CONDITIONS))
+# таблица на 256 кодов: 1 - хорошая погода. Подходит для bytes.translate
+# (коды условий дня -> признаки за один вызов) и numpy.frombuffer
+GOOD_WEATHER_CODE_TABLE = bytes(
+    condition in GOOD_WEATHER_CONDITIONS
+    for condition in WEATHER_CONDITIONS_BY_CODE + ("",) * (256 - len(WEATHER_CONDITIONS_BY_CODE))
+)
+
 logger_format = "%(asctime)s - [%(levelname)s] -  %(name)s - (%(filename)s).%(funcName)s(%(lineno)d) - %(message)s"
 
-logging.basicConfig(
-    filename="logfile.log",
-    filemode="a",
-    format=logger_format,
-    level=logging.INFO
-)
+# уровень логирования, переопределяется переменной окружения FORECAST_LOG_LEVEL
+LOG_LEVEL = os.environ.get("FORECAST_LOG_LEVEL", "INFO").upper()
+LOG_FILE_NAME = "logfile.log"
 
 logger = logging.getLogger()
 
-CSV_FILE_NAME = "city_data_table.csv"
\ No newline at end of file
+
+def configure_logging(level: str = LOG_LEVEL, filename: str = LOG_FILE_NAME) -> None:
+    """
+    Настройка записи лога в файл. Вызывается только точками входа
+    (forecasting.py, scheduler.py, read_api.py, sharding.py): импорт модулей
+    проекта, процессы пула и сбор тестов не открывают файл лога.
+    """
+    logging.basicConfig(
+        filename=filename,
+        filemode="a",
+        format=logger_format,
+        level=level
+    )
+
+
+# файл реестра городов (city_registry.py): CSV или JSON с url, координатами
+# и альтернативными названиями; None - только города utils.CITIES
+CITIES_FILE = None
+
+# имя файла результата без расширения, расширение задает формат записи
+OUTPUT_FILE_BASE_NAME = "city_data_table"
+CSV_FILE_NAME = f"{OUTPUT_FILE_BASE_NAME}.csv"
+
+# максимальное количество одновременных запросов при асинхронной загрузке
+FETCH_CONCURRENCY_LIMIT = 100
+
+# адаптивное количество одновременных запросов загрузки в пуле потоков
+# (resilience.AdaptiveConcurrencyLimiter): нижняя и верхняя границы и начальное
+# значение; равные границы задают фиксированное количество без подстройки
+FETCH_CONCURRENCY_MIN = 2
+FETCH_CONCURRENCY_MAX = 64
+FETCH_CONCURRENCY_INITIAL = 8
+
+# кэш ответов API: файл SQLite, время жизни записи в секундах и максимальное количество записей
+CACHE_FILE_NAME = "responses_cache.sqlite3"
+CACHE_TTL = 3 * 60 * 60
+CACHE_MAX_ENTRIES = 10_000
+
+# таймаут одного запроса к API и общий дедлайн этапа загрузки, в секундах
+REQUEST_TIMEOUT = 10
+FETCH_DEADLINE = 120
+
+# повторные запросы с экспоненциальной паузой и случайным разбросом
+FETCH_RETRY_ATTEMPTS = 3
+FETCH_RETRY_BASE_DELAY = 0.5
+FETCH_RETRY_MAX_DELAY = 5
+
+# circuit breaker: ошибок подряд до размыкания и время до пробного запроса
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
+# размер очередей потокового режима: сколько городов может ждать следующего этапа
+PIPELINE_QUEUE_SIZE = 64
+
+# просчет: до этого количества городов пул процессов не используется,
+# размер пачки городов на одну задачу пула (0 - подбирается по числу процессов)
+CALCULATION_INPROCESS_THRESHOLD = 100
+CALCULATION_CHUNK_SIZE = 0
+# количество процессов пула просчета; None - по квоте CPU cgroup контейнера
+# (cpu.max или cpu.cfs_quota_us), без квоты - по доступным процессу CPU
+CALCULATION_POOL_WORKERS = None
+# каталог временного файла прогнозов (forecast_weather(mmap_forecasts=True)):
+# None - системный каталог временных файлов, /dev/shm - файл только в памяти
+FORECAST_FILE_DIR = None
+
+# процессы пула просчета передают записи лога через очередь одному обработчику
+# в родительском процессе вместо конкурентной записи в logfile.log
+CALCULATION_LOG_THROUGH_QUEUE = True
+
+# хранилище результатов инкрементального просчета и время хранения неиспользуемых записей
+CALCULATION_STORE_FILE_NAME = "calculation_store.sqlite3"
+CALCULATION_STORE_MAX_AGE = 7 * 24 * 60 * 60
+
+# запись результата: городов в пачке строк, пачек в очереди к писателю, буфер файла в байтах
+AGGREGATION_BATCH_SIZE = 1000
+AGGREGATION_QUEUE_SIZE = 16
+OUTPUT_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# отчет о метриках запуска (forecast_weather(collect_metrics=True)) и его копия в формате Prometheus
+METRICS_REPORT_FILE_NAME = "run_metrics.json"
+METRICS_PROMETHEUS_FILE_NAME = "run_metrics.prom"
+
+# шардированный запуск (forecast_weather(shards=...)): каталог заданий и результатов,
+# локальных процессов-воркеров, интервал и таймаут heartbeat воркера в секундах,
+# попыток на шард до признания его городов незагруженными, интервал опроса каталога
+SHARD_SPOOL_DIR = "shards_spool"
+SHARD_LOCAL_WORKERS = 2
+SHARD_HEARTBEAT_INTERVAL = 1.0
+SHARD_HEARTBEAT_TIMEOUT = 15.0
+SHARD_MAX_ATTEMPTS = 3
+SHARD_POLL_INTERVAL = 0.1
+
+# резидентный планировщик (scheduler.py): период обновления города в секундах
+# и окно, в пределах которого города с близким временем обновления загружаются одной пачкой
+SCHEDULER_REFRESH_INTERVAL = 10 * 60
+SCHEDULER_BATCH_WINDOW = 1.0
+
+# API чтения результатов (read_api.py): адрес, количество городов в /top по умолчанию
+# и интервал проверки файла результата на обновление в секундах
+READ_API_HOST = "127.0.0.1"
+READ_API_PORT = 8085
+READ_API_TOP_DEFAULT = 10
+READ_API_RELOAD_INTERVAL = 1.0
@@ -0,0 +1,136 @@
+import json
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from config import WEATHER_CONDITIONS
+
+if TYPE_CHECKING:
+    from models import CityWeatherDataModel
+
+_FORECASTS_KEY = re.compile(rb'"forecasts"\s*:\s*\[')
+# массив hours и значение date - одним токеном, остальные строки - целиком (чтобы скобки
+# внутри строк не считались), скобки - по одной: по ним видна вложенность
+_FORECASTS_TOKEN = re.compile(
+    rb'"hours"\s*:\s*\[([^\]]*)\]|"date"\s*:\s*"([^"]*)"|"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]'
+)
+_HOUR = re.compile(rb'"hour"\s*:\s*"?(-?\d+)')
+_TEMP = re.compile(rb'"temp"\s*:\s*(-?\d+)(?![\d.eE])')
+_CONDITION = re.compile(rb'"condition"\s*:\s*"([^"]*)"')
+
+
+def extract_forecasts(body: bytes) -> Dict:
+    """
+    Достает из ответа API только forecasts[].date и hours[].hour/temp/condition,
+    не разбирая остальной документ. Значения проверяются при извлечении.
+    Учитываются только date и hours самих элементов массива forecasts: ключи
+    после массива и во вложенных объектах (например, biomet) не создают дней.
+    Если ответ не похож на ожидаемый формат, используется полный json.loads.
+    """
+    match = _FORECASTS_KEY.search(body)
+    forecasts = None if match is None else _scan_forecasts(body, match.end())
+    if forecasts is None:
+        return _extract_from_document(json.loads(body))
+    return {"forecasts": forecasts}
+
+
+def _scan_forecasts(body: bytes, start: int) -> Optional[List[Dict]]:
+    """
+    Дни массива forecasts, который начинается с позиции start. None - элемент
+    без даты, не объект или незакрытый массив: формат отличается от ожидаемого.
+    """
+    forecasts: List[Dict] = []
+    forecast: Dict = {}
+    # глубина вложенности внутри массива forecasts: 1 - сам массив, 2 - элемент forecasts
+    depth = 1
+    for token in _FORECASTS_TOKEN.finditer(body, start):
+        hours, date = token.groups()
+        text = token.group()
+        if text in (b"{", b"["):
+            depth += 1
+            if depth == 2:
+                # у элемента-массива ключей нет, он отклоняется как элемент без даты
+                forecast = {"date": None, "hours": []}
+        elif text in (b"}", b"]"):
+            depth -= 1
+            if depth == 0:
+                return forecasts
+            if depth == 1:
+                if forecast["date"] is None:
+                    return None
+                forecasts.append(forecast)
+        elif depth == 2 and date is not None:
+            forecast["date"] = date.decode("utf-8")
+        elif depth == 2 and hours is not None:
+            forecast["hours"] = _extract_hours(hours)
+    return None
+
+
+def _extract_hours(hours: bytes) -> List[Dict]:
+    """Извлечение полей из содержимого массива hours без его полного разбора."""
+    hours_count = hours.count(b"{")
+    hour_values = _HOUR.findall(hours)
+    temp_values = _TEMP.findall(hours)
+    condition_values = _CONDITION.findall(hours)
+    if not (
+        len(hour_values) == len(temp_values) == len(condition_values) == hours_count
+    ):
+        # часы в неожиданном виде (например, дробная температура) - разбираем массив целиком
+        return [_validate_hour(hour) for hour in json.loads(b"[" + hours + b"]")]
+    result = []
+    for hour, temp, condition in zip(hour_values, temp_values, condition_values):
+        condition = condition.decode("utf-8")
+        if condition not in WEATHER_CONDITIONS:
+            raise ValueError("Condition not found!")
+        result.append({"hour": int(hour), "temp": int(temp), "condition": condition})
+    return result
+
+
+def _extract_from_document(document: Dict) -> Dict:
+    """Запасной путь: отбор нужных полей из полностью разобранного документа."""
+    try:
+        return {
+            "forecasts": [
+                {
+                    "date": str(forecast["date"]),
+                    "hours": [
+                        _validate_hour(hour) for hour in forecast["hours"]
+                    ],
+                }
+                for forecast in document["forecasts"]
+            ]
+        }
+    except (KeyError, TypeError) as error:
+        raise ValueError(f"Unexpected response format: {error!r}")
+
+
+def _validate_hour(hour: Dict) -> Dict:
+    """Проверка полей часа, аналогичная ForecastHoursModel."""
+    if hour["condition"] not in WEATHER_CONDITIONS:
+        raise ValueError("Condition not found!")
+    return {
+        "hour": int(hour["hour"]),
+        "temp": int(hour["temp"]),
+        "condition": hour["condition"],
+    }
+
+
+def build_city_weather_model(city_data: Dict) -> "CityWeatherDataModel":
+    """
+    Сборка CityWeatherDataModel из результата extract_forecasts без повторной
+    валидации pydantic: поля уже проверены при извлечении.
+    """
+    from models import CityForecastDataModel, CityWeatherDataModel, ForecastHoursModel
+
+    return CityWeatherDataModel.construct(
+        city_name=city_data["city_name"],
+        forecasts=[
+            CityForecastDataModel.construct(
+                date=forecast["date"],
+                hours=[
+                    ForecastHoursModel.construct(**hour)
+                    for hour in forecast["hours"]
+                ],
+            )
+            for forecast in city_data["forecasts"]
+        ],
+    )
@@ -0,0 +1,151 @@
+"""
+Файл прогнозов для просчета без передачи данных городов в процессы пула.
+
+DataFetchingTask.fetch_forecasts_to_file дописывает каждый загруженный город
+в конец файла в компактном двоичном виде (часы, температуры и коды условий
+подряд, как в DayPayload) и запоминает только его смещение. Процессы пула
+получают имя файла и смещения своих городов, отображают файл в память (mmap)
+и читают часы и температуры через memoryview без копирования: данные лежат
+в страничном кэше один раз для всех процессов.
+
+Формат города (порядок байтов платформы, файл временный и читается на той же машине):
+    <H длина имени><H количество дней><имя utf-8>
+    для каждого дня: <B длина даты><H количество часов><дата>
+                     <часы int8 * n><температуры int16 * n><коды условий uint8 * n>
+"""
+import mmap
+import struct
+from array import array
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from calculation import calculate_payload
+from records import CityForecastRecord, CityPayload
+from windows import WindowSpec
+
+_CITY_HEADER = struct.Struct("=HH")
+_DAY_HEADER = struct.Struct("=BH")
+_TEMP_SIZE = array("h").itemsize
+
+
+def encode_city(city: CityForecastRecord) -> bytes:
+    """Двоичное представление города для файла прогнозов."""
+    city_name = city.city_name.encode("utf-8")
+    parts = [_CITY_HEADER.pack(len(city_name), len(city.days)), city_name]
+    for date, hours, temps, conditions in city.days:
+        date_bytes = date.encode("utf-8")
+        parts.append(_DAY_HEADER.pack(len(date_bytes), len(hours)))
+        parts.append(date_bytes)
+        parts.append(hours.tobytes())
+        parts.append(temps.tobytes())
+        parts.append(conditions)
+    return b"".join(parts)
+
+
+def read_city(buffer: memoryview, offset: int) -> CityPayload:
+    """
+    Город по смещению offset. Часы и температуры - memoryview поверх buffer
+    (без копирования), коды условий копируются в bytes: просчет переводит
+    их в признаки хорошей погоды через bytes.translate.
+    """
+    name_length, days_count = _CITY_HEADER.unpack_from(buffer, offset)
+    position = offset + _CITY_HEADER.size
+    city_name = str(buffer[position:position + name_length], "utf-8")
+    position += name_length
+    days = []
+    for _ in range(days_count):
+        date_length, hours_count = _DAY_HEADER.unpack_from(buffer, position)
+        position += _DAY_HEADER.size
+        date = str(buffer[position:position + date_length], "utf-8")
+        position += date_length
+        hours = buffer[position:position + hours_count].cast("b")
+        position += hours_count
+        temps = buffer[position:position + hours_count * _TEMP_SIZE].cast("h")
+        position += hours_count * _TEMP_SIZE
+        conditions = bytes(buffer[position:position + hours_count])
+        position += hours_count
+        days.append((date, hours, temps, conditions))
+    return city_name, days
+
+
+def map_file(file_name: str) -> memoryview:
+    """Отображение файла прогнозов в память только для чтения."""
+    with open(file_name, "rb") as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def calculate_file_chunk(
+    offsets: Sequence[int],
+    min_hour: int,
+    max_hour: int,
+    file_name: str,
+    windows: Sequence[WindowSpec] = (),
+) -> List[Dict]:
+    """
+    Просчет городов файла file_name по смещениям offsets - задача для
+    процесса-воркера. В процесс передаются только имя файла и смещения.
+    """
+    if not offsets:
+        return []
+    buffer = map_file(file_name)
+    return [
+        calculate_payload(read_city(buffer, offset), min_hour, max_hour, windows)
+        for offset in offsets
+    ]
+
+
+class ForecastFileWriter:
+    """
+    Запись городов в конец файла прогнозов. append возвращает смещение
+    записанного города, по которому его читают read_city и calculate_file_chunk.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self._file = open(file_name, "ab")
+        self._offset = self._file.tell()
+
+    def __enter__(self) -> "ForecastFileWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, city: CityForecastRecord) -> int:
+        offset = self._offset
+        self._offset += self._file.write(encode_city(city))
+        return offset
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ForecastFile:
+    """
+    Города файла прогнозов в исходном порядке: имя файла и смещения городов.
+    DataCalculationTask считает такой набор в процессах пула, передавая
+    только смещения; при переборе города читаются в CityForecastRecord.
+    """
+
+    def __init__(self, file_name: str, offsets: List[int]) -> None:
+        self.file_name = file_name
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[CityForecastRecord]:
+        if not self.offsets:
+            return
+        buffer = map_file(self.file_name)
+        for offset in self.offsets:
+            city_name, days = read_city(buffer, offset)
+            yield CityForecastRecord(city_name, [_copy_day(day) for day in days])
+
+
+def _copy_day(day: Tuple[str, memoryview, memoryview, bytes]) -> Tuple[str, array, array, bytes]:
+    date, hours, temps, conditions = day
+    hours_array = array("b")
+    hours_array.frombytes(hours.cast("B"))
+    temps_array = array("h")
+    temps_array.frombytes(temps.cast("B"))
+    return date, hours_array, temps_array, conditions
@@ -1,32 +1,217 @@
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from city_registry import get_city_registry
+from config import (
+    logger,
+    configure_logging,
+    CACHE_FILE_NAME,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    CALCULATION_STORE_FILE_NAME,
+    CALCULATION_STORE_MAX_AGE,
+    FORECAST_FILE_DIR,
+    METRICS_REPORT_FILE_NAME,
+    METRICS_PROMETHEUS_FILE_NAME,
+)
+from metrics import run_metrics
+from forecast_file import ForecastFile
+from records import CalculatedCityRecord, CityForecastRecord
 from tasks import (
     DataFetchingTask,
     DataCalculationTask,
     DataAggregationTask,
     DataAnalyzingTask,
+    create_api_client,
 )
-from utils import CITIES
+from windows import WindowSpec
 
 
-def forecast_weather():
+def forecast_weather(
+    use_async_fetch: bool = False,
+    use_cache: bool = False,
+    pipelined: bool = False,
+    lean_extraction: bool = False,
+    vectorized: bool = False,
+    incremental: bool = False,
+    output_format: str = "csv",
+    collect_metrics: bool = False,
+    prometheus_metrics: bool = False,
+    profile_stage: Optional[str] = None,
+    profile_mode: str = "cprofile",
+    windows: Sequence[WindowSpec] = (),
+    shards: int = 0,
+    mmap_forecasts: bool = False,
+):
     """
     Анализ погодных условий по городам
+    :param use_async_fetch: загружать данные в одном event loop вместо пула потоков
+    :param use_cache: использовать кэш ответов API на диске
+    :param pipelined: считать данные по городу сразу после его загрузки
+    :param lean_extraction: извлекать из ответов API только нужные для просчета поля
+    :param vectorized: считать данные векторизованно через numpy (без потокового режима)
+    :param incremental: пересчитывать только города и дни, данные по которым изменились
+    :param output_format: формат файла результата: csv, jsonl, wfcol (колоночный) или xlsx
+    :param collect_metrics: собрать метрики этапов и записать отчет в METRICS_REPORT_FILE_NAME
+    :param prometheus_metrics: дополнительно записать метрики в METRICS_PROMETHEUS_FILE_NAME
+    :param profile_stage: этап для профилирования (fetch, validation, calculation, analysis, aggregation)
+    :param profile_mode: профилировщик этапа: cprofile или tracemalloc
+    :param windows: дополнительные окна просчета (windows.py), например DAYTIME_WINDOWS;
+        агрегаты окон записываются только в формате jsonl, в csv, wfcol и xlsx
+        (колонка на дату) их нет
+    :param shards: разделить города на shards шардов и считать их процессами-воркерами
+        через каталог SHARD_SPOOL_DIR (sharding.py); use_async_fetch, use_cache, pipelined,
+        vectorized и incremental в этом режиме не применяются
+    :param mmap_forecasts: записывать загруженные города во временный файл прогнозов
+        (forecast_file.py), процессы пула читают свои города из него через mmap;
+        загрузка идет пулом потоков, use_async_fetch не применяется
     """
-    cities = list(CITIES)
+    if collect_metrics or prometheus_metrics or profile_stage:
+        run_metrics.enable(profile_stage, profile_mode)
+    try:
+        _forecast_weather(
+            use_async_fetch,
+            use_cache,
+            pipelined,
+            lean_extraction,
+            vectorized,
+            incremental,
+            output_format,
+            windows,
+            shards,
+            mmap_forecasts,
+        )
+    finally:
+        if run_metrics.enabled:
+            run_metrics.disable()
+            if collect_metrics:
+                run_metrics.write_report(METRICS_REPORT_FILE_NAME)
+            if prometheus_metrics:
+                run_metrics.write_prometheus(METRICS_PROMETHEUS_FILE_NAME)
+
 
-    fetch_data_service = DataFetchingTask(cities)
-    cities_forecasts = fetch_data_service.fetch_forecasts()
+def _forecast_weather(
+    use_async_fetch: bool,
+    use_cache: bool,
+    pipelined: bool,
+    lean_extraction: bool,
+    vectorized: bool,
+    incremental: bool,
+    output_format: str,
+    windows: Sequence[WindowSpec],
+    shards: int,
+    mmap_forecasts: bool,
+):
+    cities = get_city_registry().names()
+    if windows and output_format != "jsonl":
+        logger.warning(f"Агрегаты окон не записываются в формат {output_format}, только в jsonl")
 
-    calc_data_service = DataCalculationTask(cities_forecasts)
-    calculated_data = calc_data_service.get_calculated_data()
+    if shards:
+        from sharding import ShardCoordinator
+
+        coordinator = ShardCoordinator(
+            cities, shards, lean_extraction=lean_extraction, windows=windows
+        )
+        calculated_data = coordinator.run()
+        failed_cities = coordinator.failed_cities
+    else:
+        calculated_data, failed_cities = _fetch_and_calculate(
+            cities,
+            use_async_fetch,
+            use_cache,
+            pipelined,
+            lean_extraction,
+            vectorized,
+            incremental,
+            windows,
+            mmap_forecasts,
+        )
+    if failed_cities:
+        print(f"Не удалось получить данные для городов: {failed_cities}")
 
     analyzer_data_service = DataAnalyzingTask(calculated_data)
     analyzed_data = analyzer_data_service.analyze_data()
 
     aggregation_service = DataAggregationTask(analyzed_data)
-    aggregation_service.save_data_to_csv()
+    aggregation_service.save_data(output_format)
+
+    if len(analyzer_data_service.main_towns) > 1:
+        print(
+            "Самые удачные города для посещения - "
+            f"{', '.join(analyzer_data_service.main_towns)}"
+        )
+    else:
+        print(f"Самый удачный город для посещения это - {analyzer_data_service.main_town}")
+
+
+def _fetch_and_calculate(
+    cities: List[str],
+    use_async_fetch: bool,
+    use_cache: bool,
+    pipelined: bool,
+    lean_extraction: bool,
+    vectorized: bool,
+    incremental: bool,
+    windows: Sequence[WindowSpec],
+    mmap_forecasts: bool,
+) -> Tuple[List[CalculatedCityRecord], Dict[str, str]]:
+    """Загрузка и просчет в текущем процессе, возвращает результат и незагруженные города."""
+    cache = None
+    if use_cache:
+        from cache import ResponseCache
+
+        cache = ResponseCache(CACHE_FILE_NAME, CACHE_TTL, CACHE_MAX_ENTRIES)
+    fetch_data_service = DataFetchingTask(
+        cities, create_api_client(cache, lean_extraction)
+    )
+    if pipelined:
+        from pipeline import StreamingForecastPipeline
+
+        calculated_data = StreamingForecastPipeline(fetch_data_service, windows=windows).run()
+    elif mmap_forecasts:
+        file_descriptor, forecast_file_name = tempfile.mkstemp(".wfraw", dir=FORECAST_FILE_DIR)
+        os.close(file_descriptor)
+        try:
+            cities_forecasts = fetch_data_service.fetch_forecasts_to_file(forecast_file_name)
+            calculated_data = _calculate(cities_forecasts, incremental, vectorized, windows)
+        finally:
+            os.remove(forecast_file_name)
+    else:
+        if use_async_fetch:
+            cities_forecasts = fetch_data_service.fetch_forecasts_async()
+        else:
+            cities_forecasts = fetch_data_service.fetch_forecasts()
+        calculated_data = _calculate(cities_forecasts, incremental, vectorized, windows)
+    if cache is not None:
+        logger.info(f"Статистика кэша ответов API: {cache.stats()}")
+        cache.close()
+    return calculated_data, fetch_data_service.failed_cities
+
+
+def _calculate(
+    cities_forecasts: Union[List[CityForecastRecord], ForecastFile],
+    incremental: bool,
+    vectorized: bool,
+    windows: Sequence[WindowSpec],
+) -> List[CalculatedCityRecord]:
+    """Просчет загруженных городов: обычный, инкрементальный или векторизованный."""
+    store = None
+    if incremental:
+        from calculation_store import CalculationStore
 
-    print(f"Самый удачный город для посещения это - {analyzer_data_service.main_town}")
+        store = CalculationStore(CALCULATION_STORE_FILE_NAME)
+    calc_data_service = DataCalculationTask(cities_forecasts, store, windows)
+    if vectorized:
+        calculated_data = calc_data_service.get_calculated_data_vectorized()
+    else:
+        calculated_data = calc_data_service.get_calculated_data()
+    if store is not None:
+        store.prune(CALCULATION_STORE_MAX_AGE)
+        store.close()
+    return calculated_data
 
 
 if __name__ == "__main__":
+    configure_logging()
     forecast_weather()
@@ -0,0 +1,166 @@
+import hashlib
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Dict, Iterable, Optional
+
+EXAMPLE_RESPONSE_PATH = Path(__file__).resolve().parent / "examples" / "response.json"
+
+
+class _WeatherRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_WeatherHTTPServer"
+
+    def do_GET(self) -> None:
+        path = self.path.lstrip("/")
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            failures_left = server.failures_left.get(path, 0)
+            if failures_left:
+                server.failures_left[path] = failures_left - 1
+            rate_limited = server.concurrency_limit is not None and server.in_flight >= server.concurrency_limit
+            if not rate_limited:
+                server.in_flight += 1
+        if rate_limited:
+            self.send_error(429)
+            return
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            if failures_left:
+                self.send_error(server.failure_status)
+                return
+            self._send_body(path)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_body(self, path: str) -> None:
+        body = self.server.responses.get(path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Не засоряем вывод логами каждого запроса."""
+
+
+class _WeatherHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        responses: Dict[str, bytes],
+        latency: float,
+        failures: int,
+        failure_status: int,
+        concurrency_limit: Optional[int],
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _WeatherRequestHandler)
+        self.responses = responses
+        self.latency = latency
+        self.failures_left = {path: failures for path in responses}
+        self.failure_status = failure_status
+        self.concurrency_limit = concurrency_limit
+        self.in_flight = 0
+        self.request_count = 0
+        self.lock = Lock()
+
+    def handle_error(self, request, client_address) -> None:
+        """Клиент мог закрыть соединение по таймауту, это не ошибка сервера."""
+
+
+class LocalWeatherServer:
+    """
+    Локальный HTTP-сервер, подменяющий API Яндекс Погоды в тестах и бенчмарках.
+    Ответ для города отдается по пути /<city_name>.json.
+    Первые failures запросов по каждому городу завершаются ошибкой failure_status.
+    Запросы сверх concurrency_limit одновременных получают ответ 429.
+    """
+
+    def __init__(
+        self,
+        responses: Dict[str, bytes],
+        latency: float = 0.0,
+        failures: int = 0,
+        failure_status: int = 503,
+        concurrency_limit: Optional[int] = None,
+    ) -> None:
+        self.responses = dict(responses)
+        self.latency = latency
+        self.failures = failures
+        self.failure_status = failure_status
+        self.concurrency_limit = concurrency_limit
+        self._server: Optional[_WeatherHTTPServer] = None
+        self._thread: Optional[Thread] = None
+
+    @classmethod
+    def from_example(
+        cls, cities: Iterable[str], latency: float = 0.0, **kwargs
+    ) -> "LocalWeatherServer":
+        """Сервер, отдающий examples/response.json для каждого из городов."""
+        body = EXAMPLE_RESPONSE_PATH.read_bytes()
+        return cls({city: body for city in cities}, latency, **kwargs)
+
+    @classmethod
+    def from_synthetic(
+        cls, cities: Iterable[str], days_count: int, latency: float = 0.0, seed: int = 0, **kwargs
+    ) -> "LocalWeatherServer":
+        """Сервер, отдающий синтетические ответы на days_count дней (replay.generate_responses)."""
+        from replay import generate_responses
+
+        return cls(generate_responses(cities, days_count, seed), latency, **kwargs)
+
+    def __enter__(self) -> "LocalWeatherServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._server = _WeatherHTTPServer(
+            {f"{city}.json": body for city, body in self.responses.items()},
+            self.latency,
+            self.failures,
+            self.failure_status,
+            self.concurrency_limit,
+        )
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def request_count(self) -> int:
+        """Количество запросов, обработанных сервером."""
+        return self._server.request_count if self._server is not None else 0
+
+    def url_for(self, city_name: str) -> str:
+        if self._server is None:
+            raise RuntimeError("Server is not started")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{city_name}.json"
+
+    def urls(self) -> Dict[str, str]:
+        """Словарь город -> url в формате utils.CITIES."""
+        return {city: self.url_for(city) for city in self.responses}
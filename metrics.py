@@ -0,0 +1,234 @@
+"""
+Метрики запуска прогноза: время этапов, счетчики, гистограммы и профилирование.
+
+Сбор выключен по умолчанию: пока run_metrics не включен, каждый вызов
+сводится к проверке одного флага. Метрики собираются в родительском процессе,
+время CPU - time.process_time() всего процесса (все потоки, без процессов пула).
+"""
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+# границы корзин гистограмм: задержки в секундах и глубина очередей
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+_TRACEMALLOC_TOP_LINES = 25
+_NULL_CONTEXT = nullcontext()
+# признак профилирования через tracemalloc вместо объекта cProfile.Profile
+_TRACEMALLOC_PROFILER = object()
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def to_dict(self) -> Dict:
+        # корзины накопительные, как в Prometheus
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class RunMetrics:
+    """
+    Метрики одного запуска.
+    stage - время этапа (wall и CPU), increment - счетчик, observe - гистограмма,
+    set_max - максимум значения (например, глубины очереди).
+    Этап profile_stage дополнительно профилируется через cProfile
+    (только поток, выполняющий этап) или tracemalloc, результат пишется в profile_file.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, _Histogram] = {}
+        self.profile_stage: Optional[str] = None
+        self.profile_mode = "cprofile"
+        self.profile_file: Optional[str] = None
+
+    def enable(
+        self,
+        profile_stage: Optional[str] = None,
+        profile_mode: str = "cprofile",
+        profile_file: Optional[str] = None,
+    ) -> None:
+        """Включение сбора метрик с очисткой предыдущих значений."""
+        if profile_mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile_mode!r}, expected one of {PROFILE_MODES}")
+        with self._lock:
+            self.reset()
+            self.profile_stage = profile_stage
+            self.profile_mode = profile_mode
+            self.profile_file = profile_file or f"{profile_stage}.{profile_mode}"
+            self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def stage(self, name: str):
+        """Контекстный менеджер измерения этапа name."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._measure_stage(name)
+
+    @contextmanager
+    def _measure_stage(self, name: str) -> Iterator[None]:
+        profiler = self._start_profiler(name)
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_started
+            cpu_time = time.process_time() - cpu_started
+            if profiler is not None:
+                self._stop_profiler(profiler)
+            with self._lock:
+                stage = self.stages.setdefault(
+                    name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+                )
+                stage["calls"] += 1
+                stage["wall_seconds"] += wall_time
+                stage["cpu_seconds"] += cpu_time
+
+    def increment(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_max(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if value > self.gauges.get(name, value - 1):
+                self.gauges[name] = value
+
+    def observe(
+        self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def _start_profiler(self, name: str) -> Optional[object]:
+        if name != self.profile_stage:
+            return None
+        if self.profile_mode == "cprofile":
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        import tracemalloc
+
+        tracemalloc.start()
+        return _TRACEMALLOC_PROFILER
+
+    def _stop_profiler(self, profiler) -> None:
+        if profiler is _TRACEMALLOC_PROFILER:
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.set_max(f"{self.profile_stage}_traced_peak_bytes", peak)
+            with open(self.profile_file, "w") as file:
+                file.write(f"peak traced memory: {peak} bytes\n")
+                file.write("allocations alive at the end of the stage:\n")
+                for statistic in snapshot.statistics("lineno")[:_TRACEMALLOC_TOP_LINES]:
+                    file.write(f"{statistic}\n")
+            return
+        profiler.disable()
+        profiler.dump_stats(self.profile_file)
+
+    def report(self) -> Dict:
+        """Отчет о запуске в виде словаря, пригодного для json.dumps."""
+        with self._lock:
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: histogram.to_dict() for name, histogram in self.histograms.items()
+                },
+            }
+
+    def write_report(self, file_name: str) -> None:
+        with open(file_name, "w") as file:
+            json.dump(self.report(), file, indent=2, ensure_ascii=False)
+
+    def write_prometheus(self, file_name: str, prefix: str = "forecast") -> None:
+        """Запись метрик в текстовом формате Prometheus (для node_exporter textfile)."""
+        with open(file_name, "w") as file:
+            file.write("\n".join(self.prometheus_lines(prefix)) + "\n")
+
+    def prometheus_lines(self, prefix: str = "forecast") -> List[str]:
+        report = self.report()
+        lines = []
+        for metric in ("wall_seconds", "cpu_seconds", "calls"):
+            lines.append(f"# TYPE {prefix}_stage_{metric} gauge")
+            for name, stage in report["stages"].items():
+                lines.append(f'{prefix}_stage_{metric}{{stage="{name}"}} {stage[metric]}')
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in report["gauges"].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        for name, histogram in report["histograms"].items():
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{prefix}_{name}_sum {histogram['sum']}")
+            lines.append(f"{prefix}_{name}_count {histogram['count']}")
+        return lines
+
+
+run_metrics = RunMetrics()
+
+
+def measured_stage(name: str) -> Callable:
+    """Декоратор: вызов функции измеряется как этап name в run_metrics."""
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not run_metrics.enabled:
+                return function(*args, **kwargs)
+            with run_metrics.stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
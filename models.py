@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, validator
 
 from config import WEATHER_CONDITIONS
+from records import validate_date
 
 
 class ForecastHoursModel(BaseModel):
@@ -21,6 +22,8 @@ class CityForecastDataModel(BaseModel):
     date: str
     hours: List[ForecastHoursModel]
 
+    _validate_date = validator("date", allow_reuse=True)(validate_date)
+
 
 class CityWeatherDataModel(BaseModel):
     city_name: str
@@ -33,12 +36,20 @@ class CityDayWeatherModel(BaseModel):
     good_weather_hours: int
 
 
+class AggregateRowModel(BaseModel):
+    key: str
+    average_temp: float
+    good_weather_hours: float
+
+
 class CalculatedCityWeatherDataModel(BaseModel):
     city_name: str
     days: List[CityDayWeatherModel]
     total_average_temp: float
     total_average_good_weather_hours: float
     rating: Optional[int]
+    # дополнительные агрегаты (windows.py): название окна -> строки
+    aggregates: Dict[str, List[AggregateRowModel]] = {}
 
     def get_avg_temp_data(self) -> List[float]:
         """Метод модели возвращает список средних температур по всем дням."""
@@ -0,0 +1,381 @@
+"""
+Потоковые писатели результата DataAggregationTask.
+
+Писатель получает города пачками и сразу пишет их в файл, поэтому потребление
+памяти не зависит от количества городов. Даты столбцов берутся по первому городу,
+как и в исходной csv таблице.
+"""
+import csv
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from array import array
+from typing import TYPE_CHECKING, Dict, IO, List, Sequence, Tuple, Type
+from xml.sax.saxutils import escape
+
+from config import OUTPUT_WRITE_BUFFER_SIZE
+
+if TYPE_CHECKING:
+    from models import CalculatedCityWeatherDataModel
+
+COLUMNAR_MAGIC = b"WFCOL01\n"
+_COLUMNAR_ALIGNMENT = 8
+_BYTE_ORDER = "<" if sys.byteorder == "little" else ">"
+# пропуски в колоночном формате: нет рейтинга или нет данных за день
+COLUMNAR_MISSING_INT = -1
+
+
+def table_headers(dates: Sequence[str]) -> List[str]:
+    """Заголовки таблицы для табличных форматов (csv, xlsx)."""
+    return ["Город/день", "", *dates, "Среднее", "Рейтинг"]
+
+
+def city_rows(city: "CalculatedCityWeatherDataModel") -> Tuple[List, List]:
+    """Две строки таблицы по городу: средние температуры и часы без осадков."""
+    return (
+        [
+            city.city_name,
+            "Температура, среднее",
+            *city.get_avg_temp_data(),
+            city.total_average_temp,
+            city.rating,
+        ],
+        [
+            "",
+            "Без осадков, часов",
+            *city.get_all_good_weather_hours(),
+            city.total_average_good_weather_hours,
+            "",
+        ],
+    )
+
+
+class OutputWriter:
+    """
+    Базовый потоковый писатель.
+    write_cities вызывается для каждой пачки городов по порядку, close завершает файл,
+    discard закрывает файл без завершения (файл удаляет вызывающий код).
+    """
+
+    extension = ""
+
+    def __init__(self, file_name: str, dates: Sequence[str]) -> None:
+        self.file_name = file_name
+        self.dates = list(dates)
+
+    def write_cities(self, cities: Sequence["CalculatedCityWeatherDataModel"]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def discard(self) -> None:
+        self.close()
+
+
+class CsvOutputWriter(OutputWriter):
+    """Таблица csv с QUOTE_NONNUMERIC, две строки на город."""
+
+    extension = "csv"
+
+    def __init__(self, file_name: str, dates: Sequence[str]) -> None:
+        super().__init__(file_name, dates)
+        self._file = open(file_name, "w", buffering=OUTPUT_WRITE_BUFFER_SIZE)
+        self._writer = csv.writer(self._file, quoting=csv.QUOTE_NONNUMERIC)
+        self._writer.writerow(table_headers(self.dates))
+
+    def write_cities(self, cities: Sequence["CalculatedCityWeatherDataModel"]) -> None:
+        for city in cities:
+            self._writer.writerows(city_rows(city))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JsonLinesOutputWriter(OutputWriter):
+    """
+    JSON Lines: один объект на город, числа сохраняют свои типы.
+    Агрегаты дополнительных окон (windows.py) пишутся только в этот формат.
+    """
+
+    extension = "jsonl"
+
+    def __init__(self, file_name: str, dates: Sequence[str]) -> None:
+        super().__init__(file_name, dates)
+        self._file = open(file_name, "w", encoding="utf-8", buffering=OUTPUT_WRITE_BUFFER_SIZE)
+
+    def write_cities(self, cities: Sequence["CalculatedCityWeatherDataModel"]) -> None:
+        self._file.writelines(
+            json.dumps(
+                {
+                    "city_name": city.city_name,
+                    "days": [
+                        {
+                            "date": day.date,
+                            "average_temp": day.average_temp,
+                            "good_weather_hours": day.good_weather_hours,
+                        }
+                        for day in city.days
+                    ],
+                    "total_average_temp": city.total_average_temp,
+                    "total_average_good_weather_hours": city.total_average_good_weather_hours,
+                    "rating": city.rating,
+                    "aggregates": _aggregates_dicts(city),
+                },
+                ensure_ascii=False,
+            ) + "\n"
+            for city in cities
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _aggregates_dicts(city: "CalculatedCityWeatherDataModel") -> Dict[str, List[Dict]]:
+    """Агрегаты дополнительных окон в виде словарей (у модели pydantic строки - модели)."""
+    return {
+        name: [row if isinstance(row, dict) else row.dict() for row in rows]
+        for name, rows in city.aggregates.items()
+    }
+
+
+class ColumnarOutputWriter(OutputWriter):
+    """
+    Двоичный колоночный формат для отображения в память.
+
+    Файл: COLUMNAR_MAGIC, длина заголовка (uint64), заголовок JSON и колонки,
+    выровненные по 8 байт. Заголовок описывает каждую колонку: dtype в нотации
+    numpy, смещение от начала файла и форму, поэтому колонку можно открыть через
+    numpy.memmap или read_columnar. Названия городов хранятся одной строкой utf-8
+    (city_name_data) и смещениями начала каждого названия (city_name_offsets).
+    Пропущенные дни: NaN в average_temp и COLUMNAR_MISSING_INT в good_weather_hours.
+
+    Пока города поступают, колонки копятся во временных файлах, при close
+    они последовательно копируются в итоговый файл.
+    """
+
+    extension = "wfcol"
+    _COLUMNS = (
+        ("city_name_offsets", "q"),
+        ("city_name_data", "B"),
+        ("total_average_temp", "d"),
+        ("total_average_good_weather_hours", "d"),
+        ("rating", "q"),
+        ("average_temp", "d"),
+        ("good_weather_hours", "q"),
+    )
+    _DTYPES = {"q": "i8", "d": "f8", "B": "u1"}
+
+    def __init__(self, file_name: str, dates: Sequence[str]) -> None:
+        super().__init__(file_name, dates)
+        spool_dir = os.path.dirname(os.path.abspath(file_name))
+        self._spools: Dict[str, IO[bytes]] = {
+            name: tempfile.TemporaryFile(dir=spool_dir) for name, _ in self._COLUMNS
+        }
+        self._date_indexes = {date: index for index, date in enumerate(self.dates)}
+        self._cities_count = 0
+        self._name_bytes = 0
+        self._spools["city_name_offsets"].write(array("q", [0]).tobytes())
+
+    def write_cities(self, cities: Sequence["CalculatedCityWeatherDataModel"]) -> None:
+        days_count = len(self.dates)
+        columns = {name: array(typecode) for name, typecode in self._COLUMNS}
+        names = bytearray()
+        for city in cities:
+            names += city.city_name.encode("utf-8")
+            columns["city_name_offsets"].append(self._name_bytes + len(names))
+            columns["total_average_temp"].append(city.total_average_temp)
+            columns["total_average_good_weather_hours"].append(city.total_average_good_weather_hours)
+            columns["rating"].append(COLUMNAR_MISSING_INT if city.rating is None else city.rating)
+            average_temp = [float("nan")] * days_count
+            good_weather_hours = [COLUMNAR_MISSING_INT] * days_count
+            for day in city.days:
+                index = self._date_indexes.get(day.date)
+                if index is not None:
+                    average_temp[index] = day.average_temp
+                    good_weather_hours[index] = day.good_weather_hours
+            columns["average_temp"].extend(average_temp)
+            columns["good_weather_hours"].extend(good_weather_hours)
+        columns["city_name_data"].frombytes(names)
+        for name, column in columns.items():
+            self._spools[name].write(column.tobytes())
+        self._cities_count += len(cities)
+        self._name_bytes += len(names)
+
+    def close(self) -> None:
+        sizes = {name: spool.tell() for name, spool in self._spools.items()}
+        header = self._build_header(sizes)
+        with open(self.file_name, "wb", buffering=OUTPUT_WRITE_BUFFER_SIZE) as file:
+            file.write(COLUMNAR_MAGIC)
+            file.write(struct.pack("<Q", len(header)))
+            file.write(header)
+            for name, _ in self._COLUMNS:
+                spool = self._spools[name]
+                spool.seek(0)
+                shutil.copyfileobj(spool, file, OUTPUT_WRITE_BUFFER_SIZE)
+                file.write(b"\0" * (_aligned(sizes[name]) - sizes[name]))
+        self.discard()
+
+    def discard(self) -> None:
+        for spool in self._spools.values():
+            spool.close()
+
+    def _build_header(self, sizes: Dict[str, int]) -> bytes:
+        """Заголовок JSON, дополненный пробелами до выравнивания первой колонки."""
+        shapes = {
+            "city_name_offsets": [self._cities_count + 1],
+            "city_name_data": [self._name_bytes],
+            "average_temp": [self._cities_count, len(self.dates)],
+            "good_weather_hours": [self._cities_count, len(self.dates)],
+        }
+        header_body = {"cities": self._cities_count, "dates": self.dates, "columns": {}}
+        # смещения зависят от длины заголовка, поэтому подбираем ее до совпадения
+        header_size = 0
+        while True:
+            offset = _aligned(len(COLUMNAR_MAGIC) + 8 + header_size)
+            for name, typecode in self._COLUMNS:
+                header_body["columns"][name] = {
+                    "dtype": _BYTE_ORDER + self._DTYPES[typecode] if typecode != "B" else "|u1",
+                    "offset": offset,
+                    "shape": shapes.get(name, [self._cities_count]),
+                }
+                offset += _aligned(sizes[name])
+            header = json.dumps(header_body, ensure_ascii=False).encode("utf-8")
+            if len(header) <= header_size:
+                return header.ljust(header_size)
+            header_size = _aligned(len(COLUMNAR_MAGIC) + 8 + len(header)) - len(COLUMNAR_MAGIC) - 8
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _COLUMNAR_ALIGNMENT) * _COLUMNAR_ALIGNMENT
+
+
+def read_columnar(file_name: str) -> Tuple[Dict, Dict[str, memoryview]]:
+    """
+    Открытие файла колоночного формата через mmap.
+    Возвращает заголовок и колонки как memoryview без копирования данных.
+    """
+    with open(file_name, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC:
+        mapped.close()
+        raise ValueError(f"{file_name} is not a columnar forecasts file")
+    header_start = len(COLUMNAR_MAGIC) + 8
+    (header_size,) = struct.unpack_from("<Q", mapped, len(COLUMNAR_MAGIC))
+    header = json.loads(mapped[header_start:header_start + header_size])
+    buffer = memoryview(mapped)
+    columns = {}
+    for name, column in header["columns"].items():
+        typecode = {"i8": "q", "f8": "d", "u1": "B"}[column["dtype"][1:]]
+        shape = column["shape"]
+        size = array(typecode).itemsize
+        for dimension in shape:
+            size *= dimension
+        view = buffer[column["offset"]:column["offset"] + size]
+        columns[name] = view.cast(typecode, shape) if size else view.cast(typecode)
+    return header, columns
+
+
+class XlsxOutputWriter(OutputWriter):
+    """
+    Книга xlsx с одним листом, строки как в csv таблице.
+    Лист пишется в zip архив потоково, строки хранятся inline без таблицы общих строк.
+    """
+
+    extension = "xlsx"
+    _STATIC_PARTS = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Погода" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            'Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ),
+    }
+
+    def __init__(self, file_name: str, dates: Sequence[str]) -> None:
+        super().__init__(file_name, dates)
+        self._archive = zipfile.ZipFile(file_name, "w", zipfile.ZIP_DEFLATED)
+        for part_name, content in self._STATIC_PARTS.items():
+            self._archive.writestr(part_name, content)
+        self._sheet = self._archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._rows_count = 0
+        self._write_rows([table_headers(self.dates)])
+
+    def write_cities(self, cities: Sequence["CalculatedCityWeatherDataModel"]) -> None:
+        self._write_rows([row for city in cities for row in city_rows(city)])
+
+    def _write_rows(self, rows: List[List]) -> None:
+        chunks = []
+        for row in rows:
+            self._rows_count += 1
+            chunks.append(f'<row r="{self._rows_count}">')
+            for value in row:
+                if value is None or value == "":
+                    chunks.append("<c/>")
+                elif isinstance(value, str):
+                    chunks.append(f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+                else:
+                    chunks.append(f"<c><v>{value}</v></c>")
+            chunks.append("</row>")
+        self._sheet.write("".join(chunks).encode("utf-8"))
+
+    def close(self) -> None:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self.discard()
+
+    def discard(self) -> None:
+        self._sheet.close()
+        self._archive.close()
+
+
+OUTPUT_WRITERS: Dict[str, Type[OutputWriter]] = {
+    writer.extension: writer
+    for writer in (CsvOutputWriter, JsonLinesOutputWriter, ColumnarOutputWriter, XlsxOutputWriter)
+}
+
+
+def get_output_writer(output_format: str) -> Type[OutputWriter]:
+    """Класс писателя по названию формата (расширению файла)."""
+    try:
+        return OUTPUT_WRITERS[output_format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown output format {output_format!r}, expected one of {sorted(OUTPUT_WRITERS)}"
+        ) from None
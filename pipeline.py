@@ -0,0 +1,79 @@
+from queue import Queue
+from threading import Thread
+from typing import Callable, Dict, List, Sequence
+
+from config import logger, PIPELINE_QUEUE_SIZE
+from records import CalculatedCityRecord
+from tasks import DataCalculationTask, DataFetchingTask
+from windows import WindowSpec
+
+
+class StreamingForecastPipeline:
+    """
+    Потоковый режим: загрузка и просчет работают одновременно и связаны
+    ограниченными очередями. Просчет города начинается сразу после его
+    загрузки, результаты собираются по мере готовности.
+    Порядок результатов совпадает с последовательным запуском этапов.
+    """
+
+    def __init__(
+        self,
+        fetch_data_service: DataFetchingTask,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        windows: Sequence[WindowSpec] = (),
+    ) -> None:
+        self.fetch_data_service = fetch_data_service
+        self.calc_data_service = DataCalculationTask([], windows=windows)
+        self.queue_size = queue_size
+        self._errors: List[BaseException] = []
+
+    def run(self) -> List[CalculatedCityRecord]:
+        """Запуск загрузки и просчета, возвращает просчитанные данные по городам."""
+        logger.info("Запуск потокового режима загрузки и просчета данных")
+        forecasts_queue: Queue = Queue(maxsize=self.queue_size)
+        calculated_queue: Queue = Queue(maxsize=self.queue_size)
+        self._errors = []
+
+        stages = [
+            self._start_stage(
+                self.fetch_data_service.fetch_forecasts_to_queue,
+                forecasts_queue,
+            ),
+            self._start_stage(
+                self.calc_data_service.calculate_from_queue,
+                forecasts_queue,
+                calculated_queue,
+                self.queue_size,
+            ),
+        ]
+
+        calculated_data: Dict[int, CalculatedCityRecord] = {}
+        while True:
+            item = calculated_queue.get()
+            if item is None:
+                break
+            index, city_result = item
+            calculated_data[index] = city_result
+
+        for stage in stages:
+            stage.join()
+        if self._errors:
+            raise self._errors[0]
+
+        logger.info("Потоковый режим загрузки и просчета данных завершен")
+        # восстанавливаем исходный порядок городов
+        return [calculated_data[index] for index in sorted(calculated_data)]
+
+    def _start_stage(self, target: Callable, *args) -> Thread:
+        """Внутренний метод запуска этапа в отдельном потоке с сохранением ошибки."""
+
+        def run_stage() -> None:
+            try:
+                target(*args)
+            except BaseException as stage_error:
+                logger.error(f"Произошла ошибка {stage_error} в потоковом режиме")
+                self._errors.append(stage_error)
+
+        stage = Thread(target=run_stage, daemon=True)
+        stage.start()
+        return stage
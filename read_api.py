@@ -0,0 +1,275 @@
+"""
+Локальный HTTP API чтения результатов анализа из памяти.
+
+ForecastIndex - неизменяемый снимок результата DataAnalyzingTask: города
+упорядочены по рейтингу, JSON каждого города и ответы по датам
+сериализуются один раз при построении снимка, поэтому запрос сводится
+к поиску в словаре, bisect и склейке готовых байтов.
+
+Запросы:
+    GET /top?n=10               - n лучших городов
+    GET /cities/<город>         - город с рядом значений по дням
+    GET /cities?min_temp=20     - города со средней температурой не ниже порога
+    GET /dates/<дата>           - значения всех городов за дату
+    GET /health                 - количество городов и версия снимка
+
+Все ответы снимка имеют общий ETag, на If-None-Match с ним отдается 304.
+ForecastReadServer.publish строит новый снимок и заменяет ссылку на него
+одним присваиванием: запрос работает с тем снимком, который взял в начале.
+
+Запуск из корня репозитория (отдает city_data_table.jsonl и перечитывает его
+после каждой перезаписи):
+    python read_api.py --file city_data_table.jsonl --port 8085
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Thread
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from config import (
+    logger,
+    configure_logging,
+    OUTPUT_FILE_BASE_NAME,
+    READ_API_HOST,
+    READ_API_PORT,
+    READ_API_RELOAD_INTERVAL,
+    READ_API_TOP_DEFAULT,
+)
+from records import CalculatedCityRecord
+from tasks import DataAnalyzingTask
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_list(items: Sequence[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
+
+
+class ForecastIndex:
+    """Снимок результатов с индексами по городу, дате и рейтингу."""
+
+    def __init__(self, cities: Sequence[CalculatedCityRecord]) -> None:
+        # порядок рейтинга: по средней температуре, затем по часам без осадков,
+        # поэтому города с температурой не ниже порога - начало списка
+        ranked = sorted(cities, key=DataAnalyzingTask.RATING_KEY, reverse=True)
+        self.cities_count = len(ranked)
+        self._cities_json = [_dumps(city.dict()) for city in ranked]
+        self._positions = {city.city_name: position for position, city in enumerate(ranked)}
+        self._negated_temps = [-city.total_average_temp for city in ranked]
+
+        dates: Dict[str, List[bytes]] = {}
+        for city in ranked:
+            for day in city.days:
+                dates.setdefault(day.date, []).append(
+                    _dumps(
+                        {
+                            "city_name": city.city_name,
+                            "rating": city.rating,
+                            "average_temp": day.average_temp,
+                            "good_weather_hours": day.good_weather_hours,
+                        }
+                    )
+                )
+        self._dates_json = {date: _json_list(rows) for date, rows in dates.items()}
+
+        digest = hashlib.blake2b(digest_size=16)
+        for city_json in self._cities_json:
+            digest.update(city_json)
+        self.version = digest.hexdigest()
+        self.etag = f'"{self.version}"'
+
+    @classmethod
+    def from_json_lines(cls, file_name: str) -> "ForecastIndex":
+        """Снимок из файла результата в формате jsonl (JsonLinesOutputWriter)."""
+        with open(file_name, encoding="utf-8") as file:
+            return cls([CalculatedCityRecord.from_dict(json.loads(line)) for line in file])
+
+    def top(self, n: int) -> bytes:
+        return _json_list(self._cities_json[:max(n, 0)])
+
+    def city(self, city_name: str) -> Optional[bytes]:
+        position = self._positions.get(city_name)
+        return None if position is None else self._cities_json[position]
+
+    def cities_above(self, min_temp: float) -> bytes:
+        return _json_list(self._cities_json[:bisect.bisect_right(self._negated_temps, -min_temp)])
+
+    def date(self, date: str) -> Optional[bytes]:
+        return self._dates_json.get(date)
+
+    def health(self) -> bytes:
+        return _dumps({"cities": self.cities_count, "version": self.version})
+
+    def respond(self, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        """
+        Ответ на запрос path: None - ресурс не найден,
+        ValueError - некорректные параметры запроса.
+        """
+        if path == "/top":
+            return self.top(int(query.get("n", [READ_API_TOP_DEFAULT])[0]))
+        if path == "/cities":
+            if "min_temp" not in query:
+                raise ValueError("min_temp is required")
+            return self.cities_above(float(query["min_temp"][0]))
+        if path.startswith("/cities/"):
+            return self.city(unquote(path[len("/cities/"):]))
+        if path.startswith("/dates/"):
+            return self.date(unquote(path[len("/dates/"):]))
+        if path == "/health":
+            return self.health()
+        return None
+
+
+class _ReadRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # заголовки и тело пишутся отдельно: без TCP_NODELAY тело keep-alive ответа
+    # ждет подтверждения заголовков (delayed ACK) до 40 мс
+    disable_nagle_algorithm = True
+    server: "_ReadHTTPServer"
+
+    def do_GET(self) -> None:
+        # снимок берется один раз: публикация во время запроса его не меняет
+        index = self.server.index
+        url = urlsplit(self.path)
+        try:
+            body = index.respond(url.path, parse_qs(url.query))
+        except ValueError:
+            self.send_error(400)
+            return
+        if body is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == index.etag:
+            self.send_response(304)
+            self.send_header("ETag", index.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", index.etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Не засоряем вывод логами каждого запроса."""
+
+
+class _ReadHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int]) -> None:
+        super().__init__(address, _ReadRequestHandler)
+        self.index = ForecastIndex([])
+
+    def handle_error(self, request, client_address) -> None:
+        """Клиент мог закрыть соединение, это не ошибка сервера."""
+
+
+class ForecastReadServer:
+    """
+    HTTP API чтения результатов. publish заменяет снимок после нового запуска,
+    watch_file перечитывает файл jsonl после каждой его атомарной перезаписи.
+    port=0 - свободный порт (url - адрес запущенного сервера).
+    """
+
+    def __init__(self, host: str = READ_API_HOST, port: int = READ_API_PORT) -> None:
+        self.host = host
+        self.port = port
+        self._server: Optional[_ReadHTTPServer] = None
+        self._thread: Optional[Thread] = None
+        self._index = ForecastIndex([])
+        self._watch_stopped = Event()
+        self._watcher: Optional[Thread] = None
+
+    def __enter__(self) -> "ForecastReadServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._server = _ReadHTTPServer((self.host, self.port))
+        self._server.index = self._index
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"API чтения результатов запущено на {self.url}")
+
+    def stop(self) -> None:
+        self._watch_stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Server is not started")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def index(self) -> ForecastIndex:
+        return self._index
+
+    def publish(self, cities: Sequence[CalculatedCityRecord]) -> None:
+        """Построение нового снимка и атомарная замена текущего."""
+        self._set_index(ForecastIndex(cities))
+
+    def _set_index(self, index: ForecastIndex) -> None:
+        self._index = index
+        if self._server is not None:
+            self._server.index = index
+        logger.info(f"API чтения результатов: опубликовано {index.cities_count} городов, версия {index.version}")
+
+    def watch_file(self, file_name: str, interval: float = READ_API_RELOAD_INTERVAL) -> None:
+        """Загрузка снимка из файла jsonl и перечитывание его при изменении."""
+        self._watch_stopped.clear()
+        self._watcher = Thread(target=self._watch_file, args=(file_name, interval), daemon=True)
+        self._watcher.start()
+
+    def _watch_file(self, file_name: str, interval: float) -> None:
+        loaded_stat = None
+        while True:
+            try:
+                stat = os.stat(file_name)
+                # файл результата заменяется через os.replace, поэтому меняется inode
+                current_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if current_stat != loaded_stat:
+                    self._set_index(ForecastIndex.from_json_lines(file_name))
+                    loaded_stat = current_stat
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as error:
+                logger.error(f"Не удалось загрузить {file_name}: {error}")
+            if self._watch_stopped.wait(interval):
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP API чтения результатов прогноза")
+    parser.add_argument("--file", default=f"{OUTPUT_FILE_BASE_NAME}.jsonl")
+    parser.add_argument("--host", default=READ_API_HOST)
+    parser.add_argument("--port", type=int, default=READ_API_PORT)
+    args = parser.parse_args()
+    configure_logging()
+    server = ForecastReadServer(args.host, args.port)
+    server.start()
+    server.watch_file(args.file)
+    try:
+        Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,236 @@
+"""
+Внутренние записи для загрузки, просчета, анализа и записи результата.
+
+Вместо модели pydantic на каждый час прогноза город хранится одной записью
+со __slots__, а часы дня - в array/bytes (DayPayload). Сырые данные API
+проверяются один раз при создании записи (CityForecastRecord.from_raw).
+Модели pydantic строятся только по запросу через to_model(), модуль models
+(и pydantic) импортируется при первом таком обращении.
+"""
+import datetime
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import WEATHER_CONDITION_CODES, WEATHER_CONDITIONS_BY_CODE
+
+if TYPE_CHECKING:
+    from models import CalculatedCityWeatherDataModel, CityForecastDataModel, CityWeatherDataModel
+
+# (дата, часы, температуры, коды условий) - компактное представление дня
+DayPayload = Tuple[str, array, array, bytes]
+CityPayload = Tuple[str, List[DayPayload]]
+# (сумма температур за период, часы без осадков), None - нет данных по времени
+DayResult = Optional[Tuple[int, int]]
+
+
+def validate_date(value: str) -> str:
+    """Дата дня в формате ISO (YYYY-MM-DD): по ней считаются дни недели (windows.WeekdayWindow)."""
+    try:
+        datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid forecast date {value!r}") from None
+    return value
+
+
+def _condition_code(condition: str) -> int:
+    code = WEATHER_CONDITION_CODES.get(condition)
+    if code is None:
+        raise ValueError("Condition not found!")
+    return code
+
+
+class CityForecastRecord:
+    """Прогноз по городу: название и дни в компактном представлении DayPayload."""
+
+    __slots__ = ("city_name", "days")
+
+    def __init__(self, city_name: str, days: List[DayPayload]) -> None:
+        self.city_name = city_name
+        self.days = days
+
+    @classmethod
+    def from_raw(cls, city_data: Dict) -> "CityForecastRecord":
+        """
+        Проверка и упаковка сырых данных API (с ключом city_name).
+        Проверки совпадают с CityWeatherDataModel, ошибки - ValueError.
+        """
+        try:
+            days = []
+            for forecast in city_data["forecasts"]:
+                hours = forecast["hours"]
+                days.append(
+                    (
+                        validate_date(str(forecast["date"])),
+                        array("b", [int(hour["hour"]) for hour in hours]),
+                        array("h", [int(hour["temp"]) for hour in hours]),
+                        bytes(_condition_code(hour["condition"]) for hour in hours),
+                    )
+                )
+            return cls(str(city_data["city_name"]), days)
+        except KeyError as error:
+            raise ValueError(f"Unexpected forecast format: missing {error}") from None
+        except (TypeError, OverflowError) as error:
+            raise ValueError(f"Unexpected forecast format: {error}") from None
+
+    @classmethod
+    def from_model(cls, city_data: "CityWeatherDataModel") -> "CityForecastRecord":
+        return cls(
+            city_data.city_name,
+            [
+                (
+                    forecast.date,
+                    array("b", [item.hour for item in forecast.hours]),
+                    array("h", [item.temp for item in forecast.hours]),
+                    bytes(WEATHER_CONDITION_CODES[item.condition] for item in forecast.hours),
+                )
+                for forecast in city_data.forecasts
+            ],
+        )
+
+    def to_payload(self) -> CityPayload:
+        """Представление для передачи в процесс-воркер, без копирования."""
+        return self.city_name, self.days
+
+    def to_model(self) -> "CityWeatherDataModel":
+        """Модель pydantic для внешних потребителей (без повторной валидации)."""
+        from models import CityForecastDataModel, CityWeatherDataModel, ForecastHoursModel
+
+        return CityWeatherDataModel.construct(
+            city_name=self.city_name,
+            forecasts=[
+                CityForecastDataModel.construct(
+                    date=date,
+                    hours=[
+                        ForecastHoursModel.construct(
+                            hour=hour, temp=temp, condition=WEATHER_CONDITIONS_BY_CODE[code]
+                        )
+                        for hour, temp, code in zip(hours, temps, codes)
+                    ],
+                )
+                for date, hours, temps, codes in self.days
+            ],
+        )
+
+    @property
+    def forecasts(self) -> List["CityForecastDataModel"]:
+        """Дни в виде моделей pydantic, как CityWeatherDataModel.forecasts."""
+        return self.to_model().forecasts
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CityForecastRecord):
+            return NotImplemented
+        return self.city_name == other.city_name and self.days == other.days
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CityForecastRecord(city_name={self.city_name!r}, days={len(self.days)})"
+
+
+class CityDayRecord:
+    """Результат просчета за день."""
+
+    __slots__ = ("date", "average_temp", "good_weather_hours")
+
+    def __init__(self, date: str, average_temp: float, good_weather_hours: int) -> None:
+        self.date = date
+        self.average_temp = average_temp
+        self.good_weather_hours = good_weather_hours
+
+    def dict(self) -> Dict:
+        return {
+            "date": self.date,
+            "average_temp": self.average_temp,
+            "good_weather_hours": self.good_weather_hours,
+        }
+
+
+class CalculatedCityRecord:
+    """
+    Результат просчета по городу. Повторяет поля и методы
+    CalculatedCityWeatherDataModel, сравнивается с ней по dict().
+    Строки aggregates хранятся словарями {"key", "average_temp", "good_weather_hours"}.
+    """
+
+    __slots__ = (
+        "city_name",
+        "days",
+        "total_average_temp",
+        "total_average_good_weather_hours",
+        "rating",
+        "aggregates",
+    )
+
+    def __init__(
+        self,
+        city_name: str,
+        days: List[CityDayRecord],
+        total_average_temp: float,
+        total_average_good_weather_hours: float,
+        rating: Optional[int] = None,
+        aggregates: Optional[Dict[str, List[Dict]]] = None,
+    ) -> None:
+        self.city_name = city_name
+        self.days = days
+        self.total_average_temp = total_average_temp
+        self.total_average_good_weather_hours = total_average_good_weather_hours
+        self.rating = rating
+        self.aggregates = aggregates or {}
+
+    @classmethod
+    def from_dict(cls, city_data: Dict) -> "CalculatedCityRecord":
+        """Запись из результата просчета (combine_days, calculate_columnar)."""
+        return cls(
+            city_data["city_name"],
+            [
+                CityDayRecord(day["date"], day["average_temp"], day["good_weather_hours"])
+                for day in city_data["days"]
+            ],
+            city_data["total_average_temp"],
+            city_data["total_average_good_weather_hours"],
+            city_data.get("rating"),
+            city_data.get("aggregates"),
+        )
+
+    def get_avg_temp_data(self) -> List[float]:
+        """Список средних температур по всем дням."""
+        return [day.average_temp for day in self.days]
+
+    def get_all_good_weather_hours(self) -> List[float]:
+        """Список кол-ва ясных часов по всем дням."""
+        return [day.good_weather_hours for day in self.days]
+
+    def dict(self) -> Dict:
+        return {
+            "city_name": self.city_name,
+            "days": [day.dict() for day in self.days],
+            "total_average_temp": self.total_average_temp,
+            "total_average_good_weather_hours": self.total_average_good_weather_hours,
+            "rating": self.rating,
+            "aggregates": {name: [dict(row) for row in rows] for name, rows in self.aggregates.items()},
+        }
+
+    def to_model(self) -> "CalculatedCityWeatherDataModel":
+        from models import CalculatedCityWeatherDataModel
+
+        return CalculatedCityWeatherDataModel(**self.dict())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, dict):
+            return self.dict() == other
+        if not isinstance(other, CalculatedCityRecord):
+            from models import CalculatedCityWeatherDataModel
+
+            if not isinstance(other, CalculatedCityWeatherDataModel):
+                return NotImplemented
+        return self.dict() == other.dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"CalculatedCityRecord(city_name={self.city_name!r}, "
+            f"total_average_temp={self.total_average_temp!r}, "
+            f"total_average_good_weather_hours={self.total_average_good_weather_hours!r}, "
+            f"rating={self.rating!r})"
+        )
@@ -0,0 +1,151 @@
+"""
+Ответы API без сети: запись и воспроизведение ответов, синтетические ответы.
+
+record_responses сохраняет тела ответов API по городам в каталог
+(<город>.json), ReplayYandexWeatherAPI отдает их вместо запросов к API
+с тем же разбором и метриками, что и YandexWeatherAPI. generate_responses
+строит ответы по образцу examples/response.json для любого количества
+городов и дней: все поля документа сохраняются, меняются даты, температуры
+и погодные условия по часам.
+
+Запись ответов для городов из реестра городов (city_registry.py):
+    python replay.py tests/fixtures/responses MOSCOW PARIS BEIJING
+"""
+import argparse
+import copy
+import json
+import os
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api_client import ApiRequestError, ResponseParser, YandexWeatherAPI, parse_downloaded
+from config import logger, configure_logging, REQUEST_TIMEOUT, WEATHER_CONDITIONS
+from local_server import EXAMPLE_RESPONSE_PATH
+from city_registry import get_city_registry
+
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_HOUR = 60 * 60
+_CONDITIONS = sorted(WEATHER_CONDITIONS)
+
+
+def record_responses(
+    cities: Iterable[str], directory: str, timeout: Optional[float] = REQUEST_TIMEOUT
+) -> List[str]:
+    """
+    Загрузка ответов API по url из реестра городов и запись тел ответов
+    в directory без разбора. Возвращает имена записанных файлов.
+    Неизвестные реестру города - city_registry.UnknownCityError до первой загрузки.
+    """
+    from urllib.request import urlopen
+
+    urls = get_city_registry().resolve(cities)
+    os.makedirs(directory, exist_ok=True)
+    file_names = []
+    for city_name, url in urls.items():
+        with urlopen(url, timeout=timeout) as response:
+            body = response.read()
+        file_name = os.path.join(directory, f"{city_name}.json")
+        temp_file_name = f"{file_name}.{os.getpid()}.tmp"
+        with open(temp_file_name, "wb") as file:
+            file.write(body)
+        os.replace(temp_file_name, file_name)
+        file_names.append(file_name)
+        logger.info(f"Ответ API для {city_name} записан в {file_name}")
+    return file_names
+
+
+def load_responses(directory: str) -> Dict[str, bytes]:
+    """Записанные ответы из directory: город -> тело ответа."""
+    return {path.stem: path.read_bytes() for path in sorted(Path(directory).glob("*.json"))}
+
+
+class ReplayYandexWeatherAPI(YandexWeatherAPI):
+    """
+    Клиент API, отдающий записанные ответы по названию города.
+    Ответ разбирается response_parser и учитывается в run_metrics, как ответ
+    из сети; город без записанного ответа - ApiRequestError с кодом 404.
+    """
+
+    def __init__(
+        self, responses: Dict[str, bytes], response_parser: Optional[ResponseParser] = None
+    ) -> None:
+        super().__init__(response_parser=response_parser)
+        self.responses = dict(responses)
+
+    @classmethod
+    def from_directory(
+        cls, directory: str, response_parser: Optional[ResponseParser] = None
+    ) -> "ReplayYandexWeatherAPI":
+        return cls(load_responses(directory), response_parser)
+
+    def resolve_cities(self, city_names: List[str]) -> Tuple[List[str], List[str]]:
+        """Реестр городов не используется: город без записи завершается ошибкой 404 при загрузке."""
+        return list(dict.fromkeys(city_names)), []
+
+    def get_forecasting(self, city_name: str, deadline: Optional[float] = None):
+        body = self.responses.get(city_name)
+        if body is None:
+            raise ApiRequestError.from_status(404, f"no recorded response for {city_name}")
+        return parse_downloaded(self.response_parser, body)
+
+
+def generate_response(template: Dict, days_count: int, rng: random.Random) -> Dict:
+    """
+    Ответ с days_count днями по 24 часа. Поля дня и часа копируются
+    из первого дня template, даты идут подряд от его даты.
+    """
+    response = copy.deepcopy(template)
+    day_template = template["forecasts"][0]
+    hour_template = day_template["hours"][0]
+    first_date = date.fromisoformat(day_template["date"])
+    forecasts = []
+    for day_index in range(days_count):
+        date_ts = day_template["date_ts"] + day_index * SECONDS_PER_DAY
+        day = {key: value for key, value in day_template.items() if key != "hours"}
+        day["date"] = (first_date + timedelta(days=day_index)).isoformat()
+        day["date_ts"] = date_ts
+        day["hours"] = [
+            {
+                **hour_template,
+                "hour": str(hour),
+                "hour_ts": date_ts + hour * SECONDS_PER_HOUR,
+                "temp": rng.randint(-10, 35),
+                "condition": rng.choice(_CONDITIONS),
+            }
+            for hour in range(24)
+        ]
+        forecasts.append(day)
+    response["forecasts"] = forecasts
+    return response
+
+
+def generate_responses(
+    cities: Iterable[str],
+    days_count: int = 5,
+    seed: int = 0,
+    template_path: Path = EXAMPLE_RESPONSE_PATH,
+) -> Dict[str, bytes]:
+    """
+    Синтетические ответы API: город -> тело ответа. Ответ города зависит
+    только от seed и названия города, поэтому повторяется между запусками.
+    """
+    template = json.loads(template_path.read_bytes())
+    return {
+        city_name: json.dumps(
+            generate_response(template, days_count, random.Random(f"{seed}:{city_name}")),
+            ensure_ascii=False,
+        ).encode("utf-8")
+        for city_name in cities
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запись ответов API для воспроизведения без сети")
+    parser.add_argument("directory")
+    parser.add_argument("cities", nargs="*", help="города из реестра городов, по умолчанию все")
+    args = parser.parse_args()
+    configure_logging()
+    for recorded_file in record_responses(args.cities or get_city_registry().names(), args.directory):
+        print(recorded_file)
@@ -0,0 +1,205 @@
+import random
+import time
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонен без обращения к сети: хост считается недоступным."""
+
+
+class RequestSlotTimeoutError(Exception):
+    """Место для запроса в AdaptiveConcurrencyLimiter не получено до дедлайна; к сети запрос не обращался."""
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Политика повторных запросов: attempts - общее количество попыток,
+    паузы растут экспоненциально от base_delay до max_delay
+    со случайным разбросом (full jitter).
+    """
+
+    attempts: int = 1
+    base_delay: float = 0.5
+    max_delay: float = 5.0
+
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед попыткой attempt + 1 (нумерация попыток с 1)."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+
+@dataclass
+class _HostState:
+    failures: int = 0
+    opened_at: float = 0.0
+    is_open: bool = False
+    trial_in_progress: bool = False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker по хостам. После failure_threshold ошибок подряд хост
+    "размыкается" и запросы к нему сразу отклоняются. Через reset_timeout
+    секунд пропускается одна пробная попытка: успех замыкает цепь,
+    ошибка снова размыкает ее. Пробная попытка, закончившаяся без ответа
+    хоста (отмена, нет места для запроса), возвращается через abort_trial.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = Lock()
+
+    def check(self, host: str) -> bool:
+        """
+        Бросает CircuitOpenError, если запрос к хосту сейчас не разрешен.
+        True - разрешена пробная попытка разомкнутого хоста.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state.is_open:
+                return False
+            elapsed = time.monotonic() - state.opened_at
+            if elapsed >= self.reset_timeout and not state.trial_in_progress:
+                state.trial_in_progress = True
+                return True
+        raise CircuitOpenError(f"Circuit breaker is open for host {host}")
+
+    def abort_trial(self, host: str) -> None:
+        """Пробная попытка не дала ответа хоста: следующий check снова разрешит пробную попытку."""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state.trial_in_progress = False
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.failures += 1
+            if state.is_open or state.failures >= self.failure_threshold:
+                state.is_open = True
+                state.opened_at = time.monotonic()
+                state.trial_in_progress = False
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.is_open
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Адаптивное ограничение количества одновременных запросов (AIMD).
+    Запрос занимает место через acquire и освобождает его через release
+    с временем ответа и признаком перегрузки (429, 5xx, таймаут - повторяемая
+    ошибка). Перегрузка сразу уменьшает лимит в decrease_factor раз; ответы
+    на запросы, начатые до уменьшения, лимит повторно не уменьшают.
+    Без перегрузки лимит пересматривается раз в окно из limit ответов:
+    растет на 1, пока пропускная способность окна растет больше чем на
+    throughput_gain, и уменьшается на 1, если среднее время ответа окна
+    превысило лучшее в latency_tolerance раз. Лимит держится в пределах
+    [min_limit, max_limit]; при min_limit == max_limit он не меняется.
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        initial_limit: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        throughput_gain: float = 0.05,
+        latency_tolerance: float = 2.0,
+    ) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Invalid concurrency limits: {min_limit}..{max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.throughput_gain = throughput_gain
+        self.latency_tolerance = latency_tolerance
+        self.limit = min(max(initial_limit or min_limit, min_limit), max_limit)
+        self.peak_limit = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self._in_flight = 0
+        self._changed_at = time.monotonic()
+        self._previous_throughput: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._reset_window()
+        self._condition = Condition(Lock())
+
+    @property
+    def is_adaptive(self) -> bool:
+        return self.min_limit < self.max_limit
+
+    @property
+    def available(self) -> int:
+        """Количество свободных мест при текущем лимите."""
+        with self._condition:
+            return max(self.limit - self._in_flight, 0)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Ждет свободного места не дольше timeout секунд; False - место не получено."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < self.limit, timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """Освобождает место запроса, занявшего latency секунд, и пересчитывает лимит."""
+        now = time.monotonic()
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                if now - latency >= self._changed_at:
+                    self._set_limit(max(self.min_limit, int(self.limit * self.decrease_factor)), now)
+            else:
+                self._window_count += 1
+                self._window_latency += latency
+                if self._window_count >= self.limit:
+                    self._end_window(now)
+            self._condition.notify_all()
+
+    def _end_window(self, now: float) -> None:
+        throughput = self._window_count / max(now - self._window_started, 1e-9)
+        latency = self._window_latency / self._window_count
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        if latency > self._best_latency * self.latency_tolerance:
+            self._set_limit(max(self.min_limit, self.limit - 1), now)
+        elif (
+            self._previous_throughput is None
+            or throughput > self._previous_throughput * (1 + self.throughput_gain)
+        ):
+            self._set_limit(min(self.max_limit, self.limit + 1), now)
+        self._previous_throughput = throughput
+        self._reset_window(now)
+
+    def _set_limit(self, limit: int, now: float) -> None:
+        if limit > self.limit:
+            self.increases += 1
+        elif limit < self.limit:
+            self.decreases += 1
+            # пропускная способность при меньшем лимите сравнивается заново
+            self._previous_throughput = None
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+        self._changed_at = now
+        self._reset_window(now)
+
+    def _reset_window(self, now: Optional[float] = None) -> None:
+        self._window_started = time.monotonic() if now is None else now
+        self._window_count = 0
+        self._window_latency = 0.0
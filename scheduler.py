@@ -0,0 +1,268 @@
+"""
+Резидентный режим: периодическое обновление прогнозов без перезапуска процесса.
+
+В отличие от запуска forecasting.py из cron, процесс живет между обновлениями:
+интерпретатор и модули уже загружены, пул процессов просчета (worker_pool)
+создается один раз, асинхронный клиент API держит keep-alive соединения
+открытыми между циклами.
+
+Каждый город обновляется раз в interval секунд со своим сдвигом: после
+первой полной загрузки время обновления городов равномерно распределено
+по интервалу, поэтому к API не уходят все запросы одновременно. Города,
+время обновления которых попадает в batch_window, загружаются одной пачкой
+(циклом). После каждого цикла результат по всем городам заново анализируется
+и атомарно публикуется DataAggregationTask (запись во временный файл и os.replace).
+Ошибка цикла записывается в лог и не останавливает планировщик: остается
+опубликованным результат прошлого цикла, следующий цикл идет по расписанию.
+SIGTERM и SIGINT завершают работу после текущего цикла.
+
+Запуск из корня репозитория:
+    python scheduler.py --interval 600 --format csv
+"""
+import argparse
+import asyncio
+import heapq
+import signal
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from calculation import worker_pool
+from city_registry import get_city_registry
+from config import (
+    logger,
+    configure_logging,
+    CACHE_FILE_NAME,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    SCHEDULER_BATCH_WINDOW,
+    SCHEDULER_REFRESH_INTERVAL,
+)
+from metrics import run_metrics
+from read_api import ForecastReadServer
+from records import CalculatedCityRecord, CityForecastRecord
+from tasks import (
+    DataAggregationTask,
+    DataAnalyzingTask,
+    DataCalculationTask,
+    DataFetchingTask,
+    create_api_client,
+)
+from windows import WindowSpec
+
+
+class ForecastScheduler:
+    """
+    Планировщик обновления прогнозов. run() работает до вызова stop()
+    или сигнала SIGTERM/SIGINT (если запущен в главном потоке).
+    Если задан read_server, результат каждого цикла публикуется и в нем.
+    last_cycle - задержки последнего успешного цикла по этапам, cycles - количество
+    успешных циклов, failed_cycles - количество циклов, завершившихся ошибкой.
+    """
+
+    def __init__(
+        self,
+        cities: Sequence[str],
+        interval: float = SCHEDULER_REFRESH_INTERVAL,
+        output_format: str = "csv",
+        file_name: Optional[str] = None,
+        batch_window: float = SCHEDULER_BATCH_WINDOW,
+        use_cache: bool = False,
+        lean_extraction: bool = False,
+        windows: Sequence[WindowSpec] = (),
+        read_server: Optional[ForecastReadServer] = None,
+    ) -> None:
+        self.cities = list(cities)
+        self.interval = interval
+        self.output_format = output_format
+        self.file_name = file_name
+        self.batch_window = batch_window
+        self.use_cache = use_cache
+        self.lean_extraction = lean_extraction
+        self.windows = tuple(windows)
+        self.read_server = read_server
+        self.cycles = 0
+        self.failed_cycles = 0
+        self.last_cycle: Dict[str, float] = {}
+        # последний успешный результат по городу; город с ошибкой загрузки
+        # публикуется с прошлыми данными до следующего успешного обновления
+        self._results: Dict[str, CalculatedCityRecord] = {}
+        # (время следующего обновления по time.monotonic(), индекс города)
+        self._schedule: List[Tuple[float, int]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._stop_requested = False
+
+    def run(self) -> None:
+        asyncio.run(self._run())
+
+    def stop(self) -> None:
+        """Остановка после текущего цикла, можно вызывать из любого потока."""
+        self._stop_requested = True
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def _run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        if self._stop_requested:
+            self._stop_event.set()
+        self._install_signal_handlers()
+
+        cache = None
+        if self.use_cache:
+            from cache import ResponseCache
+
+            cache = ResponseCache(CACHE_FILE_NAME, CACHE_TTL, CACHE_MAX_ENTRIES)
+        fetch_data_service = DataFetchingTask([], create_api_client(cache, self.lean_extraction))
+        logger.info(
+            f"Планировщик запущен: {len(self.cities)} городов, интервал {self.interval}s"
+        )
+        try:
+            async with fetch_data_service.create_async_api_client() as api_client:
+                self._start_schedule(time.monotonic())
+                # первый цикл загружает все города сразу, чтобы результат был полным
+                due_cities = list(range(len(self.cities)))
+                while not self._stop_event.is_set():
+                    if due_cities:
+                        await self._run_cycle_safely(fetch_data_service, api_client, due_cities)
+                    due_cities = await self._wait_due_cities()
+        finally:
+            if cache is not None:
+                cache.close()
+            worker_pool.shutdown()
+            logger.info(
+                f"Планировщик остановлен после {self.cycles} циклов, "
+                f"завершились ошибкой {self.failed_cycles}"
+            )
+
+    def _install_signal_handlers(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            self._loop.add_signal_handler(signal_number, self.stop)
+
+    def _start_schedule(self, started: float) -> None:
+        """Сдвиги обновлений городов равномерно распределены по интервалу."""
+        cities_count = len(self.cities)
+        self._schedule = [
+            (started + self.interval * (1 + index / cities_count), index)
+            for index in range(cities_count)
+        ]
+        heapq.heapify(self._schedule)
+
+    async def _wait_due_cities(self) -> List[int]:
+        """Ожидание ближайшего обновления и выбор городов, которые пора обновить."""
+        if not self._schedule:
+            await self._stop_event.wait()
+            return []
+        timeout = self._schedule[0][0] - time.monotonic()
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout)
+                return []
+            except asyncio.TimeoutError:
+                pass
+        now = time.monotonic()
+        due_cities = []
+        while self._schedule and self._schedule[0][0] <= now + self.batch_window:
+            due_time, index = heapq.heappop(self._schedule)
+            due_cities.append(index)
+            # фаза города сохраняется, пропущенные из-за долгого цикла обновления не копятся
+            due_time += self.interval
+            while due_time <= now:
+                due_time += self.interval
+            heapq.heappush(self._schedule, (due_time, index))
+        return sorted(due_cities)
+
+    async def _run_cycle_safely(
+        self,
+        fetch_data_service: DataFetchingTask,
+        api_client,
+        due_cities: List[int],
+    ) -> None:
+        """Цикл, ошибка которого записывается в лог и учитывается в метриках, а не завершает работу."""
+        try:
+            await self._run_cycle(fetch_data_service, api_client, due_cities)
+        except Exception:
+            self.failed_cycles += 1
+            run_metrics.increment("scheduler_failed_cycles")
+            logger.exception(
+                f"Цикл обновления {len(due_cities)} городов завершился ошибкой, "
+                "опубликован результат прошлого цикла"
+            )
+
+    async def _run_cycle(
+        self,
+        fetch_data_service: DataFetchingTask,
+        api_client,
+        due_cities: List[int],
+    ) -> None:
+        started = time.perf_counter()
+        fetch_data_service.cities = [self.cities[index] for index in due_cities]
+        cities_forecasts = await fetch_data_service.fetch_forecasts_with_client(api_client)
+        fetched = time.perf_counter()
+        # просчет и запись в потоке, чтобы event loop продолжал обслуживать соединения и сигналы
+        await self._loop.run_in_executor(None, self._calculate_and_publish, cities_forecasts)
+        finished = time.perf_counter()
+
+        self.cycles += 1
+        self.last_cycle = {
+            "cities": len(due_cities),
+            "failed_cities": len(fetch_data_service.failed_cities),
+            "fetch_seconds": fetched - started,
+            "calculate_publish_seconds": finished - fetched,
+            "total_seconds": finished - started,
+        }
+        run_metrics.observe("scheduler_cycle_seconds", finished - started)
+        logger.info(
+            f"Цикл {self.cycles}: городов {len(due_cities)}, ошибок загрузки "
+            f"{len(fetch_data_service.failed_cities)}, загрузка {fetched - started:.3f}s, "
+            f"просчет и публикация {finished - fetched:.3f}s, всего {finished - started:.3f}s"
+        )
+
+    def _calculate_and_publish(self, cities_forecasts: List[CityForecastRecord]) -> None:
+        calculated_data = DataCalculationTask(
+            cities_forecasts, windows=self.windows
+        ).get_calculated_data()
+        # результаты цикла сохраняются только после публикации: при ошибке
+        # следующий цикл продолжает от последнего опубликованного результата
+        results = dict(self._results)
+        for city in calculated_data:
+            results[city.city_name] = city
+        published = [results[city_name] for city_name in self.cities if city_name in results]
+        if not published:
+            logger.warning("Нет данных ни по одному городу, результат не опубликован")
+            return
+        analyzed_data = DataAnalyzingTask(published).analyze_data()
+        DataAggregationTask(analyzed_data).save_data(self.output_format, self.file_name)
+        if self.read_server is not None:
+            self.read_server.publish(analyzed_data)
+        self._results = results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Периодическое обновление прогнозов по городам")
+    parser.add_argument("--interval", type=float, default=SCHEDULER_REFRESH_INTERVAL)
+    parser.add_argument("--format", default="csv")
+    parser.add_argument("--file-name")
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--lean-extraction", action="store_true")
+    parser.add_argument("--read-api-port", type=int, help="отдавать результат через read_api.py на этом порту")
+    args = parser.parse_args()
+    configure_logging()
+    read_server = None
+    if args.read_api_port is not None:
+        read_server = ForecastReadServer(port=args.read_api_port)
+        read_server.start()
+    ForecastScheduler(
+        get_city_registry().names(),
+        args.interval,
+        args.format,
+        args.file_name,
+        use_cache=args.use_cache,
+        lean_extraction=args.lean_extraction,
+        read_server=read_server,
+    ).run()
+    if read_server is not None:
+        read_server.stop()
@@ -0,0 +1,407 @@
+"""
+Шардированный запуск загрузки и просчета с локальным координатором.
+
+Координатор (ShardCoordinator) делит города на шарды и раскладывает задания
+в общий каталог (spool). Воркеры - локальные процессы координатора или
+процессы на других хостах с тем же каталогом (python -m sharding SPOOL_DIR) -
+забирают задания, загружают и считают свои города и возвращают результат
+файлом JSON Lines. Координатор собирает результаты в исходном порядке городов,
+анализ и запись результата выполняются один раз, как и без шардов.
+
+Содержимое каталога:
+    tasks/shard-0001.json              - задание ждет воркера
+    claimed/shard-0001.json@<воркер>   - задание взято воркером, mtime - heartbeat
+    results/shard-0001.jsonl           - результат: строка шапки и строка на город
+    stop                               - координатор завершил работу
+
+Задание забирается атомарным переименованием из tasks в claimed, результат
+публикуется через os.replace. Шард, воркер которого завершился или перестал
+обновлять heartbeat, возвращается в tasks и достается другому воркеру.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import time
+from dataclasses import asdict
+from threading import Event, Thread
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import utils
+from calculation import worker_pool
+from city_registry import get_city_registry
+from config import (
+    logger,
+    configure_logging,
+    SHARD_HEARTBEAT_INTERVAL,
+    SHARD_HEARTBEAT_TIMEOUT,
+    SHARD_LOCAL_WORKERS,
+    SHARD_MAX_ATTEMPTS,
+    SHARD_POLL_INTERVAL,
+    SHARD_SPOOL_DIR,
+)
+from metrics import run_metrics
+from records import CalculatedCityRecord
+from tasks import DataCalculationTask, DataFetchingTask, create_api_client
+from windows import HourWindow, RollingWindow, WeekdayWindow, WindowSpec
+
+_WINDOW_TYPES = {window_type.__name__: window_type for window_type in (HourWindow, RollingWindow, WeekdayWindow)}
+
+_TASKS_DIR = "tasks"
+_CLAIMED_DIR = "claimed"
+_RESULTS_DIR = "results"
+_STOP_FILE = "stop"
+_CLAIM_SEPARATOR = "@"
+
+
+def _shard_file_name(shard_id: int) -> str:
+    return f"shard-{shard_id:04d}.json"
+
+
+def _shard_id(file_name: str) -> int:
+    return int(file_name.split(".", 1)[0].rsplit("-", 1)[1])
+
+
+def split_into_shards(cities: Sequence[str], shards_count: int) -> List[List[str]]:
+    """Деление городов на shards_count непустых шардов подряд идущих городов."""
+    if not cities:
+        return []
+    shards_count = max(1, min(shards_count, len(cities)))
+    shard_size, remainder = divmod(len(cities), shards_count)
+    shards = []
+    start = 0
+    for shard_id in range(shards_count):
+        end = start + shard_size + (1 if shard_id < remainder else 0)
+        shards.append(list(cities[start:end]))
+        start = end
+    return shards
+
+
+def calculate_shard(task: Dict) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Загрузка и просчет городов шарда. url городов берутся из задания,
+    чтобы воркер на другом хосте обращался туда же, куда и координатор.
+    Возвращает результаты по городам и незагруженные города с причинами.
+    """
+    utils.CITIES.update(task["urls"])
+    fetch_data_service = DataFetchingTask(
+        task["cities"], create_api_client(lean_extraction=task["lean_extraction"])
+    )
+    windows = [_WINDOW_TYPES[window_type](**fields) for window_type, fields in task["windows"]]
+    cities_forecasts = fetch_data_service.fetch_forecasts()
+    calculated_data = DataCalculationTask(cities_forecasts, windows=windows).get_calculated_data()
+    return [city.dict() for city in calculated_data], fetch_data_service.failed_cities
+
+
+class _Heartbeat:
+    """Обновление mtime файла взятого задания, пока воркер считает шард."""
+
+    def __init__(self, claim_path: str, interval: float) -> None:
+        self.claim_path = claim_path
+        self.interval = interval
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                os.utime(self.claim_path)
+            except FileNotFoundError:
+                # задание отдано другому воркеру, результат все равно будет записан
+                return
+
+
+def run_shard_worker(
+    spool_dir: str = SHARD_SPOOL_DIR,
+    worker_id: Optional[str] = None,
+    poll_interval: float = SHARD_POLL_INTERVAL,
+    heartbeat_interval: float = SHARD_HEARTBEAT_INTERVAL,
+) -> int:
+    """
+    Цикл воркера: забирает задания из spool_dir, пока координатор
+    не создаст файл stop. Возвращает количество посчитанных шардов.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    tasks_dir = os.path.join(spool_dir, _TASKS_DIR)
+    results_dir = os.path.join(spool_dir, _RESULTS_DIR)
+    stop_path = os.path.join(spool_dir, _STOP_FILE)
+    logger.info(f"Воркер {worker_id} ждет задания в {spool_dir}")
+
+    shards_done = 0
+    try:
+        while not os.path.exists(stop_path):
+            claim_path = _claim_task(spool_dir, tasks_dir, worker_id)
+            if claim_path is None:
+                time.sleep(poll_interval)
+                continue
+            shard_id = _shard_id(os.path.basename(claim_path))
+            with open(claim_path, encoding="utf-8") as file:
+                task = json.load(file)
+            logger.info(f"Воркер {worker_id} считает шард {shard_id}: {len(task['cities'])} городов")
+            with _Heartbeat(claim_path, heartbeat_interval):
+                calculated_cities, failed_cities = calculate_shard(task)
+            _write_result(results_dir, shard_id, worker_id, calculated_cities, failed_cities)
+            try:
+                os.remove(claim_path)
+            except FileNotFoundError:
+                pass
+            shards_done += 1
+    finally:
+        # локальный воркер завершается без atexit: пул просчета останавливается здесь
+        worker_pool.shutdown()
+    logger.info(f"Воркер {worker_id} завершен, посчитано шардов: {shards_done}")
+    return shards_done
+
+
+def _claim_task(spool_dir: str, tasks_dir: str, worker_id: str) -> Optional[str]:
+    """Атомарный захват первого свободного задания, None - заданий нет."""
+    try:
+        file_names = sorted(os.listdir(tasks_dir))
+    except FileNotFoundError:
+        return None
+    for file_name in file_names:
+        # недописанные задания координатора имеют суффикс .tmp
+        if not file_name.endswith(".json"):
+            continue
+        claim_path = os.path.join(
+            spool_dir, _CLAIMED_DIR, f"{file_name}{_CLAIM_SEPARATOR}{worker_id}"
+        )
+        try:
+            os.rename(os.path.join(tasks_dir, file_name), claim_path)
+        except FileNotFoundError:
+            # задание забрал другой воркер
+            continue
+        # время захвата - первый heartbeat
+        os.utime(claim_path)
+        return claim_path
+    return None
+
+
+def _write_result(
+    results_dir: str,
+    shard_id: int,
+    worker_id: str,
+    calculated_cities: List[Dict],
+    failed_cities: Dict[str, str],
+) -> None:
+    result_path = os.path.join(results_dir, f"{_shard_file_name(shard_id)}l")
+    temp_path = f"{result_path}.{worker_id}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        header = {"shard": shard_id, "worker": worker_id, "failed_cities": failed_cities}
+        file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        file.writelines(
+            json.dumps(city, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for city in calculated_cities
+        )
+    os.replace(temp_path, result_path)
+
+
+class ShardCoordinator:
+    """
+    Координатор шардированного запуска: раскладывает задания, запускает
+    local_workers локальных воркеров (0 - только внешние воркеры),
+    возвращает задания потерянных воркеров в очередь и собирает результат.
+    Шард, не посчитанный за max_attempts попыток, попадает в failed_cities.
+    """
+
+    def __init__(
+        self,
+        cities: Sequence[str],
+        shards_count: int,
+        spool_dir: str = SHARD_SPOOL_DIR,
+        local_workers: int = SHARD_LOCAL_WORKERS,
+        lean_extraction: bool = False,
+        windows: Sequence[WindowSpec] = (),
+        heartbeat_timeout: float = SHARD_HEARTBEAT_TIMEOUT,
+        max_attempts: int = SHARD_MAX_ATTEMPTS,
+        poll_interval: float = SHARD_POLL_INTERVAL,
+    ) -> None:
+        self.cities = list(cities)
+        self.shards = split_into_shards(self.cities, shards_count)
+        self.spool_dir = spool_dir
+        self.local_workers = local_workers
+        self.lean_extraction = lean_extraction
+        self.windows = tuple(windows)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        # город -> причина, по которой данные для него не получены
+        self.failed_cities: Dict[str, str] = {}
+        self.reassigned_shards = 0
+        self._attempts: Dict[int, int] = {}
+        self._workers: Dict[str, multiprocessing.Process] = {}
+        self._started_workers = 0
+
+    def run(self) -> List[CalculatedCityRecord]:
+        """Запуск шардов и сбор результатов в исходном порядке городов."""
+        logger.info(
+            f"Шардированный запуск: {len(self.cities)} городов, {len(self.shards)} шардов, "
+            f"локальных воркеров {self.local_workers}"
+        )
+        self.failed_cities = {}
+        self.reassigned_shards = 0
+        self._prepare_spool()
+        shard_results: Dict[int, List[CalculatedCityRecord]] = {}
+        try:
+            for _ in range(min(self.local_workers, len(self.shards))):
+                self._start_worker()
+            pending = set(range(len(self.shards)))
+            while pending:
+                for shard_id in sorted(pending):
+                    result = self._read_result(shard_id)
+                    if result is not None:
+                        shard_results[shard_id] = result
+                        pending.discard(shard_id)
+                if pending:
+                    pending -= self._reassign_lost_shards()
+                    self._restart_dead_workers()
+                    time.sleep(self.poll_interval)
+        finally:
+            self._stop_workers()
+
+        run_metrics.increment("reassigned_shards", self.reassigned_shards)
+        logger.info(
+            f"Шардированный запуск завершен, переназначено шардов: {self.reassigned_shards}"
+        )
+        return [
+            city
+            for shard_id in range(len(self.shards))
+            for city in shard_results.get(shard_id, [])
+        ]
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.spool_dir, *parts)
+
+    def _prepare_spool(self) -> None:
+        """Очистка каталога от прошлого запуска и раскладка заданий."""
+        for directory in (_TASKS_DIR, _CLAIMED_DIR, _RESULTS_DIR):
+            shutil.rmtree(self._path(directory), ignore_errors=True)
+            os.makedirs(self._path(directory))
+        if os.path.exists(self._path(_STOP_FILE)):
+            os.remove(self._path(_STOP_FILE))
+        self._attempts = {}
+        for shard_id, cities in enumerate(self.shards):
+            task = {
+                "shard": shard_id,
+                "cities": cities,
+                "urls": get_city_registry().split_known(cities)[0],
+                "lean_extraction": self.lean_extraction,
+                "windows": [[type(window).__name__, asdict(window)] for window in self.windows],
+            }
+            self._attempts[shard_id] = 1
+            task_path = self._path(_TASKS_DIR, _shard_file_name(shard_id))
+            with open(f"{task_path}.tmp", "w", encoding="utf-8") as file:
+                json.dump(task, file, ensure_ascii=False)
+            # воркер не должен увидеть недописанное задание
+            os.replace(f"{task_path}.tmp", task_path)
+
+    def _read_result(self, shard_id: int) -> Optional[List[CalculatedCityRecord]]:
+        try:
+            file = open(self._path(_RESULTS_DIR, f"{_shard_file_name(shard_id)}l"), encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        with file:
+            header = json.loads(file.readline())
+            self.failed_cities.update(header["failed_cities"])
+            return [CalculatedCityRecord.from_dict(json.loads(line)) for line in file]
+
+    def _reassign_lost_shards(self) -> set:
+        """
+        Возврат в очередь заданий завершившихся локальных воркеров и воркеров
+        без heartbeat дольше heartbeat_timeout. Возвращает шарды, для которых
+        попытки исчерпаны.
+        """
+        failed_shards = set()
+        now = time.time()
+        for claim_name in os.listdir(self._path(_CLAIMED_DIR)):
+            file_name, worker_id = claim_name.split(_CLAIM_SEPARATOR, 1)
+            claim_path = self._path(_CLAIMED_DIR, claim_name)
+            process = self._workers.get(worker_id)
+            try:
+                worker_lost = (process is not None and not process.is_alive()) or (
+                    now - os.path.getmtime(claim_path) > self.heartbeat_timeout
+                )
+            except FileNotFoundError:
+                # воркер только что закончил шард
+                continue
+            if not worker_lost:
+                continue
+            shard_id = _shard_id(file_name)
+            # результат мог появиться между проверкой результатов и этой проверкой
+            if os.path.exists(self._path(_RESULTS_DIR, f"{file_name}l")):
+                continue
+            if self._attempts[shard_id] >= self.max_attempts:
+                self._remove_claim(claim_path)
+                for city_name in self.shards[shard_id]:
+                    self.failed_cities.setdefault(city_name, "shard failed")
+                failed_shards.add(shard_id)
+                logger.error(f"Шард {shard_id} не посчитан за {self.max_attempts} попыток")
+                continue
+            try:
+                os.rename(claim_path, self._path(_TASKS_DIR, file_name))
+            except FileNotFoundError:
+                continue
+            self._attempts[shard_id] += 1
+            self.reassigned_shards += 1
+            logger.warning(f"Воркер {worker_id} потерян, шард {shard_id} возвращен в очередь")
+        return failed_shards
+
+    @staticmethod
+    def _remove_claim(claim_path: str) -> None:
+        try:
+            os.remove(claim_path)
+        except FileNotFoundError:
+            pass
+
+    def _start_worker(self) -> None:
+        self._started_workers += 1
+        worker_id = f"local-{self._started_workers}"
+        # не daemon: воркер запускает свой пул процессов просчета для больших шардов,
+        # а процессу-демону нельзя создавать дочерние процессы
+        process = multiprocessing.Process(
+            target=run_shard_worker,
+            args=(self.spool_dir, worker_id, self.poll_interval),
+        )
+        process.start()
+        self._workers[worker_id] = process
+
+    def _restart_dead_workers(self) -> None:
+        """
+        Замена завершившихся локальных воркеров, пока остаются задания.
+        Вызывается после _reassign_lost_shards: задания этих воркеров уже в очереди.
+        """
+        for worker_id, process in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            del self._workers[worker_id]
+            logger.warning(f"Локальный воркер {worker_id} завершился с кодом {process.exitcode}")
+            self._start_worker()
+
+    def _stop_workers(self) -> None:
+        with open(self._path(_STOP_FILE), "w"):
+            pass
+        for process in self._workers.values():
+            process.join(timeout=self.heartbeat_timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._workers = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воркер шардированного запуска прогноза")
+    parser.add_argument("spool_dir", nargs="?", default=SHARD_SPOOL_DIR)
+    parser.add_argument("--worker-id")
+    args = parser.parse_args()
+    configure_logging()
+    run_shard_worker(args.spool_dir, args.worker_id)
@@ -1,236 +1,936 @@
-import csv
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-from threading import Lock
-from typing import List, Dict, Optional, Iterator, Tuple
-
-from api_client import YandexWeatherAPI
-from config import logger, GOOD_WEATHER_CONDITIONS, CSV_FILE_NAME
-from models import (
-    CityWeatherDataModel,
-    CalculatedCityWeatherDataModel,
+import heapq
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    TimeoutError as FuturesTimeoutError,
+    as_completed,
+    wait,
 )
+from itertools import repeat
+from operator import attrgetter
+from queue import Queue
+from threading import Event, Thread, get_ident
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Iterable, Iterator, Sequence, Tuple, Type, Union
+
+from calculation import (
+    CityPayload,
+    DayPayload,
+    calculate_chunk,
+    calculate_days_chunk,
+    calculate_payload,
+    city_fingerprint,
+    combine_days,
+    day_fingerprint,
+    to_payload,
+    worker_pool,
+)
+from config import (
+    logger,
+    CSV_FILE_NAME,
+    OUTPUT_FILE_BASE_NAME,
+    FETCH_CONCURRENCY_LIMIT,
+    FETCH_CONCURRENCY_MIN,
+    FETCH_CONCURRENCY_MAX,
+    FETCH_CONCURRENCY_INITIAL,
+    PIPELINE_QUEUE_SIZE,
+    CALCULATION_INPROCESS_THRESHOLD,
+    CALCULATION_CHUNK_SIZE,
+    AGGREGATION_BATCH_SIZE,
+    AGGREGATION_QUEUE_SIZE,
+    REQUEST_TIMEOUT,
+    FETCH_DEADLINE,
+    FETCH_RETRY_ATTEMPTS,
+    FETCH_RETRY_BASE_DELAY,
+    FETCH_RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
+from extraction import extract_forecasts
+from forecast_file import ForecastFile, ForecastFileWriter, calculate_file_chunk
+from metrics import DEPTH_BUCKETS, measured_stage, run_metrics
+from records import CalculatedCityRecord, CityForecastRecord
+from resilience import AdaptiveConcurrencyLimiter, CircuitBreaker, RetryPolicy
+from windows import WindowSpec, validate_windows
+
+# модули этапов загружаются при первом запуске этапа: api_client (asyncio, ssl,
+# urllib) - при загрузке, output_writers - при записи, models (pydantic) - по запросу
+if TYPE_CHECKING:
+    from api_client import AsyncYandexWeatherAPI, YandexWeatherAPI
+    from cache import ResponseCache
+    from calculation_store import CalculationStore
+    from models import CityWeatherDataModel
+    from output_writers import OutputWriter
+
+
+def create_api_client(
+    cache: Optional["ResponseCache"] = None, lean_extraction: bool = False
+) -> "YandexWeatherAPI":
+    """
+    Клиент API с таймаутами, повторами, circuit breaker и адаптивным
+    ограничением одновременных запросов из настроек config.py.
+    lean_extraction - извлекать из ответа только поля, нужные для просчета
+    """
+    from api_client import YandexWeatherAPI
+
+    return YandexWeatherAPI(
+        cache,
+        timeout=REQUEST_TIMEOUT,
+        retry_policy=RetryPolicy(
+            FETCH_RETRY_ATTEMPTS, FETCH_RETRY_BASE_DELAY, FETCH_RETRY_MAX_DELAY
+        ),
+        circuit_breaker=CircuitBreaker(
+            CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_TIMEOUT
+        ),
+        response_parser=extract_forecasts if lean_extraction else None,
+        concurrency_limiter=AdaptiveConcurrencyLimiter(
+            FETCH_CONCURRENCY_MIN, FETCH_CONCURRENCY_MAX, FETCH_CONCURRENCY_INITIAL
+        ),
+    )
 
 
 class DataFetchingTask:
-    api_client = YandexWeatherAPI()
+    # клиент по умолчанию, общий для всех загрузок без своего клиента;
+    # создается при первом обращении, а не при импорте модуля
+    _default_api_client: Optional["YandexWeatherAPI"] = None
 
-    def __init__(self, cities: List[str]) -> None:
+    def __init__(
+        self,
+        cities: List[str],
+        api_client: Optional["YandexWeatherAPI"] = None,
+        deadline: Optional[float] = FETCH_DEADLINE,
+    ) -> None:
         self.cities = cities
-
-    def fetch_forecasts(self) -> List[CityWeatherDataModel]:
+        self._api_client = api_client
+        self.deadline = deadline
+        # город -> причина, по которой данные для него не получены
+        self.failed_cities: Dict[str, str] = {}
+
+    @property
+    def api_client(self) -> "YandexWeatherAPI":
+        if self._api_client is None:
+            if DataFetchingTask._default_api_client is None:
+                DataFetchingTask._default_api_client = create_api_client()
+            self._api_client = DataFetchingTask._default_api_client
+        return self._api_client
+
+    @measured_stage("fetch")
+    def fetch_forecasts(self) -> List[CityForecastRecord]:
         """
         Загрузка данных. Использует YandexWeatherAPI для получения данных.
+        Города, не загруженные до истечения deadline, попадают в failed_cities.
         """
         logger.info("Начинаем забирать данные по городам")
+        self.failed_cities = {}
+        cities = self._resolve_cities()
+        deadline = self._get_deadline()
+
+        pool = self._create_fetch_pool()
+        futures = [
+            pool.submit(self._fetch_city_forecast_data, city_name, deadline)
+            for city_name in cities
+        ]
+        done, _ = wait(futures, timeout=self.deadline)
+        pool.shutdown(wait=False, cancel_futures=True)
 
-        with ThreadPoolExecutor() as pool:
-            raw_cities_data_response = pool.map(
-                self._fetch_city_forecast_data, self.cities
-            )
+        raw_cities_data_response = []
+        for city_name, future in zip(cities, futures):
+            if future in done:
+                raw_cities_data_response.append(future.result())
+            else:
+                self._add_failed_city(city_name, "deadline exceeded")
 
+        self._log_concurrency_limit()
         cities_forecast_data = self._validate_raw_data(
-            raw_cities_data_response
+            iter(raw_cities_data_response)
         )
+        self._log_failed_cities()
         logger.info("Загрузка данных по городам завершена")
         return cities_forecast_data
 
-    def _fetch_city_forecast_data(self, city_name: str) -> Optional[Dict]:
+    @measured_stage("fetch")
+    def fetch_forecasts_async(
+        self, concurrency_limit: int = FETCH_CONCURRENCY_LIMIT
+    ) -> List[CityForecastRecord]:
+        """
+        Загрузка данных в одном event loop через AsyncYandexWeatherAPI.
+        Соединения с хостом переиспользуются (keep-alive). Количество
+        одновременных запросов подстраивает адаптивное ограничение клиента
+        API, как при загрузке пулом потоков; клиент без него ограничен
+        concurrency_limit.
+        """
+        import asyncio
+
+        logger.info("Начинаем асинхронно забирать данные по городам")
+        self.failed_cities = {}
+
+        raw_cities_data_response = asyncio.run(
+            self._fetch_all_cities_async(concurrency_limit)
+        )
+
+        cities_forecast_data = self._validate_raw_data(
+            iter(raw_cities_data_response)
+        )
+        self._log_concurrency_limit()
+        self._log_failed_cities()
+        logger.info("Асинхронная загрузка данных по городам завершена")
+        return cities_forecast_data
+
+    async def fetch_forecasts_with_client(
+        self, api_client: "AsyncYandexWeatherAPI"
+    ) -> List[CityForecastRecord]:
+        """
+        Асинхронная загрузка внутри уже запущенного event loop через открытый
+        клиент: соединения клиента остаются открытыми между вызовами
+        (используется резидентным планировщиком scheduler.py).
+        """
+        self.failed_cities = {}
+        raw_cities_data_response = await self._fetch_cities_with_client(api_client)
+        cities_forecast_data = self._validate_raw_data(
+            iter(raw_cities_data_response)
+        )
+        self._log_failed_cities()
+        return cities_forecast_data
+
+    def create_async_api_client(
+        self, concurrency_limit: int = FETCH_CONCURRENCY_LIMIT
+    ) -> "AsyncYandexWeatherAPI":
+        """
+        Асинхронный клиент с кэшем, таймаутами, повторами и адаптивным
+        ограничением одновременных запросов синхронного клиента.
+        """
+        from api_client import AsyncYandexWeatherAPI
+
+        return AsyncYandexWeatherAPI(
+            concurrency_limit,
+            cache=self.api_client.cache,
+            timeout=self.api_client.timeout,
+            retry_policy=self.api_client.retry_policy,
+            circuit_breaker=self.api_client.circuit_breaker,
+            response_parser=self.api_client.response_parser,
+            concurrency_limiter=self.api_client.concurrency_limiter,
+        )
+
+    async def _fetch_all_cities_async(
+        self, concurrency_limit: int
+    ) -> List[Optional[Dict]]:
+        """Внутренний метод конкурентной загрузки 'сырых' данных по всем городам"""
+        async with self.create_async_api_client(concurrency_limit) as api_client:
+            return await self._fetch_cities_with_client(api_client)
+
+    async def _fetch_cities_with_client(
+        self, api_client: "AsyncYandexWeatherAPI"
+    ) -> List[Optional[Dict]]:
+        import asyncio
+
+        cities = self._resolve_cities()
+        deadline = self._get_deadline()
+        tasks = [
+            asyncio.ensure_future(
+                self._fetch_city_forecast_data_async(
+                    api_client, city_name, deadline
+                )
+            )
+            for city_name in cities
+        ]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+        raw_cities_data_response = []
+        for city_name, task in zip(cities, tasks):
+            if task in done:
+                raw_cities_data_response.append(task.result())
+            else:
+                self._add_failed_city(city_name, "deadline exceeded")
+        return raw_cities_data_response
+
+    async def _fetch_city_forecast_data_async(
+        self,
+        api_client: "AsyncYandexWeatherAPI",
+        city_name: str,
+        deadline: Optional[float] = None,
+    ) -> Optional[Dict]:
+        """Внутренний метод для асинхронного получения 'сырых' данных от API"""
+        started = time.perf_counter()
+        try:
+            raw_city_data = await api_client.get_forecasting(
+                city_name, deadline
+            )
+            raw_city_data.update({"city_name": city_name})
+            return raw_city_data
+        except Exception as fetch_error:
+            self._add_failed_city(city_name, self._get_error_reason(fetch_error))
+            logger.error(
+                f"Произошла ошибка {fetch_error} во время загрузки данных"
+            )
+            return None
+        finally:
+            run_metrics.observe("fetch_latency_seconds", time.perf_counter() - started)
+
+    def _fetch_city_forecast_data(
+        self, city_name: str, deadline: Optional[float] = None
+    ) -> Optional[Dict]:
         """Внутренний метод для получения 'сырых' данных от API"""
+        started = time.perf_counter()
         try:
-            raw_city_data = self.api_client.get_forecasting(city_name)
+            raw_city_data = self.api_client.get_forecasting(city_name, deadline)
             # добавляем новый ключ city_name который нам понадобится
-            # при валидации данных в моделе CityWeatherDataModel
+            # при валидации данных в CityForecastRecord
             raw_city_data.update({"city_name": city_name})
             return raw_city_data
         except Exception as fetch_error:
+            self._add_failed_city(city_name, self._get_error_reason(fetch_error))
             logger.error(
                 f"Произошла ошибка {fetch_error} во время загрузки данных"
             )
+            return None
+        finally:
+            run_metrics.observe("fetch_latency_seconds", time.perf_counter() - started)
+
+    def _resolve_cities(self) -> List[str]:
+        """
+        Пакетный поиск городов в реестре (city_registry.py) до загрузки:
+        неизвестные города сразу попадают в failed_cities без запросов,
+        остальные загружаются под основными названиями реестра без повторов.
+        """
+        cities, unknown_cities = self.api_client.resolve_cities(self.cities)
+        for city_name in unknown_cities:
+            self._add_failed_city(city_name, "unknown city")
+        return cities
+
+    def _create_fetch_pool(self) -> ThreadPoolExecutor:
+        """
+        Пул потоков загрузки. С адаптивным ограничением клиента потоков столько,
+        сколько допускает верхняя граница: одновременные запросы дозирует само ограничение.
+        """
+        limiter = self.api_client.concurrency_limiter
+        if limiter is None:
+            return ThreadPoolExecutor()
+        logger.info(
+            f"Одновременных запросов: {limiter.limit}"
+            + (f" (подстраивается от {limiter.min_limit} до {limiter.max_limit})" if limiter.is_adaptive else "")
+        )
+        return ThreadPoolExecutor(limiter.max_limit)
+
+    def _log_concurrency_limit(self) -> None:
+        """Внутренний метод записи в лог и в метрики итогового количества одновременных запросов"""
+        limiter = self.api_client.concurrency_limiter
+        if limiter is None or not limiter.is_adaptive:
+            return
+        run_metrics.set_max("fetch_concurrency_peak", limiter.peak_limit)
+        logger.info(
+            f"Количество одновременных запросов после загрузки: {limiter.limit} "
+            f"(наибольшее {limiter.peak_limit}, увеличений {limiter.increases}, уменьшений {limiter.decreases})"
+        )
+
+    def _get_deadline(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return time.monotonic() + self.deadline
+
+    def _add_failed_city(self, city_name: str, reason: str) -> None:
+        # запрос, завершившийся после дедлайна, не перезаписывает причину
+        self.failed_cities.setdefault(city_name, reason)
+
+    @staticmethod
+    def _get_error_reason(error: Exception) -> str:
+        from api_client import ApiRequestError
+
+        if isinstance(error, ApiRequestError):
+            return error.reason
+        return str(error)
+
+    def _log_failed_cities(self) -> None:
+        """Внутренний метод записи в лог отчета по городам, данные по которым не получены"""
+        run_metrics.increment("failed_cities", len(self.failed_cities))
+        if not self.failed_cities:
+            return
+        report = "; ".join(
+            f"{city_name}: {reason}"
+            for city_name, reason in self.failed_cities.items()
+        )
+        logger.warning(
+            f"Не удалось получить данные для {len(self.failed_cities)} "
+            f"из {len(self.cities)} городов. {report}"
+        )
+
+    @measured_stage("fetch")
+    def fetch_forecasts_to_queue(self, output_queue: Queue) -> None:
+        """
+        Потоковая загрузка данных. Каждый провалидированный город сразу
+        кладется в очередь в виде пары (индекс города, модель).
+        Ограниченная очередь приостанавливает загрузку, пока ее не разберут.
+        В конце в очередь кладется None.
+        """
+        logger.info("Начинаем потоково забирать данные по городам")
+        self.failed_cities = {}
+        cities = self._resolve_cities()
+        deadline = self._get_deadline()
 
+        pool = self._create_fetch_pool()
+        try:
+            futures = {
+                pool.submit(
+                    self._fetch_city_forecast_data, city_name, deadline
+                ): index
+                for index, city_name in enumerate(cities)
+            }
+            try:
+                for future in as_completed(futures, timeout=self.deadline):
+                    # обработанный future не хранится: его результат - разобранный ответ API
+                    index = futures.pop(future)
+                    city_data = self._validate_city_data(future.result())
+                    if city_data is not None:
+                        output_queue.put((index, city_data))
+            except FuturesTimeoutError:
+                for index in sorted(futures.values()):
+                    self._add_failed_city(cities[index], "deadline exceeded")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            output_queue.put(None)
+
+        self._log_concurrency_limit()
+        self._log_failed_cities()
+        logger.info("Потоковая загрузка данных по городам завершена")
+
+    def fetch_forecasts_to_file(self, file_name: str) -> ForecastFile:
+        """
+        Загрузка данных с записью каждого провалидированного города в конец
+        файла прогнозов file_name (forecast_file.py) сразу после загрузки.
+        В памяти остаются только смещения городов, а не сами прогнозы.
+        Возвращает города файла в исходном порядке.
+        """
+        cities_queue: Queue = Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        fetch_errors: List[BaseException] = []
+
+        def fetch() -> None:
+            try:
+                self.fetch_forecasts_to_queue(cities_queue)
+            except BaseException as fetch_error:
+                fetch_errors.append(fetch_error)
+
+        fetcher = Thread(target=fetch)
+        fetcher.start()
+        offsets: Dict[int, int] = {}
+        input_finished = False
+        try:
+            with ForecastFileWriter(file_name) as writer:
+                while True:
+                    item = cities_queue.get()
+                    if item is None:
+                        input_finished = True
+                        break
+                    index, city_data = item
+                    offsets[index] = writer.append(city_data)
+        finally:
+            # при ошибке записи очередь разбирается, чтобы загрузка не заблокировалась
+            while not input_finished:
+                input_finished = cities_queue.get() is None
+            fetcher.join()
+        if fetch_errors:
+            raise fetch_errors[0]
+        return ForecastFile(file_name, [offsets[index] for index in sorted(offsets)])
+
+    @measured_stage("validation")
     def _validate_raw_data(
-        self, raw_cities_data_response: Iterator[Dict | None]
-    ) -> List[CityWeatherDataModel]:
+        self, raw_cities_data_response: Iterator[Optional[Dict]]
+    ) -> List[CityForecastRecord]:
         """Внутренний метод валидации 'сырых' данных."""
         validated_result = []
         for city_data in raw_cities_data_response:
-            if city_data is None:
-                continue
-            try:
-                data = CityWeatherDataModel(**city_data)
+            data = self._validate_city_data(city_data)
+            if data is not None:
                 validated_result.append(data)
-            except ValueError as value_error:
-                logger.error(
-                    f"Произошла ошибка {value_error} во время валидации данных"
-                    f" в моделе CityWeatherDataModel"
-                )
-                continue
 
         return validated_result
 
+    def _validate_city_data(
+        self, city_data: Optional[Dict]
+    ) -> Optional[CityForecastRecord]:
+        """
+        Внутренний метод валидации 'сырых' данных одного города.
+        Данные проверяются один раз и упаковываются в CityForecastRecord
+        без создания модели pydantic на каждый час.
+        """
+        if city_data is None:
+            return None
+        try:
+            return CityForecastRecord.from_raw(city_data)
+        except ValueError as value_error:
+            run_metrics.increment("validation_failures")
+            self._add_failed_city(
+                city_data["city_name"], f"validation error: {value_error}"
+            )
+            logger.error(
+                f"Произошла ошибка {value_error} во время валидации данных"
+                f" города {city_data['city_name']}"
+            )
+            return None
+
 
 class DataCalculationTask:
     MIN_HOUR = 9
     MAX_HOUR = 19
 
-    def __init__(self, cities_forecasts: List[CityWeatherDataModel]) -> None:
+    def __init__(
+        self,
+        cities_forecasts: Union[List[Union[CityForecastRecord, "CityWeatherDataModel"]], ForecastFile],
+        store: Optional["CalculationStore"] = None,
+        windows: Sequence[WindowSpec] = (),
+    ) -> None:
+        """
+        cities_forecasts - прогнозы по городам или файл прогнозов (ForecastFile):
+        из файла процессы пула читают свои города сами, по смещениям.
+        windows - дополнительные окна (windows.py): считаются в том же проходе
+        по часам, что и основное окно MIN_HOUR..MAX_HOUR, результат - в поле aggregates.
+        """
+        validate_windows(windows)
         self.cities_forecasts = cities_forecasts
+        self.store = store
+        self.windows = tuple(windows)
+        self.incremental_stats: Dict[str, int] = {}
 
-    def get_calculated_data(self) -> List[CalculatedCityWeatherDataModel]:
-        """Публичный метод запуска просчета данных по городам."""
-        with ProcessPoolExecutor() as pool:
-            raw_result = pool.map(self._calculate_data, self.cities_forecasts)
+    @measured_stage("calculation")
+    def get_calculated_data(self) -> List[CalculatedCityRecord]:
+        """
+        Публичный метод запуска просчета данных по городам.
+        Города передаются в общий пул процессов пачками в компактном виде.
+        Небольшие наборы считаются в текущем процессе: передача дороже просчета.
+        Если задано хранилище store, неизменившиеся города и дни не пересчитываются.
+        Города файла прогнозов без хранилища store передаются в пул смещениями.
+        """
+        if isinstance(self.cities_forecasts, ForecastFile) and self.store is None:
+            raw_result = self._map_chunks(
+                calculate_file_chunk,
+                self.cities_forecasts.offsets,
+                self.cities_forecasts.file_name,
+                self.windows,
+            )
+            return [CalculatedCityRecord.from_dict(raw_city_result) for raw_city_result in raw_result]
+        payloads = [to_payload(city_data) for city_data in self.cities_forecasts]
+        if self.store is not None:
+            raw_result = self._calculate_incrementally(payloads)
+        else:
+            raw_result = self._map_chunks(calculate_chunk, payloads, self.windows)
         result = [
-            CalculatedCityWeatherDataModel(**raw_city_result)
+            CalculatedCityRecord.from_dict(raw_city_result)
             for raw_city_result in raw_result
         ]
         return result
 
-    def _calculate_data(self, city_data: CityWeatherDataModel) -> Dict:
-        """Внутренний метод вычисления значений по городую."""
-        hours_period = self.MAX_HOUR - self.MIN_HOUR
-
-        city_data_forecast = {"city_name": city_data.city_name, "days": []}
-        total_days_temp = 0
-        total_hours_good_weather = 0
-        days = 0
+    def _map_chunks(self, calculate: Callable, items: List, *args) -> List:
+        """
+        Внутренний метод применения функции просчета пачки к элементам:
+        в текущем процессе или пачками в общем пуле процессов.
+        args передаются в calculate после MIN_HOUR и MAX_HOUR.
+        """
+        if len(items) < CALCULATION_INPROCESS_THRESHOLD:
+            return calculate(items, self.MIN_HOUR, self.MAX_HOUR, *args)
+        chunk_size = self._get_chunk_size(len(items))
+        chunks = [
+            items[start:start + chunk_size]
+            for start in range(0, len(items), chunk_size)
+        ]
+        run_metrics.observe("pool_queue_depth", len(chunks), DEPTH_BUCKETS)
+        return [
+            item_result
+            for chunk_result in worker_pool.executor.map(
+                calculate,
+                chunks,
+                repeat(self.MIN_HOUR),
+                repeat(self.MAX_HOUR),
+                *[repeat(arg) for arg in args],
+            )
+            for item_result in chunk_result
+        ]
 
-        for forecast in city_data.forecasts:
-            logger.info(
-                f"Начинаем считать данные для даты: {forecast.date} г.{city_data.city_name}"
+    def _calculate_incrementally(self, payloads: List[CityPayload]) -> List[Dict]:
+        """
+        Внутренний метод инкрементального просчета. Результаты по городам и
+        дням берутся из хранилища по отпечаткам данных, считаются только
+        изменившиеся дни, итоги по изменившимся городам собираются заново.
+        С дополнительными окнами изменившиеся города считаются целиком:
+        агрегаты окон зависят от всех дней города.
+        """
+        days_fingerprints = [
+            [day_fingerprint(day, self.MIN_HOUR, self.MAX_HOUR) for day in days]
+            for _, days in payloads
+        ]
+        cities_fingerprints = [
+            city_fingerprint(city_name, fingerprints, self.windows)
+            for (city_name, _), fingerprints in zip(payloads, days_fingerprints)
+        ]
+        stored_cities = self.store.get_cities(cities_fingerprints)
+        changed_cities = [
+            index
+            for index, fingerprint in enumerate(cities_fingerprints)
+            if fingerprint not in stored_cities
+        ]
+        if self.windows:
+            changed_results = self._map_chunks(
+                calculate_chunk, [payloads[index] for index in changed_cities], self.windows
             )
-            forecast_data = {
-                "date": forecast.date,
-            }
-            total_temp = 0
-            good_weather_hours = 0
-            days += 1
-            # если нет данных по времени идем на другой день
-            if len(forecast.hours) == 0:
-                continue
-            for item in forecast.hours:
-                if self.MIN_HOUR <= item.hour <= self.MAX_HOUR:
-                    total_temp += item.temp
-                    if item.condition in GOOD_WEATHER_CONDITIONS:
-                        good_weather_hours += 1
-            days_avg_temp = total_temp / hours_period
-            forecast_data["average_temp"] = round(days_avg_temp, 1)
-            forecast_data["good_weather_hours"] = good_weather_hours
-            city_data_forecast["days"].append(forecast_data)
+            days_recalculated = sum(len(payloads[index][1]) for index in changed_cities)
+        else:
+            changed_results, days_recalculated = self._calculate_changed_days(
+                payloads, days_fingerprints, changed_cities
+            )
+        changed_city_results = dict(zip(changed_cities, changed_results))
 
-            total_days_temp += days_avg_temp
-            total_hours_good_weather += good_weather_hours
+        raw_result = []
+        calculated_cities = []
+        for index, fingerprint in enumerate(cities_fingerprints):
+            if fingerprint in stored_cities:
+                raw_result.append(stored_cities[fingerprint])
+                continue
+            city_result = changed_city_results[index]
+            calculated_cities.append((fingerprint, city_result))
+            raw_result.append(city_result)
+        self.store.save_cities(calculated_cities)
+
+        days_count = sum(len(fingerprints) for fingerprints in days_fingerprints)
+        self.incremental_stats = {
+            "cities_recalculated": len(changed_cities),
+            "cities_reused": len(payloads) - len(changed_cities),
+            "days_recalculated": days_recalculated,
+            "days_reused": days_count - days_recalculated,
+        }
+        logger.info(
+            f"Инкрементальный просчет: городов пересчитано "
+            f"{self.incremental_stats['cities_recalculated']}, переиспользовано "
+            f"{self.incremental_stats['cities_reused']}; дней пересчитано "
+            f"{self.incremental_stats['days_recalculated']}, переиспользовано "
+            f"{self.incremental_stats['days_reused']}"
+        )
+        return raw_result
+
+    def _calculate_changed_days(
+        self,
+        payloads: List[CityPayload],
+        days_fingerprints: List[List[str]],
+        changed_cities: List[int],
+    ) -> Tuple[List[Dict], int]:
+        """
+        Внутренний метод просчета изменившихся городов по дням: результаты
+        неизменившихся дней берутся из хранилища. Возвращает результаты
+        по городам changed_cities и количество пересчитанных дней.
+        """
+        day_results = self.store.get_days(
+            fingerprint
+            for index in changed_cities
+            for fingerprint in days_fingerprints[index]
+        )
 
-        city_data_forecast["total_average_temp"] = round(
-            total_days_temp / days, 1
+        missing_days: Dict[str, DayPayload] = {}
+        for index in changed_cities:
+            for day, fingerprint in zip(payloads[index][1], days_fingerprints[index]):
+                if fingerprint not in day_results:
+                    missing_days.setdefault(fingerprint, day)
+        calculated_days = dict(
+            zip(
+                missing_days,
+                self._map_chunks(calculate_days_chunk, list(missing_days.values())),
+            )
         )
-        city_data_forecast["total_average_good_weather_hours"] = round(
-            total_hours_good_weather / days, 1
+        self.store.save_days(calculated_days.items())
+        day_results.update(calculated_days)
+
+        city_results = []
+        for index in changed_cities:
+            city_name, days = payloads[index]
+            city_results.append(
+                combine_days(
+                    city_name,
+                    [day[0] for day in days],
+                    [day_results[fingerprint] for fingerprint in days_fingerprints[index]],
+                    self.MAX_HOUR - self.MIN_HOUR,
+                )
+            )
+        return city_results, len(calculated_days)
+
+    @staticmethod
+    def _get_chunk_size(cities_count: int) -> int:
+        """Внутренний метод выбора размера пачки: несколько пачек на каждый процесс."""
+        if CALCULATION_CHUNK_SIZE:
+            return CALCULATION_CHUNK_SIZE
+        chunks_count = worker_pool.workers_count * 4
+        return max(1, -(-cities_count // chunks_count))
+
+    @measured_stage("calculation")
+    def get_calculated_data_vectorized(
+        self,
+    ) -> List[CalculatedCityRecord]:
+        """
+        Просчет данных сразу по всем городам векторизованными операциями NumPy
+        над колоночным представлением прогнозов. Требует установленный numpy.
+        """
+        from columnar import ColumnarForecasts, calculate_columnar
+
+        logger.info("Запуск векторизованного просчета данных по городам")
+        forecasts = ColumnarForecasts.from_models(self.cities_forecasts)
+        raw_result = calculate_columnar(
+            forecasts, self.MIN_HOUR, self.MAX_HOUR, self.windows
         )
-        logger.info(f"Подсчет закончен для г.{city_data.city_name}")
+        return [
+            CalculatedCityRecord.from_dict(raw_city_result)
+            for raw_city_result in raw_result
+        ]
+
+    @measured_stage("calculation")
+    def calculate_from_queue(
+        self,
+        input_queue: Queue,
+        output_queue: Queue,
+        max_in_flight: int = PIPELINE_QUEUE_SIZE,
+    ) -> None:
+        """
+        Потоковый просчет данных. Забирает пары (индекс, модель) из input_queue
+        по мере загрузки и отдает пары (индекс, результат) в output_queue
+        по мере готовности. Признак конца потока в обеих очередях - None.
+        """
+        logger.info("Запуск потокового просчета данных по городам")
+        input_finished = False
+        pool = worker_pool.executor
+        in_flight: Dict[Future, int] = {}
+        try:
+            while True:
+                item = input_queue.get()
+                if item is None:
+                    input_finished = True
+                    break
+                index, city_data = item
+                future = pool.submit(
+                    calculate_payload,
+                    to_payload(city_data),
+                    self.MIN_HOUR,
+                    self.MAX_HOUR,
+                    self.windows,
+                )
+                in_flight[future] = index
+                run_metrics.observe("pool_queue_depth", len(in_flight), DEPTH_BUCKETS)
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._put_calculated(done, in_flight, output_queue)
+            self._put_calculated(wait(in_flight).done, in_flight, output_queue)
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            # разбираем входную очередь, чтобы не заблокировать загрузку
+            while not input_finished:
+                input_finished = input_queue.get() is None
+            raise
+        finally:
+            output_queue.put(None)
+        logger.info("Потоковый просчет данных по городам завершен")
+
+    @staticmethod
+    def _put_calculated(
+        done: Iterable[Future], in_flight: Dict[Future, int], output_queue: Queue
+    ) -> None:
+        """Внутренний метод передачи готовых результатов в выходную очередь."""
+        for future in done:
+            index = in_flight.pop(future)
+            output_queue.put(
+                (index, CalculatedCityRecord.from_dict(future.result()))
+            )
 
-        return city_data_forecast
+    def _calculate_data(
+        self, city_data: Union[CityForecastRecord, "CityWeatherDataModel"]
+    ) -> Dict:
+        """Внутренний метод вычисления значений по городую."""
+        return calculate_payload(
+            to_payload(city_data), self.MIN_HOUR, self.MAX_HOUR, self.windows
+        )
 
 
 class DataAnalyzingTask:
+    # ключ "благоприятности": средняя температура, затем часы без осадков
+    RATING_KEY = attrgetter(
+        "total_average_temp", "total_average_good_weather_hours"
+    )
+
     def __init__(
-        self, calculated_cities_data: List[CalculatedCityWeatherDataModel]
+        self, calculated_cities_data: List[CalculatedCityRecord]
     ) -> None:
         self.data = calculated_cities_data
         self.main_town = None
+        # все города, разделившие первое место
+        self.main_towns: List[str] = []
 
-    def analyze_data(self) -> List[CalculatedCityWeatherDataModel]:
-        """Метод для запуска сортировки городов, выставления рейтинга и записи наилучшего города."""
+    @measured_stage("analysis")
+    def analyze_data(
+        self, dense_ranking: bool = False
+    ) -> List[CalculatedCityRecord]:
+        """
+        Метод для запуска сортировки городов, выставления рейтинга и записи наилучшего города.
+        dense_ranking - города с одинаковыми показателями получают одинаковый рейтинг.
+        """
         self._sort_data_by_temp_and_weather()
-        self._set_rating_to_cities()
+        self._set_rating_to_cities(dense_ranking)
         self._set_main_town()
 
         return self.data
 
+    @measured_stage("analysis")
+    def get_top_cities(
+        self, k: int, dense_ranking: bool = False
+    ) -> List[CalculatedCityRecord]:
+        """
+        Метод выбора k лучших городов без полной сортировки (отбор через кучу,
+        память пропорциональна k). Рейтинг выставляется только выбранным городам,
+        порядок совпадает с первыми k городами analyze_data.
+        """
+        logger.info(f"Запуск отбора {k} лучших городов")
+        top_cities = heapq.nlargest(k, self.data, key=self.RATING_KEY)
+        self._assign_ratings(top_cities, dense_ranking)
+        self._set_main_town()
+        return top_cities
+
     def _sort_data_by_temp_and_weather(self) -> None:
         """Внутренний метод сортировки городов по температуре и 'хорошим' дням."""
         logger.info(
             "Запуск сортировки городов по средней температуре и погожих днях"
         )
-        self.data = sorted(
-            self.data,
-            key=lambda x: [
-                x.total_average_temp,
-                x.total_average_good_weather_hours,
-            ],
-            reverse=True,
-        )
+        self.data = sorted(self.data, key=self.RATING_KEY, reverse=True)
 
-    def _set_rating_to_cities(self) -> None:
+    def _set_rating_to_cities(self, dense_ranking: bool = False) -> None:
         """Внутренний метод установки атрибута rating для городов."""
         logger.info("Запуск установки рейтингов для городов")
-        for rating, city_data in enumerate(self.data, 1):
+        self._assign_ratings(self.data, dense_ranking)
+
+    @classmethod
+    def _assign_ratings(
+        cls,
+        sorted_cities: List[CalculatedCityRecord],
+        dense_ranking: bool,
+    ) -> None:
+        """Внутренний метод выставления рейтинга отсортированным городам."""
+        rating = 0
+        previous_key = None
+        for position, city_data in enumerate(sorted_cities, 1):
+            key = cls.RATING_KEY(city_data)
+            if not dense_ranking:
+                rating = position
+            elif key != previous_key:
+                rating += 1
             city_data.rating = rating
+            previous_key = key
 
     def _set_main_town(self) -> None:
-        """Внутренний метод устанавлиев 'лучший' город для посещения среди отсортированных городов"""
-        self.main_town = self.data[0].city_name
+        """
+        Внутренний метод устанавлиев 'лучший' город для посещения.
+        main_towns - все города с наилучшими показателями, поиск за один проход.
+        """
+        best_key = None
+        self.main_towns = []
+        for city_data in self.data:
+            key = self.RATING_KEY(city_data)
+            if best_key is None or key > best_key:
+                best_key = key
+                self.main_towns = [city_data.city_name]
+            elif key == best_key:
+                self.main_towns.append(city_data.city_name)
+        self.main_town = self.main_towns[0] if self.main_towns else None
 
 
 class DataAggregationTask:
-    def __init__(self, data: List[CalculatedCityWeatherDataModel]) -> None:
+    def __init__(self, data: List[CalculatedCityRecord]) -> None:
         self.data = data
-        self._locker = Lock()
 
-    def save_data_to_csv(self) -> None:
+    def save_data_to_csv(self, file_name: str = CSV_FILE_NAME) -> None:
         """Публичный метод сохранения данных в csv файл."""
-        data_to_csv, csv_headers = self._prepare_data_to_csv()
-        logger.info("Запуск импорта данных в csv файл")
-        self._write_headers(csv_headers)
-
-        with ThreadPoolExecutor() as pool:
-            for row in data_to_csv:
-                pool.submit(self._write_row_to_csv, row)
-        logger.info(f"CSV файл {CSV_FILE_NAME} успешно создан")
-        print(f"CSV файл {CSV_FILE_NAME} успешно создан")
-
-    def _prepare_data_to_csv(self) -> Tuple[List, List]:
-        """Внутренний метод подготовки данных для создания csv файла."""
-        logger.info("Запуск подготовки данных для импорта в csv таблицу")
-        headers = [
-            "Город/день",
-            "",
-            *[city_day.date for city_day in self.data[0].days],
-            "Среднее",
-            "Рейтинг",
-        ]
-
-        data_to_csv = []
-
-        for city in self.data:
-            temp_data = [
-                city.city_name,
-                "Температура, среднее",
-                *city.get_avg_temp_data(),
-                city.total_average_temp,
-                city.rating,
-            ]
-            data_to_csv.append(temp_data)
-            good_hours_data = [
-                "",
-                "Без осадков, часов",
-                *city.get_all_good_weather_hours(),
-                city.total_average_good_weather_hours,
-                "",
-            ]
-            data_to_csv.append(good_hours_data)
-
-        return data_to_csv, headers
-
-    def _write_row_to_csv(self, row: List) -> None:
-        """Внутренний метод записи строк в csv файл. Поток блокируется перед записью строки."""
-        with open(CSV_FILE_NAME, "a") as file:
-            with self._locker:
-                writer = csv.writer(file, quoting=csv.QUOTE_NONNUMERIC)
-                writer.writerow(row)
-
-    def _write_headers(self, headers: List[str]) -> None:
-        """Внутренний метод записи хедеров в csv файл. Используется режим 'w' для 'обнуления' файла."""
-        with open(CSV_FILE_NAME, "w") as file:
-            writer = csv.writer(file, quoting=csv.QUOTE_NONNUMERIC)
-            writer.writerow(headers)
+        self.save_data("csv", file_name)
 
+    @measured_stage("aggregation")
+    def save_data(self, output_format: str = "csv", file_name: Optional[str] = None) -> str:
+        """
+        Публичный метод сохранения данных в файл формата output_format
+        (см. output_writers.OUTPUT_WRITERS). Возвращает имя созданного файла.
+        Города пачками через очередь передаются одному потоку-писателю,
+        который пишет их во временный файл в исходном порядке.
+        Готовый файл атомарно заменяет file_name.
+        """
+        from output_writers import get_output_writer
+
+        writer_class = get_output_writer(output_format)
+        if file_name is None:
+            file_name = f"{OUTPUT_FILE_BASE_NAME}.{writer_class.extension}"
+        logger.info(f"Запуск импорта данных в {output_format} файл")
+        cities_queue: Queue = Queue(maxsize=AGGREGATION_QUEUE_SIZE)
+        write_errors: List[BaseException] = []
+        cities_aborted = Event()
+        dates = [city_day.date for city_day in self.data[0].days] if self.data else []
+        writer = Thread(
+            target=self._write_cities_from_queue,
+            args=(cities_queue, writer_class, file_name, dates, cities_aborted, write_errors),
+        )
+        writer.start()
+        try:
+            for start in range(0, len(self.data), AGGREGATION_BATCH_SIZE):
+                run_metrics.observe("aggregation_queue_depth", cities_queue.qsize(), DEPTH_BUCKETS)
+                cities_queue.put(self.data[start:start + AGGREGATION_BATCH_SIZE])
+        except BaseException:
+            cities_aborted.set()
+            raise
+        finally:
+            cities_queue.put(None)
+            writer.join()
+        if write_errors:
+            raise write_errors[0]
+        logger.info(f"Файл {file_name} успешно создан")
+        print(f"Файл {file_name} успешно создан")
+        return file_name
+
+    @staticmethod
+    def _write_cities_from_queue(
+        cities_queue: Queue,
+        writer_class: Type["OutputWriter"],
+        file_name: str,
+        dates: List[str],
+        cities_aborted: Event,
+        write_errors: List[BaseException],
+    ) -> None:
+        """
+        Внутренний метод потока-писателя. Пишет пачки городов из очереди
+        до получения None, затем переименовывает временный файл.
+        Если передача городов прервана ошибкой, временный файл удаляется.
+        При ошибке очередь продолжает разбираться, чтобы не заблокировать передачу городов.
+        """
+        # поток-писатель создается на каждый вызов save_data, поэтому идентификатор
+        # потока делает имя уникальным и для одновременных вызовов внутри процесса
+        temp_file_name = f"{file_name}.{os.getpid()}.{get_ident()}.tmp"
+        input_finished = False
+        output_writer = None
+        try:
+            output_writer = writer_class(temp_file_name, dates)
+            while True:
+                cities_batch = cities_queue.get()
+                if cities_batch is None:
+                    input_finished = True
+                    break
+                output_writer.write_cities(cities_batch)
+            if cities_aborted.is_set():
+                output_writer.discard()
+                os.remove(temp_file_name)
+                return
+            output_writer.close()
+            output_writer = None
+            os.replace(temp_file_name, file_name)
+        except BaseException as write_error:
+            logger.error(
+                f"Произошла ошибка {write_error} во время записи файла {file_name}"
+            )
+            write_errors.append(write_error)
+            while not input_finished:
+                input_finished = cities_queue.get() is None
+            if output_writer is not None:
+                output_writer.discard()
+            if os.path.exists(temp_file_name):
+                os.remove(temp_file_name)
@@ -2,6 +2,8 @@
 
 import pytest
 
+from local_server import LocalWeatherServer
+from replay import ReplayYandexWeatherAPI, generate_responses
 from tasks import DataFetchingTask, DataCalculationTask, DataAnalyzingTask
 
 
@@ -11,8 +13,18 @@ def cities():
 
 
 @pytest.fixture()
-def cities_forecast(cities):
-    fetch_data_service = DataFetchingTask(cities)
+def replay_api_client(cities):
+    """
+    Клиент с синтетическими ответами replay.generate_responses на 5 дней.
+    Ответы зависят только от названий городов, поэтому значения просчета
+    повторяются между запусками; сеть не используется.
+    """
+    return ReplayYandexWeatherAPI(generate_responses(cities, days_count=5))
+
+
+@pytest.fixture()
+def cities_forecast(cities, replay_api_client):
+    fetch_data_service = DataFetchingTask(cities, replay_api_client)
     cities_forecasts = fetch_data_service.fetch_forecasts()
     return cities_forecasts
 
@@ -50,3 +62,18 @@ def analyzed_data(calculated_data):
 def city_ratings(analyzed_data):
     return [city.rating for city in analyzed_data]
 
+
+@pytest.fixture()
+def local_cities():
+    return ["MOSCOW", "PARIS", "BEIJING"]
+
+
+@pytest.fixture()
+def local_weather_server(local_cities, monkeypatch):
+    """Локальный сервер вместо API, url городов подменяются в CITIES."""
+    import utils
+
+    with LocalWeatherServer.from_example(local_cities) as server:
+        for city_name, url in server.urls().items():
+            monkeypatch.setitem(utils.CITIES, city_name, url)
+        yield server
@@ -0,0 +1,70 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models import CalculatedCityWeatherDataModel
+from tasks import DataAggregationTask
+
+
+def make_cities(cities_count):
+    return [
+        CalculatedCityWeatherDataModel(
+            city_name=f"CITY_{index}",
+            days=[
+                {"date": "2022-05-18", "average_temp": index / 10, "good_weather_hours": index % 11},
+                {"date": "2022-05-19", "average_temp": -index / 10, "good_weather_hours": 3},
+            ],
+            total_average_temp=0.0,
+            total_average_good_weather_hours=(index % 11 + 3) / 2,
+            rating=index + 1,
+        )
+        for index in range(cities_count)
+    ]
+
+
+class TestCsvWriter:
+
+    def test_rows_order_is_deterministic(self, tmp_path, monkeypatch):
+        import tasks
+
+        monkeypatch.setattr(tasks, "AGGREGATION_BATCH_SIZE", 7)
+        file_path = tmp_path / "table.csv"
+        DataAggregationTask(make_cities(100)).save_data_to_csv(str(file_path))
+        with open(file_path) as file:
+            rows = list(csv.reader(file, quoting=csv.QUOTE_NONNUMERIC))
+        assert rows[0] == ["Город/день", "", "2022-05-18", "2022-05-19", "Среднее", "Рейтинг"], (
+            "Заголовки не совпадают"
+        )
+        assert len(rows) == 201, "Количество строк не совпадает"
+        assert [row[0] for row in rows[1::2]] == [f"CITY_{index}" for index in range(100)], (
+            "Порядок городов не совпадает"
+        )
+        assert list(tmp_path.iterdir()) == [file_path], "Временный файл не удален"
+
+    def test_concurrent_saves_to_same_file(self, tmp_path, monkeypatch):
+        import tasks
+
+        monkeypatch.setattr(tasks, "AGGREGATION_BATCH_SIZE", 1)
+        file_path = tmp_path / "table.csv"
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(DataAggregationTask(make_cities(200)).save_data_to_csv, str(file_path))
+                for _ in range(4)
+            ]
+            for future in futures:
+                future.result()
+        with open(file_path) as file:
+            rows = list(csv.reader(file, quoting=csv.QUOTE_NONNUMERIC))
+        assert len(rows) == 401, "Файл собран из нескольких одновременных записей"
+        assert list(tmp_path.iterdir()) == [file_path], "Временный файл не удален"
+
+    def test_write_error_keeps_previous_file(self, tmp_path):
+        file_path = tmp_path / "table.csv"
+        file_path.write_text("previous")
+        cities = make_cities(3)
+        cities[1].days = None
+        with pytest.raises(TypeError):
+            DataAggregationTask(cities).save_data_to_csv(str(file_path))
+        assert file_path.read_text() == "previous", "Предыдущий файл поврежден"
+        assert list(tmp_path.iterdir()) == [file_path], "Временный файл не удален"
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from models import CalculatedCityWeatherDataModel
+from tasks import DataAnalyzingTask
+
+
+def make_city(city_name, total_average_temp, total_average_good_weather_hours):
+    return CalculatedCityWeatherDataModel(
+        city_name=city_name,
+        days=[],
+        total_average_temp=total_average_temp,
+        total_average_good_weather_hours=total_average_good_weather_hours,
+    )
+
+
+@pytest.fixture()
+def tied_cities():
+    return [
+        make_city("MOSCOW", 10.0, 5.0),
+        make_city("CAIRO", 30.0, 9.0),
+        make_city("ROMA", 25.0, 7.0),
+        make_city("ABUDHABI", 30.0, 9.0),
+        make_city("PARIS", 25.0, 7.0),
+    ]
+
+
+class TestRanking:
+
+    def test_all_tied_best_cities(self, tied_cities):
+        analyzer_data_service = DataAnalyzingTask(tied_cities)
+        analyzer_data_service.analyze_data()
+        assert analyzer_data_service.main_town == "CAIRO", "Наилучший город не совпадает"
+        assert analyzer_data_service.main_towns == ["CAIRO", "ABUDHABI"], "Список наилучших городов не совпадает"
+
+    def test_dense_ranking(self, tied_cities):
+        analyzed_data = DataAnalyzingTask(tied_cities).analyze_data(dense_ranking=True)
+        ratings = {city.city_name: city.rating for city in analyzed_data}
+        assert ratings == {"CAIRO": 1, "ABUDHABI": 1, "ROMA": 2, "PARIS": 2, "MOSCOW": 3}, "Рейтинги не совпадают"
+
+    def test_top_cities_match_full_sort(self):
+        random.seed(0)
+        cities = [make_city(f"CITY_{index}", random.randint(0, 30), random.randint(0, 10)) for index in range(1000)]
+        for dense_ranking in (False, True):
+            full_ranking = [
+                (city.city_name, city.rating)
+                for city in DataAnalyzingTask([c.copy() for c in cities]).analyze_data(dense_ranking)
+            ]
+            top_cities = DataAnalyzingTask(cities).get_top_cities(10, dense_ranking)
+            assert [(city.city_name, city.rating) for city in top_cities] == full_ranking[:10], (
+                "Лучшие города не совпадают с полной сортировкой"
+            )
+
+    def test_top_cities_set_only_selected_ratings(self, tied_cities):
+        analyzer_data_service = DataAnalyzingTask(tied_cities)
+        top_cities = analyzer_data_service.get_top_cities(2)
+        assert [city.city_name for city in top_cities] == ["CAIRO", "ABUDHABI"], "Лучшие города не совпадают"
+        assert [city.rating for city in tied_cities if city not in top_cities] == [None] * 3, (
+            "Рейтинг выставлен невыбранным городам"
+        )
+        assert analyzer_data_service.main_towns == ["CAIRO", "ABUDHABI"], "Список наилучших городов не совпадает"
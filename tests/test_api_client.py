@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from api_client import AsyncYandexWeatherAPI, YandexWeatherAPI
+from tasks import DataFetchingTask
+
+
+class TestAsyncApiClient:
+
+    def test_get_forecasting(self, local_weather_server):
+        async def fetch():
+            async with AsyncYandexWeatherAPI() as api_client:
+                return await api_client.get_forecasting("MOSCOW")
+
+        response = asyncio.run(fetch())
+        assert response == YandexWeatherAPI().get_forecasting("MOSCOW"), "Ответы клиентов не совпадают"
+
+    def test_connections_are_reused(self, local_weather_server, local_cities):
+        async def fetch():
+            async with AsyncYandexWeatherAPI(concurrency_limit=1) as api_client:
+                for city_name in local_cities * 3:
+                    await api_client.get_forecasting(city_name)
+                return sum(len(conns) for conns in api_client._idle_connections.values())
+
+        assert asyncio.run(fetch()) == 1, "Соединение с хостом не переиспользуется"
+
+    def test_not_found_raises(self, local_weather_server, monkeypatch):
+        import utils
+
+        monkeypatch.setitem(utils.CITIES, "UNKNOWN", local_weather_server.url_for("UNKNOWN"))
+
+        async def fetch():
+            async with AsyncYandexWeatherAPI() as api_client:
+                return await api_client.get_forecasting("UNKNOWN")
+
+        with pytest.raises(Exception):
+            asyncio.run(fetch())
+
+
+class TestAsyncFetchTask:
+
+    def test_async_fetch_matches_threads(self, local_weather_server, local_cities):
+        fetch_data_service = DataFetchingTask(local_cities)
+        async_result = fetch_data_service.fetch_forecasts_async(concurrency_limit=2)
+        assert async_result == fetch_data_service.fetch_forecasts(), "Результаты загрузки не совпадают"
+
+    def test_async_fetch_skips_failed_city(self, local_weather_server, local_cities):
+        fetch_data_service = DataFetchingTask([*local_cities, "UNKNOWN"])
+        cities_forecasts = fetch_data_service.fetch_forecasts_async()
+        assert [city.city_name for city in cities_forecasts] == local_cities, "Список городов не совпадает"
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from api_client import AsyncYandexWeatherAPI, YandexWeatherAPI
+from cache import ResponseCache
+from resilience import CircuitBreaker
+
+
+@pytest.fixture()
+def response_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    yield cache
+    cache.close()
+
+
+class TestResponseCache:
+
+    def test_fresh_entry_does_not_use_network(self, local_weather_server, response_cache):
+        api_client = YandexWeatherAPI(response_cache)
+        first_response = api_client.get_forecasting("MOSCOW")
+        second_response = api_client.get_forecasting("MOSCOW")
+        assert first_response == second_response, "Ответ из кэша не совпадает"
+        assert local_weather_server.request_count == 1, "Свежая запись кэша запрашивается повторно"
+        assert response_cache.stats()["hits"] == 1, "Попадание в кэш не учтено"
+        assert response_cache.stats()["misses"] == 1, "Промах кэша не учтен"
+
+    def test_cache_persists_between_runs(self, local_weather_server, tmp_path):
+        cache_path = str(tmp_path / "cache.sqlite3")
+        YandexWeatherAPI(ResponseCache(cache_path)).get_forecasting("MOSCOW")
+        YandexWeatherAPI(ResponseCache(cache_path)).get_forecasting("MOSCOW")
+        assert local_weather_server.request_count == 1, "Кэш не сохраняется на диске"
+
+    def test_stale_entry_is_revalidated(self, local_weather_server, response_cache):
+        api_client = YandexWeatherAPI(response_cache)
+        response = api_client.get_forecasting("MOSCOW")
+        response_cache.ttl = 0
+        assert api_client.get_forecasting("MOSCOW") == response, "Ответ после ревалидации не совпадает"
+        assert response_cache.stats()["revalidated"] == 1, "Ревалидация не учтена"
+
+    def test_lru_eviction(self, response_cache):
+        response_cache.max_entries = 2
+        response_cache.set("first", b"1")
+        time.sleep(0.01)
+        response_cache.set("second", b"2")
+        time.sleep(0.01)
+        response_cache.get("first")
+        response_cache.set("third", b"3")
+        assert response_cache.get("second") is None, "Давно не использованная запись не вытеснена"
+        assert response_cache.get("first") is not None, "Вытеснена недавно использованная запись"
+
+    def test_async_client_uses_cache(self, local_weather_server, response_cache, local_cities):
+        async def fetch():
+            async with AsyncYandexWeatherAPI(cache=response_cache) as api_client:
+                for city_name in local_cities:
+                    await api_client.get_forecasting(city_name)
+
+        asyncio.run(fetch())
+        response_cache.ttl = 0
+        asyncio.run(fetch())
+        assert response_cache.stats()["revalidated"] == len(local_cities), "Асинхронный клиент не ревалидирует кэш"
+
+    def test_fresh_entry_is_served_while_circuit_is_open(self, local_weather_server, response_cache):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        api_client = YandexWeatherAPI(response_cache, circuit_breaker=circuit_breaker)
+        response = api_client.get_forecasting("MOSCOW")
+        circuit_breaker.record_failure(urlsplit(local_weather_server.url_for("MOSCOW")).netloc)
+        assert api_client.get_forecasting("MOSCOW") == response, "Свежая запись не отдана при разомкнутой цепи"
+
+        async def fetch():
+            async with AsyncYandexWeatherAPI(cache=response_cache, circuit_breaker=circuit_breaker) as async_client:
+                return await async_client.get_forecasting("MOSCOW")
+
+        assert asyncio.run(fetch()) == response, "Асинхронный клиент не отдает свежую запись при разомкнутой цепи"
+        assert local_weather_server.request_count == 1, "Свежая запись запрошена по сети"
@@ -0,0 +1,88 @@
+import logging
+import pickle
+
+import pytest
+
+import tasks
+from calculation import (
+    CalculationWorkerPool,
+    available_cpu_count,
+    calculate_payload,
+    cgroup_cpu_quota,
+    to_payload,
+    worker_pool,
+)
+from tasks import DataCalculationTask, DataFetchingTask
+
+
+@pytest.fixture()
+def local_cities_forecast(local_weather_server, local_cities):
+    return DataFetchingTask(local_cities).fetch_forecasts()
+
+
+class TestCalculationBackend:
+
+    def test_pool_matches_in_process(self, local_cities_forecast, monkeypatch):
+        in_process_result = DataCalculationTask(local_cities_forecast).get_calculated_data()
+        monkeypatch.setattr(tasks, "CALCULATION_INPROCESS_THRESHOLD", 0)
+        monkeypatch.setattr(tasks, "CALCULATION_CHUNK_SIZE", 2)
+        pool_result = DataCalculationTask(local_cities_forecast).get_calculated_data()
+        assert pool_result == in_process_result, "Результаты просчета в пуле не совпадают"
+
+    def test_pool_is_reused(self, local_cities_forecast, monkeypatch):
+        monkeypatch.setattr(tasks, "CALCULATION_INPROCESS_THRESHOLD", 0)
+        DataCalculationTask(local_cities_forecast).get_calculated_data()
+        executor = worker_pool.executor
+        DataCalculationTask(local_cities_forecast).get_calculated_data()
+        assert worker_pool.executor is executor, "Пул процессов создается заново"
+
+    def test_payload_is_compact(self, local_cities_forecast):
+        city_data = local_cities_forecast[0]
+        payload_size = len(pickle.dumps(to_payload(city_data)))
+        model_size = len(pickle.dumps(city_data.to_model()))
+        assert payload_size * 4 < model_size, "Компактное представление не меньше модели"
+
+
+class TestCalculationLogging:
+
+    def test_day_messages_are_skipped_at_info(self, local_cities_forecast, caplog):
+        caplog.set_level(logging.INFO)
+        DataCalculationTask(local_cities_forecast).get_calculated_data()
+        assert not [message for message in caplog.messages if "Подсчет закончен" in message], (
+            "Сообщения по городам пишутся на уровне INFO"
+        )
+
+    def test_worker_records_reach_parent(self, local_cities_forecast, caplog):
+        caplog.set_level(logging.DEBUG)
+        pool = CalculationWorkerPool(max_workers=1, log_through_queue=True)
+        try:
+            pool.executor.submit(calculate_payload, to_payload(local_cities_forecast[0]), 9, 19).result()
+        finally:
+            pool.shutdown()
+        city_name = local_cities_forecast[0].city_name
+        assert f"Подсчет закончен для г.{city_name}" in caplog.messages, (
+            "Записи воркера не переданы в родительский процесс"
+        )
+
+
+class TestCpuQuota:
+
+    def test_cgroup_v2(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+        assert cgroup_cpu_quota(str(tmp_path)) == 1.5, "Квота cgroup v2 прочитана неверно"
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        assert cgroup_cpu_quota(str(tmp_path)) is None, "Без квоты cgroup v2 должен быть None"
+
+    def test_cgroup_v1(self, tmp_path):
+        assert cgroup_cpu_quota(str(tmp_path)) is None, "Без файлов cgroup должен быть None"
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+        assert cgroup_cpu_quota(str(tmp_path)) is None, "Квота -1 в cgroup v1 означает ее отсутствие"
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+        assert cgroup_cpu_quota(str(tmp_path)) == 2.0, "Квота cgroup v1 прочитана неверно"
+
+    def test_pool_size_follows_quota(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("50000 100000\n")
+        assert available_cpu_count(str(tmp_path)) == 1, "Процессов больше, чем допускает квота"
+        assert available_cpu_count(str(tmp_path / "missing")) >= 1, "Без квоты нет ни одного процесса"
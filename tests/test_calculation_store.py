@@ -0,0 +1,60 @@
+import pytest
+
+from calculation_store import CalculationStore
+from tasks import DataCalculationTask, DataFetchingTask
+from windows import DAYTIME_WINDOWS
+
+
+@pytest.fixture()
+def calculation_store(tmp_path):
+    store = CalculationStore(str(tmp_path / "store.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture()
+def local_cities_forecast(local_weather_server, local_cities):
+    return DataFetchingTask(local_cities).fetch_forecasts()
+
+
+class TestIncrementalCalculation:
+
+    def test_first_run_calculates_everything(self, local_cities_forecast, calculation_store):
+        calc_data_service = DataCalculationTask(local_cities_forecast, calculation_store)
+        result = calc_data_service.get_calculated_data()
+        assert result == DataCalculationTask(local_cities_forecast).get_calculated_data(), "Результаты не совпадают"
+        assert calc_data_service.incremental_stats["cities_recalculated"] == 3, "Пересчитаны не все города"
+        # у городов одинаковые данные по дням, поэтому день считается один раз
+        assert calc_data_service.incremental_stats["days_recalculated"] == 5, "Одинаковые дни пересчитаны повторно"
+
+    def test_unchanged_cities_are_reused(self, local_cities_forecast, calculation_store):
+        first_result = DataCalculationTask(local_cities_forecast, calculation_store).get_calculated_data()
+        calc_data_service = DataCalculationTask(local_cities_forecast, calculation_store)
+        assert calc_data_service.get_calculated_data() == first_result, "Результаты не совпадают"
+        assert calc_data_service.incremental_stats == {
+            "cities_recalculated": 0,
+            "cities_reused": 3,
+            "days_recalculated": 0,
+            "days_reused": 15,
+        }, "Неизменившиеся данные пересчитаны"
+
+    def test_only_changed_days_are_recalculated(self, local_cities_forecast, calculation_store):
+        DataCalculationTask(local_cities_forecast, calculation_store).get_calculated_data()
+        _, _, temps, _ = local_cities_forecast[1].days[2]
+        for index in range(len(temps)):
+            temps[index] += 5
+        calc_data_service = DataCalculationTask(local_cities_forecast, calculation_store)
+        result = calc_data_service.get_calculated_data()
+        assert result == DataCalculationTask(local_cities_forecast).get_calculated_data(), "Результаты не совпадают"
+        assert calc_data_service.incremental_stats["cities_recalculated"] == 1, "Пересчитаны неизменившиеся города"
+        assert calc_data_service.incremental_stats["days_recalculated"] == 1, "Пересчитаны неизменившиеся дни"
+
+    def test_windows_are_part_of_city_fingerprint(self, local_cities_forecast, calculation_store):
+        DataCalculationTask(local_cities_forecast, calculation_store).get_calculated_data()
+        calc_data_service = DataCalculationTask(local_cities_forecast, calculation_store, DAYTIME_WINDOWS)
+        result = calc_data_service.get_calculated_data()
+        assert result == DataCalculationTask(local_cities_forecast, windows=DAYTIME_WINDOWS).get_calculated_data(), (
+            "Результаты не совпадают"
+        )
+        assert calc_data_service.incremental_stats["cities_recalculated"] == 3, "Использованы результаты без окон"
+        assert all(city.aggregates for city in result), "Нет агрегатов окон"
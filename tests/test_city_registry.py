@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import city_registry
+from city_registry import CityRegistry, UnknownCityError
+from tasks import DataFetchingTask
+
+CSV_CONTENT = """name,url,latitude,longitude,aliases
+MOSCOW,http://example.com/moscow.json,55.75,37.62,Москва|Moscow City
+SPETERSBURG,http://example.com/spb.json,59.94,30.31,Санкт-Петербург|St. Petersburg|Питер
+NOWHERE,http://example.com/nowhere.json,,,
+"""
+
+
+@pytest.fixture()
+def registry_file(tmp_path):
+    file_name = tmp_path / "cities.csv"
+    file_name.write_text(CSV_CONTENT, encoding="utf-8")
+    return str(file_name)
+
+
+class TestCityRegistry:
+
+    def test_csv_lookup(self, registry_file):
+        registry = CityRegistry(registry_file)
+        assert registry.names() == ["MOSCOW", "SPETERSBURG", "NOWHERE"], "Города файла не совпадают"
+        assert registry.url_for("  moscow ") == "http://example.com/moscow.json", "Поиск зависит от регистра"
+        assert registry.url_for("ПИТЕР") == "http://example.com/spb.json", "Альтернативное название не найдено"
+        assert registry.url_for("st.  petersburg") == "http://example.com/spb.json", "Пробелы не нормализуются"
+        assert registry.coordinates("Москва") == (55.75, 37.62), "Координаты не совпадают"
+        assert registry.coordinates("NOWHERE") is None, "Координаты не заданы, но возвращены"
+        with pytest.raises(UnknownCityError):
+            registry.url_for("ATLANTIS")
+
+    def test_json_formats(self, tmp_path):
+        entries_file = tmp_path / "cities.json"
+        entries_file.write_text(json.dumps([
+            {"name": "PARIS", "url": "http://example.com/paris.json", "aliases": ["Париж"]},
+        ]), encoding="utf-8")
+        assert CityRegistry(str(entries_file)).url_for("париж") == "http://example.com/paris.json", (
+            "Список городов JSON прочитан неверно"
+        )
+        mapping_file = tmp_path / "urls.json"
+        mapping_file.write_text(json.dumps({"ROMA": "http://example.com/roma.json"}), encoding="utf-8")
+        assert CityRegistry(str(mapping_file)).url_for("Roma") == "http://example.com/roma.json", (
+            "Словарь url в формате utils.CITIES прочитан неверно"
+        )
+
+    def test_file_is_loaded_lazily(self, tmp_path):
+        registry = CityRegistry(str(tmp_path / "missing.csv"))
+        with pytest.raises(OSError):
+            registry.names()
+
+    def test_failed_load_is_repeated(self, tmp_path):
+        file_name = tmp_path / "cities.csv"
+        file_name.write_text(
+            "name,url\nMOSCOW,http://example.com/moscow.json\nPARIS,\n", encoding="utf-8"
+        )
+        registry = CityRegistry(str(file_name))
+        for _ in range(2):
+            with pytest.raises(ValueError, match="without name or url"):
+                registry.names()
+
+    def test_batch_resolution(self, registry_file):
+        urls = {"PARIS": "http://example.com/paris.json"}
+        registry = CityRegistry(registry_file, urls)
+        known, unknown = registry.split_known(["Москва", "paris", "ATLANTIS", "moscow", "EL DORADO"])
+        assert known == {
+            "MOSCOW": "http://example.com/moscow.json",
+            "PARIS": "http://example.com/paris.json",
+        }, "Найденные города не совпадают"
+        assert unknown == ["ATLANTIS", "EL DORADO"], "Неизвестные города не совпадают"
+        with pytest.raises(UnknownCityError) as error:
+            registry.resolve(["MOSCOW", "ATLANTIS", "EL DORADO"])
+        assert error.value.cities == ["ATLANTIS", "EL DORADO"], "Перечислены не все неизвестные города"
+
+        # словарь urls читается при каждом обращении и важнее файла
+        urls["MOSCOW"] = "http://localhost/moscow.json"
+        urls["Berlin"] = "http://example.com/berlin.json"
+        assert registry.url_for("Москва") == "http://localhost/moscow.json", "url из словаря не важнее файла"
+        assert registry.url_for("BERLIN") == "http://example.com/berlin.json", "Новый город словаря не найден"
+
+    def test_unknown_cities_are_rejected_before_fetch(self, local_weather_server, local_cities, monkeypatch):
+        monkeypatch.setattr(city_registry, "_default_registry", None)
+        fetch_data_service = DataFetchingTask(["moscow", "UNKNOWN", *local_cities])
+        cities_forecasts = fetch_data_service.fetch_forecasts()
+        assert [city.city_name for city in cities_forecasts] == local_cities, "Города не приведены к названиям реестра"
+        assert fetch_data_service.failed_cities == {"UNKNOWN": "unknown city"}, "Отчет об ошибках не совпадает"
+        assert local_weather_server.request_count == len(local_cities), "Неизвестный город или повтор запрошен"
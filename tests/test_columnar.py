@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from config import WEATHER_CONDITIONS
+from models import CityWeatherDataModel
+from tasks import DataCalculationTask
+
+np = pytest.importorskip("numpy")
+
+
+def make_city_forecasts(cities_count):
+    conditions = sorted(WEATHER_CONDITIONS)
+    cities_forecasts = []
+    for city_index in range(cities_count):
+        forecasts = []
+        for day_index in range(random.randint(1, 7)):
+            hours_count = random.choice([0, 5, 13, 24])
+            forecasts.append(
+                {
+                    "date": f"2022-05-{day_index + 10}",
+                    "hours": [
+                        {"hour": hour, "temp": random.randint(-30, 40), "condition": random.choice(conditions)}
+                        for hour in range(24 - hours_count, 24)
+                    ],
+                }
+            )
+        cities_forecasts.append(CityWeatherDataModel(city_name=f"CITY_{city_index}", forecasts=forecasts))
+    return cities_forecasts
+
+
+class TestVectorizedCalculation:
+
+    def test_matches_python_calculation(self):
+        random.seed(0)
+        cities_forecasts = make_city_forecasts(200)
+        calc_data_service = DataCalculationTask(cities_forecasts)
+        expected = [calc_data_service._calculate_data(city) for city in cities_forecasts]
+        vectorized = calc_data_service.get_calculated_data_vectorized()
+        assert [city.dict() for city in vectorized] == [
+            {**city, "rating": None} for city in expected
+        ], "Результаты векторизованного просчета не совпадают"
+
+    def test_example_response(self, local_weather_server, local_cities):
+        from tasks import DataFetchingTask
+
+        cities_forecasts = DataFetchingTask(local_cities).fetch_forecasts()
+        calc_data_service = DataCalculationTask(cities_forecasts)
+        assert calc_data_service.get_calculated_data_vectorized() == calc_data_service.get_calculated_data(), (
+            "Результаты векторизованного просчета не совпадают"
+        )
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from api_client import YandexWeatherAPI
+from extraction import build_city_weather_model, extract_forecasts
+from local_server import EXAMPLE_RESPONSE_PATH
+from models import CityWeatherDataModel
+from tasks import DataFetchingTask, create_api_client
+
+
+@pytest.fixture()
+def example_response():
+    return EXAMPLE_RESPONSE_PATH.read_bytes()
+
+
+def full_model(body, city_name="MOSCOW"):
+    return CityWeatherDataModel(**json.loads(body), city_name=city_name)
+
+
+def lean_model(body, city_name="MOSCOW"):
+    return build_city_weather_model({**extract_forecasts(body), "city_name": city_name})
+
+
+class TestLeanExtraction:
+
+    def test_matches_full_validation(self, example_response):
+        assert lean_model(example_response) == full_model(example_response), "Модели не совпадают"
+
+    def test_compact_json(self, example_response):
+        compact_response = json.dumps(json.loads(example_response), separators=(",", ":")).encode()
+        assert lean_model(compact_response) == full_model(example_response), "Модели не совпадают"
+
+    def test_unexpected_hour_format_fallback(self, example_response):
+        document = json.loads(example_response)
+        document["forecasts"][0]["hours"][0]["temp"] = 10.0
+        body = json.dumps(document).encode()
+        assert lean_model(body) == full_model(body), "Модели не совпадают"
+
+    def test_date_after_forecasts_is_ignored(self, example_response):
+        document = json.loads(example_response)
+        document["summary"] = {"date": "2022-05-30", "hours": []}
+        body = json.dumps(document).encode()
+        assert lean_model(body) == full_model(body), "Ключ date после forecasts создал лишний день"
+
+    def test_nested_date_is_ignored(self, example_response):
+        document = json.loads(example_response)
+        document["forecasts"][0]["biomet"]["date"] = "2022-05-30"
+        document["forecasts"][1]["sunset"] = "] } date [ {"
+        body = json.dumps(document).encode()
+        assert lean_model(body) == full_model(body), "Вложенный ключ date создал лишний день"
+
+    def test_unknown_condition(self, example_response):
+        document = json.loads(example_response)
+        document["forecasts"][1]["hours"][3]["condition"] = "sandstorm"
+        with pytest.raises(ValueError):
+            extract_forecasts(json.dumps(document).encode())
+
+    def test_fetch_task_lean_mode(self, local_weather_server, local_cities):
+        lean_result = DataFetchingTask(local_cities, create_api_client(lean_extraction=True)).fetch_forecasts()
+        full_result = DataFetchingTask(local_cities, YandexWeatherAPI()).fetch_forecasts()
+        assert lean_result == full_result, "Результаты загрузки не совпадают"
@@ -0,0 +1,50 @@
+import random
+
+import tasks
+from forecast_file import ForecastFile, ForecastFileWriter
+from records import CityForecastRecord
+from tasks import DataCalculationTask, DataFetchingTask
+from tests.test_columnar import make_city_forecasts
+from windows import DAYTIME_WINDOWS
+
+
+def write_forecast_file(file_name, cities_forecasts):
+    with ForecastFileWriter(file_name) as writer:
+        return ForecastFile(file_name, [writer.append(city) for city in cities_forecasts])
+
+
+class TestForecastFile:
+
+    def setup_method(self):
+        random.seed(2)
+        self.cities_forecasts = [CityForecastRecord.from_model(city) for city in make_city_forecasts(30)]
+
+    def test_round_trip_and_append(self, tmp_path):
+        file_name = str(tmp_path / "forecasts.wfraw")
+        first = write_forecast_file(file_name, self.cities_forecasts[:10])
+        second = write_forecast_file(file_name, self.cities_forecasts[10:])
+        assert second.offsets[0] > first.offsets[-1], "Города не дописаны в конец файла"
+        assert list(first) + list(second) == self.cities_forecasts, "Прочитанные города не совпадают"
+        assert list(ForecastFile(file_name, [])) == [], "Пустой набор городов"
+
+    def test_calculation_matches_records(self, tmp_path, monkeypatch):
+        forecast_file = write_forecast_file(str(tmp_path / "forecasts.wfraw"), self.cities_forecasts)
+        for windows in ((), DAYTIME_WINDOWS):
+            expected = DataCalculationTask(self.cities_forecasts, windows=windows).get_calculated_data()
+            assert DataCalculationTask(forecast_file, windows=windows).get_calculated_data() == expected, (
+                "Просчет из файла в текущем процессе не совпадает"
+            )
+            monkeypatch.setattr(tasks, "CALCULATION_INPROCESS_THRESHOLD", 0)
+            monkeypatch.setattr(tasks, "CALCULATION_CHUNK_SIZE", 4)
+            assert DataCalculationTask(forecast_file, windows=windows).get_calculated_data() == expected, (
+                "Просчет из файла в пуле процессов не совпадает"
+            )
+            monkeypatch.undo()
+
+    def test_fetch_to_file(self, local_weather_server, local_cities, tmp_path):
+        fetch_data_service = DataFetchingTask(["UNKNOWN", *local_cities])
+        forecast_file = fetch_data_service.fetch_forecasts_to_file(str(tmp_path / "forecasts.wfraw"))
+        assert list(forecast_file) == DataFetchingTask(local_cities).fetch_forecasts(), (
+            "Города файла не совпадают с загрузкой в память"
+        )
+        assert list(fetch_data_service.failed_cities) == ["UNKNOWN"], "Отчет об ошибках не совпадает"
@@ -21,8 +21,8 @@ class BaseTearDown:
 
 class TestFetchTask(BaseTearDown):
 
-    def test_forecast_fetching_amount(self, cities):
-        fetch_data_service = DataFetchingTask(cities)
+    def test_forecast_fetching_amount(self, cities, replay_api_client):
+        fetch_data_service = DataFetchingTask(cities, replay_api_client)
         cities_forecasts = fetch_data_service.fetch_forecasts()
         assert len(cities_forecasts) == len(cities), "Ответ содержит неверное количество элементов"
 
@@ -43,11 +43,11 @@ class TestCalculationTask(BaseTearDown):
         assert calculated_data, "Нет просчитанных данных"
         assert len(calculated_data) == 3, "Количество просчитанных городов не совпадает"
 
-    @pytest.mark.parametrize("city_avg_temp", [9.7, 11.4, 25.0])
+    @pytest.mark.parametrize("city_avg_temp", [13.2, 11.8, 13.1])
     def test_avg_temp(self, city_avg_temp, calculated_avg_temp):
         assert city_avg_temp in calculated_avg_temp, "Средняя температура не совпадает"
 
-    @pytest.mark.parametrize("city_good_weather_hours", [1.6, 6.2, 7.8])
+    @pytest.mark.parametrize("city_good_weather_hours", [1.8, 1.6, 2.8])
     def test_cities_good_weather_hours(self, city_good_weather_hours, calculated_good_weather_hours_temp):
         a=calculated_good_weather_hours_temp
         assert city_good_weather_hours in calculated_good_weather_hours_temp, "Количество ясных часов не совпадает"
@@ -60,7 +60,7 @@ class TestAnalyzingTask(BaseTearDown):
         analyzed_data = analyzer_data_service.analyze_data()
         assert analyzed_data, "Нет проанализированных данных"
         assert len(analyzed_data) == 3, "Количество проанализированных городов не совпадает"
-        assert analyzer_data_service.main_town == "BEIJING", "Наилучший город не совпадает"
+        assert analyzer_data_service.main_town == "MOSCOW", "Наилучший город не совпадает"
 
     @pytest.mark.parametrize("city_rating", [1, 2, 3])
     def test_city_ratings(self, city_rating, city_ratings):
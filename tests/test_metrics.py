@@ -0,0 +1,86 @@
+import json
+import pstats
+
+import pytest
+
+from metrics import RunMetrics, run_metrics
+from tasks import DataAnalyzingTask, DataCalculationTask, DataFetchingTask
+
+
+@pytest.fixture()
+def enabled_run_metrics():
+    run_metrics.enable()
+    yield run_metrics
+    run_metrics.disable()
+    run_metrics.reset()
+
+
+class TestRunMetrics:
+
+    def test_disabled_metrics_are_not_collected(self):
+        metrics = RunMetrics()
+        with metrics.stage("fetch"):
+            metrics.increment("downloaded_bytes", 10)
+            metrics.observe("fetch_latency_seconds", 0.1)
+        assert metrics.report() == {"stages": {}, "counters": {}, "gauges": {}, "histograms": {}}, (
+            "Выключенные метрики собираются"
+        )
+
+    def test_report_and_prometheus(self):
+        metrics = RunMetrics()
+        metrics.enable()
+        with metrics.stage("fetch"):
+            metrics.increment("downloaded_bytes", 10)
+            metrics.increment("downloaded_bytes", 5)
+        for value in (0.001, 0.2, 20):
+            metrics.observe("fetch_latency_seconds", value, buckets=(0.01, 1))
+        metrics.set_max("queue_depth", 3)
+        metrics.set_max("queue_depth", 1)
+
+        report = json.loads(json.dumps(metrics.report()))
+        assert report["stages"]["fetch"]["calls"] == 1, "Этап не учтен"
+        assert report["counters"] == {"downloaded_bytes": 15}, "Счетчик не совпадает"
+        assert report["gauges"] == {"queue_depth": 3}, "Максимум не совпадает"
+        assert report["histograms"]["fetch_latency_seconds"]["buckets"] == {"0.01": 1, "1": 2, "+Inf": 3}, (
+            "Корзины гистограммы не совпадают"
+        )
+        lines = metrics.prometheus_lines()
+        assert "forecast_downloaded_bytes_total 15" in lines, "Счетчик Prometheus не совпадает"
+        assert 'forecast_fetch_latency_seconds_bucket{le="+Inf"} 3' in lines, "Гистограмма Prometheus не совпадает"
+        assert any(line.startswith('forecast_stage_wall_seconds{stage="fetch"}') for line in lines), (
+            "Время этапа Prometheus не записано"
+        )
+
+    @pytest.mark.parametrize("profile_mode", ["cprofile", "tracemalloc"])
+    def test_profile_stage(self, tmp_path, profile_mode):
+        metrics = RunMetrics()
+        profile_file = str(tmp_path / "stage.profile")
+        metrics.enable("calculation", profile_mode, profile_file)
+        with metrics.stage("fetch"):
+            pass
+        with metrics.stage("calculation"):
+            sorted(str(number) for number in range(1000))
+        if profile_mode == "cprofile":
+            assert pstats.Stats(profile_file).total_calls > 0, "Профиль этапа пуст"
+        else:
+            assert "calculation_traced_peak_bytes" in metrics.gauges, "Пик памяти этапа не записан"
+            with open(profile_file) as file:
+                assert file.read(), "Отчет tracemalloc пуст"
+
+
+class TestTasksMetrics:
+
+    def test_stages_are_measured(self, local_weather_server, local_cities, enabled_run_metrics):
+        fetch_data_service = DataFetchingTask([*local_cities, "UNKNOWN"])
+        calculated_data = DataCalculationTask(fetch_data_service.fetch_forecasts()).get_calculated_data()
+        DataAnalyzingTask(calculated_data).analyze_data()
+
+        report = enabled_run_metrics.report()
+        assert set(report["stages"]) == {"fetch", "validation", "calculation", "analysis"}, (
+            "Набор этапов не совпадает"
+        )
+        # неизвестный реестру город отклоняется до загрузки и не запрашивается
+        assert report["histograms"]["fetch_latency_seconds"]["count"] == 3, "Задержки загрузки не учтены"
+        assert report["histograms"]["parse_seconds"]["count"] == 3, "Время разбора ответов не учтено"
+        assert report["counters"]["downloaded_bytes"] > 0, "Объем загрузки не учтен"
+        assert report["counters"]["failed_cities"] == 1, "Ошибки загрузки не учтены"
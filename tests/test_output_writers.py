@@ -0,0 +1,83 @@
+import json
+import math
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from models import CalculatedCityWeatherDataModel
+from output_writers import COLUMNAR_MISSING_INT, read_columnar
+from tasks import DataAggregationTask
+
+SHEET_NAMESPACE = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture
+def calculated_cities():
+    return [
+        CalculatedCityWeatherDataModel(
+            city_name="MOSCOW",
+            days=[
+                {"date": "2022-05-18", "average_temp": 12.5, "good_weather_hours": 11},
+                {"date": "2022-05-19", "average_temp": 10.0, "good_weather_hours": 4},
+            ],
+            total_average_temp=11.2,
+            total_average_good_weather_hours=7.5,
+            rating=1,
+        ),
+        CalculatedCityWeatherDataModel(
+            city_name="САНКТ-ПЕТЕРБУРГ <&>",
+            days=[{"date": "2022-05-19", "average_temp": -1.5, "good_weather_hours": 0}],
+            total_average_temp=-0.8,
+            total_average_good_weather_hours=0.0,
+            rating=None,
+        ),
+    ]
+
+
+class TestOutputWriters:
+
+    def test_json_lines(self, tmp_path, calculated_cities):
+        file_name = DataAggregationTask(calculated_cities).save_data("jsonl", str(tmp_path / "table.jsonl"))
+        with open(file_name, encoding="utf-8") as file:
+            records = [json.loads(line) for line in file]
+        assert records == [city.dict() for city in calculated_cities], "Записи JSON Lines не совпадают"
+
+    def test_columnar(self, tmp_path, calculated_cities):
+        file_name = DataAggregationTask(calculated_cities).save_data("wfcol", str(tmp_path / "table.wfcol"))
+        header, columns = read_columnar(file_name)
+        assert header["cities"] == 2 and header["dates"] == ["2022-05-18", "2022-05-19"], "Заголовок не совпадает"
+
+        names_data = columns["city_name_data"].tobytes()
+        offsets = columns["city_name_offsets"].tolist()
+        names = [names_data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+        assert names == ["MOSCOW", "САНКТ-ПЕТЕРБУРГ <&>"], "Названия городов не совпадают"
+        assert columns["rating"].tolist() == [1, COLUMNAR_MISSING_INT], "Рейтинги не совпадают"
+        assert columns["total_average_temp"].tolist() == [11.2, -0.8], "Средние температуры не совпадают"
+
+        average_temp = columns["average_temp"].tolist()
+        assert average_temp[0] == [12.5, 10.0], "Температуры по дням не совпадают"
+        assert math.isnan(average_temp[1][0]) and average_temp[1][1] == -1.5, "Пропущенный день не отмечен"
+        assert columns["good_weather_hours"].tolist() == [[11, 4], [COLUMNAR_MISSING_INT, 0]], (
+            "Часы без осадков не совпадают"
+        )
+
+    def test_xlsx(self, tmp_path, calculated_cities):
+        file_name = DataAggregationTask(calculated_cities).save_data("xlsx", str(tmp_path / "table.xlsx"))
+        with zipfile.ZipFile(file_name) as archive:
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        rows = [
+            ["".join(cell.itertext()) for cell in row.findall("main:c", SHEET_NAMESPACE)]
+            for row in sheet.iterfind("main:sheetData/main:row", SHEET_NAMESPACE)
+        ]
+        assert len(rows) == 5, "Количество строк не совпадает"
+        assert rows[0] == ["Город/день", "", "2022-05-18", "2022-05-19", "Среднее", "Рейтинг"], (
+            "Заголовки не совпадают"
+        )
+        assert rows[1] == ["MOSCOW", "Температура, среднее", "12.5", "10.0", "11.2", "1"], "Строка города не совпадает"
+        assert rows[3][0] == "САНКТ-ПЕТЕРБУРГ <&>", "Название города не экранировано"
+
+    def test_unknown_format(self, tmp_path, calculated_cities):
+        with pytest.raises(ValueError):
+            DataAggregationTask(calculated_cities).save_data("xls", str(tmp_path / "table.xls"))
+        assert list(tmp_path.iterdir()) == [], "Создан файл неизвестного формата"
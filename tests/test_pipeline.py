@@ -0,0 +1,36 @@
+from queue import Queue
+
+import pytest
+
+from pipeline import StreamingForecastPipeline
+from tasks import DataFetchingTask, DataCalculationTask, DataAnalyzingTask
+
+
+class TestStreamingPipeline:
+
+    def test_matches_staged_run(self, local_weather_server, local_cities):
+        staged_forecasts = DataFetchingTask(local_cities).fetch_forecasts()
+        staged_result = DataCalculationTask(staged_forecasts).get_calculated_data()
+
+        pipelined_result = StreamingForecastPipeline(DataFetchingTask(local_cities), queue_size=1).run()
+        assert pipelined_result == staged_result, "Результаты потокового режима не совпадают"
+
+        staged_analyzed = DataAnalyzingTask(staged_result).analyze_data()
+        pipelined_analyzed = DataAnalyzingTask(pipelined_result).analyze_data()
+        assert pipelined_analyzed == staged_analyzed, "Рейтинги потокового режима не совпадают"
+
+    def test_failed_cities_are_skipped(self, local_weather_server, local_cities):
+        fetch_data_service = DataFetchingTask([*local_cities, "UNKNOWN"])
+        pipelined_result = StreamingForecastPipeline(fetch_data_service).run()
+        assert [city.city_name for city in pipelined_result] == local_cities, "Список городов не совпадает"
+        assert list(fetch_data_service.failed_cities) == ["UNKNOWN"], "Отчет об ошибках не совпадает"
+
+    def test_calculation_error_does_not_block_fetching(self):
+        forecasts_queue = Queue()
+        calculated_queue = Queue()
+        for item in [(0, None), (1, None), None]:
+            forecasts_queue.put(item)
+        with pytest.raises(Exception):
+            DataCalculationTask([]).calculate_from_queue(forecasts_queue, calculated_queue, max_in_flight=1)
+        assert forecasts_queue.empty(), "Входная очередь не разобрана после ошибки"
+        assert calculated_queue.get() is None, "Признак конца потока не передан"
@@ -0,0 +1,88 @@
+import json
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from read_api import ForecastIndex, ForecastReadServer
+from records import CalculatedCityRecord, CityDayRecord
+from tasks import DataAggregationTask, DataAnalyzingTask
+
+
+def make_cities(temps):
+    cities = [
+        CalculatedCityRecord(
+            f"CITY_{index}",
+            [CityDayRecord("2022-05-18", temp, index), CityDayRecord("2022-05-19", temp + 1, index)],
+            temp,
+            index,
+        )
+        for index, temp in enumerate(temps)
+    ]
+    return DataAnalyzingTask(cities).analyze_data()
+
+
+def get(url, etag=None):
+    request = Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urlopen(request) as response:
+            return response.status, response.headers.get("ETag"), json.loads(response.read() or "null")
+    except HTTPError as error:
+        return error.code, error.headers.get("ETag"), None
+
+
+@pytest.fixture()
+def read_server():
+    with ForecastReadServer(port=0) as server:
+        yield server
+
+
+class TestReadApi:
+
+    def test_queries(self, read_server):
+        read_server.publish(make_cities([10.0, 25.5, 18.0, 30.0]))
+        status, _, top = get(f"{read_server.url}/top?n=2")
+        assert status == 200, "Запрос не выполнен"
+        assert [(city["city_name"], city["rating"]) for city in top] == [("CITY_3", 1), ("CITY_1", 2)], (
+            "Лучшие города не совпадают"
+        )
+        _, _, city = get(f"{read_server.url}/cities/CITY_2")
+        assert [day["average_temp"] for day in city["days"]] == [18.0, 19.0], "Ряд по дням не совпадает"
+        _, _, warm = get(f"{read_server.url}/cities?min_temp=18")
+        assert [city["city_name"] for city in warm] == ["CITY_3", "CITY_1", "CITY_2"], "Фильтр по температуре"
+        _, _, day = get(f"{read_server.url}/dates/2022-05-19")
+        assert [row["average_temp"] for row in day] == [31.0, 26.5, 19.0, 11.0], "Значения за дату не совпадают"
+
+    def test_errors(self, read_server):
+        read_server.publish(make_cities([10.0]))
+        assert get(f"{read_server.url}/cities/UNKNOWN")[0] == 404, "Неизвестный город"
+        assert get(f"{read_server.url}/dates/2000-01-01")[0] == 404, "Неизвестная дата"
+        assert get(f"{read_server.url}/cities?min_temp=warm")[0] == 400, "Некорректный порог"
+        assert get(f"{read_server.url}/top?n=x")[0] == 400, "Некорректное n"
+
+    def test_etag_and_atomic_swap(self, read_server):
+        read_server.publish(make_cities([10.0, 20.0]))
+        _, etag, _ = get(f"{read_server.url}/top")
+        assert get(f"{read_server.url}/top", etag)[0] == 304, "Не отдан 304 для неизменившихся данных"
+        assert get(f"{read_server.url}/cities/CITY_0", etag)[0] == 304, "ETag снимка общий для всех ответов"
+
+        read_server.publish(make_cities([10.0, 20.0, 40.0]))
+        status, new_etag, top = get(f"{read_server.url}/top", etag)
+        assert status == 200 and new_etag != etag, "Новый снимок отдан с прежним ETag"
+        assert top[0]["city_name"] == "CITY_2", "Новый снимок не опубликован"
+
+    def test_watches_json_lines_file(self, read_server, tmp_path):
+        file_name = str(tmp_path / "table.jsonl")
+        DataAggregationTask(make_cities([10.0, 20.0])).save_data("jsonl", file_name)
+        read_server.watch_file(file_name, interval=0.01)
+        deadline = time.monotonic() + 5
+        while read_server.index.cities_count != 2:
+            assert time.monotonic() < deadline, "Файл не загружен"
+            time.sleep(0.01)
+
+        expected = ForecastIndex(make_cities([10.0, 20.0, 30.0]))
+        DataAggregationTask(make_cities([10.0, 20.0, 30.0])).save_data("jsonl", file_name)
+        while read_server.index.version != expected.version:
+            assert time.monotonic() < deadline, "Перезаписанный файл не перечитан"
+            time.sleep(0.01)
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from local_server import EXAMPLE_RESPONSE_PATH
+from models import CalculatedCityWeatherDataModel, CityWeatherDataModel
+from records import CalculatedCityRecord, CityForecastRecord
+
+
+@pytest.fixture()
+def raw_city_data():
+    return {**json.loads(EXAMPLE_RESPONSE_PATH.read_bytes()), "city_name": "MOSCOW"}
+
+
+class TestCityForecastRecord:
+
+    def test_matches_model(self, raw_city_data):
+        model = CityWeatherDataModel(**raw_city_data)
+        record = CityForecastRecord.from_raw(raw_city_data)
+        assert record == CityForecastRecord.from_model(model), "Запись не совпадает с моделью"
+        assert record.to_model() == model, "Модель из записи не совпадает"
+        assert not hasattr(record, "__dict__"), "Запись хранит атрибуты в __dict__"
+
+    @pytest.mark.parametrize(
+        "broken_hour",
+        [{"condition": "sunny"}, {"temp": "warm"}, {"temp": None}, {"temp": 100_000}],
+    )
+    def test_invalid_data(self, raw_city_data, broken_hour):
+        raw_city_data["forecasts"][0]["hours"][0].update(broken_hour)
+        with pytest.raises(ValueError):
+            CityForecastRecord.from_raw(raw_city_data)
+
+    def test_invalid_date(self, raw_city_data):
+        raw_city_data["forecasts"][0]["date"] = "18.05.2022"
+        with pytest.raises(ValueError):
+            CityForecastRecord.from_raw(raw_city_data)
+        with pytest.raises(ValueError):
+            CityWeatherDataModel(**raw_city_data)
+
+    def test_missing_field(self, raw_city_data):
+        del raw_city_data["forecasts"][1]["hours"]
+        with pytest.raises(ValueError):
+            CityForecastRecord.from_raw(raw_city_data)
+
+
+class TestCalculatedCityRecord:
+
+    def test_matches_model(self):
+        city_data = {
+            "city_name": "MOSCOW",
+            "days": [{"date": "2022-05-18", "average_temp": 12.5, "good_weather_hours": 11}],
+            "total_average_temp": 12.5,
+            "total_average_good_weather_hours": 11.0,
+            "rating": None,
+        }
+        record = CalculatedCityRecord.from_dict(city_data)
+        model = CalculatedCityWeatherDataModel(**city_data)
+        assert record == model and model == record, "Запись не совпадает с моделью"
+        assert record.to_model() == model, "Модель из записи не совпадает"
+        assert record.get_avg_temp_data() == model.get_avg_temp_data(), "Температуры по дням не совпадают"
+        record.rating = 1
+        assert record != model, "Рейтинг не учитывается при сравнении"
@@ -0,0 +1,34 @@
+import json
+
+from records import CityForecastRecord
+from replay import ReplayYandexWeatherAPI, generate_responses, load_responses, record_responses
+from tasks import DataFetchingTask
+
+
+class TestReplay:
+
+    def test_generated_responses(self):
+        responses = generate_responses(["A", "B"], days_count=7, seed=3)
+        assert responses == generate_responses(["B", "A"], days_count=7, seed=3), "Ответы зависят от порядка городов"
+        assert responses["A"] != generate_responses(["A"], days_count=7, seed=4)["A"], "Ответ не зависит от seed"
+        response = json.loads(responses["A"])
+        dates = [forecast["date"] for forecast in response["forecasts"]]
+        assert dates == [f"2022-05-{day}" for day in range(18, 25)], "Даты дней не совпадают"
+        assert all(len(forecast["hours"]) == 24 for forecast in response["forecasts"]), "В дне не 24 часа"
+        assert "fact" in response, "Поля исходного ответа не сохранены"
+        city = CityForecastRecord.from_raw({**response, "city_name": "A"})
+        assert len(city.days) == 7, "Ответ не проходит проверку"
+
+    def test_replay_matches_local_server(self, local_weather_server, local_cities, tmp_path):
+        record_responses(local_cities, str(tmp_path))
+        assert load_responses(str(tmp_path)) == local_weather_server.responses, "Записанные ответы не совпадают"
+
+        api_client = ReplayYandexWeatherAPI.from_directory(str(tmp_path))
+        replayed = DataFetchingTask([*local_cities, "UNKNOWN"], api_client).fetch_forecasts()
+        assert replayed == DataFetchingTask(local_cities).fetch_forecasts(), "Воспроизведение не совпадает с сервером"
+        assert local_weather_server.request_count == len(local_cities) * 2, "Воспроизведение обращалось к серверу"
+
+    def test_unknown_city_is_failed(self):
+        fetch_data_service = DataFetchingTask(["UNKNOWN"], ReplayYandexWeatherAPI({}))
+        assert fetch_data_service.fetch_forecasts() == [], "Нет ответа, но город загружен"
+        assert "404" in fetch_data_service.failed_cities["UNKNOWN"], "Причина ошибки не совпадает"
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+import utils
+from api_client import ApiRequestError, AsyncYandexWeatherAPI, YandexWeatherAPI
+from local_server import LocalWeatherServer
+from resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    RequestSlotTimeoutError,
+    RetryPolicy,
+)
+from tasks import DataFetchingTask
+
+
+@pytest.fixture()
+def flaky_weather_server(local_cities, monkeypatch):
+    """Локальный сервер, отвечающий 503 на первые два запроса по каждому городу."""
+    with LocalWeatherServer.from_example(local_cities, failures=2) as server:
+        for city_name, url in server.urls().items():
+            monkeypatch.setitem(utils.CITIES, city_name, url)
+        yield server
+
+
+def fast_retries(attempts=3):
+    return RetryPolicy(attempts, base_delay=0.01, max_delay=0.02)
+
+
+class TestRetries:
+
+    def test_retries_recover_from_flaky_upstream(self, flaky_weather_server):
+        api_client = YandexWeatherAPI(retry_policy=fast_retries())
+        assert api_client.get_forecasting("MOSCOW"), "Нет данных после повторных запросов"
+        assert flaky_weather_server.request_count == 3, "Количество попыток не совпадает"
+
+    def test_retries_exhausted(self, flaky_weather_server):
+        api_client = YandexWeatherAPI(retry_policy=fast_retries(attempts=2))
+        with pytest.raises(ApiRequestError) as error:
+            api_client.get_forecasting("MOSCOW")
+        assert "503" in error.value.reason, "Причина ошибки не сохранена"
+
+    def test_not_found_is_not_retried(self, local_weather_server, monkeypatch):
+        monkeypatch.setitem(utils.CITIES, "UNKNOWN", local_weather_server.url_for("UNKNOWN"))
+        api_client = YandexWeatherAPI(retry_policy=fast_retries())
+        with pytest.raises(ApiRequestError):
+            api_client.get_forecasting("UNKNOWN")
+        assert local_weather_server.request_count == 1, "Ошибка 404 не должна повторяться"
+
+    def test_async_retries_recover_from_flaky_upstream(self, flaky_weather_server):
+        async def fetch():
+            async with AsyncYandexWeatherAPI(retry_policy=fast_retries()) as api_client:
+                return await api_client.get_forecasting("MOSCOW")
+
+        assert asyncio.run(fetch()), "Нет данных после повторных запросов"
+
+    def test_request_timeout(self, local_cities, monkeypatch):
+        with LocalWeatherServer.from_example(local_cities, latency=0.5) as server:
+            monkeypatch.setitem(utils.CITIES, "MOSCOW", server.url_for("MOSCOW"))
+            api_client = YandexWeatherAPI(timeout=0.05)
+            with pytest.raises(ApiRequestError) as error:
+                api_client.get_forecasting("MOSCOW")
+        assert error.value.retryable, "Таймаут должен считаться повторяемой ошибкой"
+
+
+class TestCircuitBreaker:
+
+    def test_open_after_threshold(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        circuit_breaker.record_failure("host")
+        circuit_breaker.check("host")
+        circuit_breaker.record_failure("host")
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.check("host")
+
+    def test_half_open_trial(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        circuit_breaker.record_failure("host")
+        time.sleep(0.02)
+        circuit_breaker.check("host")
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.check("host")
+        circuit_breaker.record_success("host")
+        assert not circuit_breaker.is_open("host"), "Цепь не замкнулась после успешной попытки"
+
+    def test_cancelled_async_trial_is_returned(self, local_cities, monkeypatch):
+        with LocalWeatherServer.from_example(local_cities, latency=1) as server:
+            monkeypatch.setitem(utils.CITIES, "MOSCOW", server.url_for("MOSCOW"))
+            host = urlsplit(server.url_for("MOSCOW")).netloc
+            circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+            circuit_breaker.record_failure(host)
+            time.sleep(0.02)
+
+            async def fetch():
+                async with AsyncYandexWeatherAPI(circuit_breaker=circuit_breaker) as api_client:
+                    with pytest.raises(asyncio.TimeoutError):
+                        await asyncio.wait_for(api_client.get_forecasting("MOSCOW"), 0.05)
+
+            asyncio.run(fetch())
+        time.sleep(0.02)
+        assert circuit_breaker.check(host), "Отмененная пробная попытка не возвращена"
+        circuit_breaker.record_success(host)
+        assert not circuit_breaker.is_open(host), "Цепь не замкнулась после пробной попытки"
+
+    def test_fail_fast_when_upstream_is_down(self, flaky_weather_server):
+        api_client = YandexWeatherAPI(
+            retry_policy=fast_retries(attempts=1),
+            circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        for city_name in ["MOSCOW", "PARIS", "BEIJING"]:
+            with pytest.raises(Exception):
+                api_client.get_forecasting(city_name)
+        assert flaky_weather_server.request_count == 2, "Запросы не отклоняются при разомкнутой цепи"
+
+
+class TestAdaptiveConcurrencyLimiter:
+
+    def test_overload_halves_limit_once(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=16, initial_limit=16)
+        for _ in range(16):
+            assert limiter.acquire(timeout=0), "Место в пределах лимита не выдано"
+        limiter.release(0.0, overloaded=True)
+        # ответ на запрос, начатый до уменьшения, лимит повторно не уменьшает
+        limiter.release(10.0, overloaded=True)
+        assert limiter.limit == 8 and limiter.decreases == 1, "Лимит не уменьшен вдвое один раз"
+        assert not limiter.acquire(timeout=0), "Место выдано сверх уменьшенного лимита"
+
+    def test_ramp_up_while_throughput_improves(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=1)
+        for window_size, pause in [(1, 0.1), (2, 0.0), (3, 0.2)]:
+            time.sleep(pause)
+            for _ in range(window_size):
+                limiter.acquire()
+                limiter.release(0.01)
+        assert limiter.limit == 3, "Лимит растет без роста пропускной способности"
+        assert limiter.increases == 2, "Количество увеличений лимита не совпадает"
+
+    def test_latency_growth_decreases_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=1)
+        limiter.acquire()
+        limiter.release(0.01)
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(0.1)
+        assert limiter.limit == 1, "Лимит не уменьшен при росте времени ответа"
+
+    def test_fixed_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=4, max_limit=4)
+        limiter.acquire()
+        limiter.release(0.0, overloaded=True)
+        assert limiter.limit == 4 and not limiter.is_adaptive, "Фиксированный лимит изменился"
+
+    def test_slot_timeout_is_not_recorded_by_breaker(self, local_weather_server):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1)
+        limiter.acquire()
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        host = urlsplit(utils.CITIES["MOSCOW"]).netloc
+        circuit_breaker.record_failure(host)
+        api_client = YandexWeatherAPI(circuit_breaker=circuit_breaker, concurrency_limiter=limiter)
+        with pytest.raises(RequestSlotTimeoutError):
+            api_client.get_forecasting("MOSCOW", deadline=time.monotonic() + 0.05)
+        assert local_weather_server.request_count == 0, "Запрос ушел без места в ограничении"
+        circuit_breaker.record_failure(host)
+        assert circuit_breaker.is_open(host), "Ожидание места сбросило счетчик ошибок хоста"
+
+    def test_slot_timeout_returns_half_open_trial(self, local_weather_server):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1)
+        limiter.acquire()
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        host = urlsplit(utils.CITIES["MOSCOW"]).netloc
+        circuit_breaker.record_failure(host)
+        time.sleep(0.02)
+        api_client = YandexWeatherAPI(circuit_breaker=circuit_breaker, concurrency_limiter=limiter)
+        with pytest.raises(RequestSlotTimeoutError):
+            api_client.get_forecasting("MOSCOW", deadline=time.monotonic() + 0.05)
+        limiter.release(0.0)
+        assert api_client.get_forecasting("MOSCOW"), "Пробная попытка не возвращена после ожидания места"
+        assert not circuit_breaker.is_open(host), "Цепь не замкнулась после пробной попытки"
+
+    def test_fetch_backs_off_on_rate_limit(self, local_cities, monkeypatch):
+        with LocalWeatherServer.from_example(local_cities, failures=1, failure_status=429) as server:
+            for city_name, url in server.urls().items():
+                monkeypatch.setitem(utils.CITIES, city_name, url)
+            limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=8)
+            api_client = YandexWeatherAPI(retry_policy=fast_retries(), concurrency_limiter=limiter)
+            fetch_data_service = DataFetchingTask(local_cities, api_client)
+            assert len(fetch_data_service.fetch_forecasts()) == len(local_cities), "Загружены не все города"
+        assert limiter.decreases >= 1, "Лимит не уменьшен после ответа 429"
+        assert limiter.limit < 8, "Лимит не уменьшен после ответа 429"
+
+    def test_async_fetch_backs_off_on_rate_limit(self, local_cities, monkeypatch):
+        with LocalWeatherServer.from_example(local_cities, failures=1, failure_status=429) as server:
+            for city_name, url in server.urls().items():
+                monkeypatch.setitem(utils.CITIES, city_name, url)
+            limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=8)
+            api_client = YandexWeatherAPI(retry_policy=fast_retries(), concurrency_limiter=limiter)
+            fetch_data_service = DataFetchingTask(local_cities, api_client)
+            assert len(fetch_data_service.fetch_forecasts_async()) == len(local_cities), "Загружены не все города"
+        assert limiter.decreases >= 1, "Асинхронная загрузка не уменьшила лимит после ответа 429"
+        assert limiter.available == limiter.limit, "Места ограничения не освобождены"
+
+    def test_async_slot_waits_for_release(self, local_weather_server):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1)
+
+        async def fetch():
+            async with AsyncYandexWeatherAPI(concurrency_limiter=limiter) as api_client:
+                async with api_client._limited_request(None):
+                    with pytest.raises(RequestSlotTimeoutError):
+                        await api_client.get_forecasting("MOSCOW", deadline=time.monotonic() + 0.05)
+                    waiting = asyncio.ensure_future(api_client.get_forecasting("MOSCOW"))
+                    await asyncio.sleep(0.05)
+                    assert not waiting.done(), "Запрос выполнен без места в ограничении"
+                return await asyncio.wait_for(waiting, 5)
+
+        assert asyncio.run(fetch()), "Ждущий запрос не выполнен после освобождения места"
+        assert local_weather_server.request_count == 1, "Запрос без места ушел к серверу"
+
+
+class TestFetchTaskFailures:
+
+    def test_failed_cities_report(self, local_weather_server, local_cities):
+        fetch_data_service = DataFetchingTask([*local_cities, "UNKNOWN"], YandexWeatherAPI())
+        cities_forecasts = fetch_data_service.fetch_forecasts()
+        assert len(cities_forecasts) == len(local_cities), "Количество загруженных городов не совпадает"
+        assert list(fetch_data_service.failed_cities) == ["UNKNOWN"], "Отчет об ошибках не совпадает"
+
+    @pytest.mark.parametrize("use_async_fetch", [False, True])
+    def test_fetch_deadline(self, local_cities, monkeypatch, use_async_fetch):
+        with LocalWeatherServer.from_example(local_cities, latency=1) as server:
+            for city_name, url in server.urls().items():
+                monkeypatch.setitem(utils.CITIES, city_name, url)
+            fetch_data_service = DataFetchingTask(local_cities, YandexWeatherAPI(), deadline=0.2)
+            started = time.monotonic()
+            if use_async_fetch:
+                cities_forecasts = fetch_data_service.fetch_forecasts_async()
+            else:
+                cities_forecasts = fetch_data_service.fetch_forecasts()
+            elapsed = time.monotonic() - started
+        assert cities_forecasts == [], "Данные получены после дедлайна"
+        assert elapsed < 0.9, "Дедлайн этапа загрузки не соблюдается"
+        assert set(fetch_data_service.failed_cities) == set(local_cities), "Отчет об ошибках не совпадает"
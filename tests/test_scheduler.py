@@ -0,0 +1,103 @@
+import csv
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from scheduler import ForecastScheduler
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEDULER_SCRIPT = """
+import sys
+import utils
+from local_server import LocalWeatherServer
+from scheduler import ForecastScheduler
+
+with LocalWeatherServer.from_example(["MOSCOW", "PARIS", "BEIJING"]) as server:
+    utils.CITIES.update(server.urls())
+    ForecastScheduler(["MOSCOW", "PARIS", "BEIJING"], interval=0.2, file_name=sys.argv[1]).run()
+"""
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Условие не выполнено за отведенное время"
+        time.sleep(0.01)
+
+
+class TestForecastScheduler:
+
+    def test_refreshes_and_republishes(self, local_weather_server, local_cities, tmp_path):
+        file_name = str(tmp_path / "table.csv")
+        scheduler = ForecastScheduler(local_cities, interval=0.3, file_name=file_name, batch_window=0.01)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        try:
+            wait_for(lambda: scheduler.cycles >= 4)
+        finally:
+            scheduler.stop()
+            thread.join(timeout=10)
+        assert not thread.is_alive(), "Планировщик не остановлен"
+        with open(file_name) as file:
+            rows = list(csv.reader(file))
+        assert sorted(row[0] for row in rows[1::2]) == sorted(local_cities), "Опубликованы не все города"
+        assert scheduler.last_cycle["cities"] < len(local_cities), "Города обновляются одновременно"
+        assert set(scheduler.last_cycle) >= {"cities", "fetch_seconds", "total_seconds"}, "Нет задержек цикла"
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")], "Остались временные файлы"
+
+    def test_failed_cycle_does_not_stop_service(self, local_weather_server, local_cities, tmp_path, monkeypatch):
+        import scheduler as scheduler_module
+
+        save_data = scheduler_module.DataAggregationTask.save_data
+        calls = []
+
+        def failing_first_save(aggregation_service, *args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError("disk is full")
+            return save_data(aggregation_service, *args, **kwargs)
+
+        monkeypatch.setattr(scheduler_module.DataAggregationTask, "save_data", failing_first_save)
+        file_name = str(tmp_path / "table.csv")
+        scheduler = ForecastScheduler(local_cities, interval=0.3, file_name=file_name, batch_window=0.01)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        try:
+            wait_for(lambda: scheduler.cycles >= 1)
+        finally:
+            scheduler.stop()
+            thread.join(timeout=10)
+        assert not thread.is_alive(), "Планировщик не остановлен"
+        assert scheduler.failed_cycles == 1, "Цикл с ошибкой не учтен"
+        assert os.path.exists(file_name), "Следующий цикл не опубликовал результат"
+
+    def test_refresh_times_are_staggered(self):
+        scheduler = ForecastScheduler(["A", "B", "C", "D"], interval=8)
+        scheduler._start_schedule(100.0)
+        assert sorted(scheduler._schedule) == [(108.0, 0), (110.0, 1), (112.0, 2), (114.0, 3)], (
+            "Время обновления городов не распределено по интервалу"
+        )
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM")
+    def test_sigterm_stops_gracefully(self, tmp_path):
+        file_name = str(tmp_path / "table.csv")
+        process = subprocess.Popen(
+            [sys.executable, "-c", SCHEDULER_SCRIPT, file_name],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": ROOT_DIR},
+        )
+        try:
+            wait_for(lambda: os.path.exists(file_name), timeout=30)
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0, "Планировщик завершился с ошибкой"
+        finally:
+            if process.poll() is None:
+                process.kill()
+        with open(file_name) as file:
+            assert len(list(csv.reader(file))) == 7, "Опубликованный файл поврежден"
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import sharding
+import tasks
+from calculation import worker_pool
+from sharding import ShardCoordinator, split_into_shards
+from tasks import DataCalculationTask, DataFetchingTask
+from windows import DAYTIME_WINDOWS
+
+
+@pytest.fixture()
+def spool_dir(tmp_path):
+    return str(tmp_path / "spool")
+
+
+def crash_once(marker_path):
+    """calculate_shard, процесс которого завершается при первом вызове."""
+    calculate_shard = sharding.calculate_shard
+
+    def calculate(task):
+        if not os.path.exists(marker_path):
+            open(marker_path, "w").close()
+            os._exit(1)
+        return calculate_shard(task)
+
+    return calculate
+
+
+def always_crash(task):
+    os._exit(1)
+
+
+class TestSharding:
+
+    def test_split_into_shards(self):
+        assert split_into_shards(list("abcde"), 2) == [["a", "b", "c"], ["d", "e"]], "Шарды поделены неверно"
+        assert split_into_shards(list("ab"), 5) == [["a"], ["b"]], "Пустые шарды"
+        assert split_into_shards([], 3) == [], "Шарды без городов"
+
+    def test_matches_single_process_run(self, local_weather_server, local_cities, spool_dir):
+        expected = DataCalculationTask(DataFetchingTask(local_cities).fetch_forecasts()).get_calculated_data()
+        coordinator = ShardCoordinator(local_cities, 2, spool_dir, local_workers=2, poll_interval=0.01)
+        assert coordinator.run() == expected, "Результаты шардированного запуска не совпадают"
+        assert coordinator.failed_cities == {}, "Есть незагруженные города"
+
+    def test_windows_are_passed_to_workers(self, local_weather_server, local_cities, spool_dir):
+        expected = DataCalculationTask(
+            DataFetchingTask(local_cities).fetch_forecasts(), windows=DAYTIME_WINDOWS
+        ).get_calculated_data()
+        coordinator = ShardCoordinator(
+            local_cities, 3, spool_dir, local_workers=1, windows=DAYTIME_WINDOWS, poll_interval=0.01
+        )
+        assert coordinator.run() == expected, "Агрегаты окон шардированного запуска не совпадают"
+
+    def test_shard_above_inprocess_threshold(self, local_weather_server, local_cities, spool_dir, monkeypatch):
+        expected = DataCalculationTask(DataFetchingTask(local_cities).fetch_forecasts()).get_calculated_data()
+        # воркер считает шард в своем пуле процессов; пул родителя, унаследованный через fork, не используется
+        monkeypatch.setattr(tasks, "CALCULATION_INPROCESS_THRESHOLD", 0)
+        assert worker_pool.executor is not None
+        coordinator = ShardCoordinator(local_cities, 1, spool_dir, local_workers=1, poll_interval=0.01)
+        assert coordinator.run() == expected, "Шард выше порога просчета в текущем процессе не посчитан"
+        assert coordinator.failed_cities == {}, "Есть незагруженные города"
+
+    def test_failed_cities_are_reported(self, local_weather_server, local_cities, spool_dir):
+        coordinator = ShardCoordinator([*local_cities, "UNKNOWN"], 2, spool_dir, local_workers=1, poll_interval=0.01)
+        result = coordinator.run()
+        assert [city.city_name for city in result] == local_cities, "Список городов не совпадает"
+        assert list(coordinator.failed_cities) == ["UNKNOWN"], "Отчет об ошибках не совпадает"
+
+    def test_shard_of_dead_worker_is_reassigned(self, local_weather_server, local_cities, spool_dir, monkeypatch):
+        monkeypatch.setattr(sharding, "calculate_shard", crash_once(os.path.join(os.path.dirname(spool_dir), "m")))
+        coordinator = ShardCoordinator(local_cities, 2, spool_dir, local_workers=1, poll_interval=0.01)
+        result = coordinator.run()
+        assert [city.city_name for city in result] == local_cities, "Шард потерянного воркера не посчитан"
+        assert coordinator.reassigned_shards == 1, "Шард не переназначен"
+
+    def test_shard_fails_after_max_attempts(self, local_cities, spool_dir, monkeypatch):
+        monkeypatch.setattr(sharding, "calculate_shard", always_crash)
+        coordinator = ShardCoordinator(
+            local_cities, 1, spool_dir, local_workers=1, max_attempts=2, poll_interval=0.01
+        )
+        assert coordinator.run() == [], "Результат без посчитанных шардов"
+        assert coordinator.failed_cities == {city_name: "shard failed" for city_name in local_cities}, (
+            "Города шарда не отмечены как незагруженные"
+        )
+        assert coordinator.reassigned_shards == 1, "Количество переназначений не совпадает"
+
+    def test_stale_heartbeat_is_reassigned(self, local_cities, spool_dir):
+        coordinator = ShardCoordinator(local_cities, 1, spool_dir, local_workers=0, heartbeat_timeout=5)
+        coordinator._prepare_spool()
+        claim_path = os.path.join(spool_dir, "claimed", "shard-0000.json@remote-host-1")
+        os.rename(os.path.join(spool_dir, "tasks", "shard-0000.json"), claim_path)
+
+        assert coordinator._reassign_lost_shards() == set(), "Шард с живым heartbeat отмечен как потерянный"
+        assert os.path.exists(claim_path), "Задание забрано у живого воркера"
+
+        os.utime(claim_path, (0, 0))
+        assert coordinator._reassign_lost_shards() == set(), "Шард отмечен как проваленный"
+        assert os.listdir(os.path.join(spool_dir, "tasks")) == ["shard-0000.json"], "Задание не возвращено в очередь"
+        assert coordinator.reassigned_shards == 1, "Шард не переназначен"
@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from calculation import to_payload
+from config import GOOD_WEATHER_CODE_TABLE
+from tasks import DataCalculationTask
+from tests.test_columnar import make_city_forecasts
+from windows import (
+    DAYTIME_WINDOWS,
+    WEEKDAYS,
+    HourWindow,
+    RollingWindow,
+    WeekdayWindow,
+    validate_windows,
+)
+
+WINDOWS = DAYTIME_WINDOWS + (
+    RollingWindow("rolling_2_days_morning", 2, "morning"),
+    WeekdayWindow("weekdays_evening", "evening"),
+)
+
+
+def calculate_hour_window(city_data, window):
+    """
+    Окно часов отдельным запуском, как основного окна: часы без осадков берутся
+    из него, средняя температура - сумма за часы окна включительно на их количество.
+    """
+    calc_data_service = DataCalculationTask([city_data])
+    calc_data_service.MIN_HOUR = window.min_hour
+    calc_data_service.MAX_HOUR = window.max_hour
+    days = calc_data_service._calculate_data(city_data)["days"]
+    return [
+        {"key": day["date"], "average_temp": round(average_temp, 1), "good_weather_hours": day["good_weather_hours"]}
+        for day, (_, average_temp, _) in zip(days, daily_averages(city_data, window))
+    ]
+
+
+def daily_totals(city_data, hour_window):
+    """Суммы температур и часы без осадков по дням и делитель сумм - наивный пересчет для проверки."""
+    min_hour, max_hour = (
+        (DataCalculationTask.MIN_HOUR, DataCalculationTask.MAX_HOUR)
+        if hour_window is None
+        else (hour_window.min_hour, hour_window.max_hour)
+    )
+    # основное окно делится на max_hour - min_hour, как основной результат, окна часов - на количество часов
+    hours_period = max_hour - min_hour if hour_window is None else max_hour - min_hour + 1
+    rows = []
+    for date, hours, temps, conditions in to_payload(city_data)[1]:
+        if not len(hours):
+            continue
+        in_period = [index for index, hour in enumerate(hours) if min_hour <= hour <= max_hour]
+        rows.append(
+            (
+                date,
+                sum(temps[index] for index in in_period),
+                sum(GOOD_WEATHER_CODE_TABLE[conditions[index]] for index in in_period),
+            )
+        )
+    return rows, hours_period
+
+
+def daily_averages(city_data, hour_window):
+    """Средние по дням без округления - наивный пересчет для проверки."""
+    rows, hours_period = daily_totals(city_data, hour_window)
+    return [(date, total_temp / hours_period, good_weather_hours) for date, total_temp, good_weather_hours in rows]
+
+
+class TestWindows:
+
+    def setup_method(self):
+        random.seed(1)
+        self.cities_forecasts = make_city_forecasts(50)
+        self.windows_by_name = {window.name: window for window in WINDOWS}
+
+    def test_hour_windows_match_separate_runs(self):
+        calc_data_service = DataCalculationTask(self.cities_forecasts, windows=WINDOWS)
+        for city_data in self.cities_forecasts:
+            result = calc_data_service._calculate_data(city_data)
+            plain_result = DataCalculationTask([city_data])._calculate_data(city_data)
+            assert {**result, "aggregates": {}} == plain_result, (
+                "Окна изменили результат основного окна"
+            )
+            for window in WINDOWS:
+                if isinstance(window, HourWindow):
+                    assert result["aggregates"][window.name] == calculate_hour_window(city_data, window), (
+                        f"Окно {window.name} не совпадает с отдельным просчетом"
+                    )
+
+    def test_rolling_matches_naive_recalculation(self):
+        calc_data_service = DataCalculationTask(self.cities_forecasts, windows=WINDOWS)
+        for city_data in self.cities_forecasts:
+            aggregates = calc_data_service._calculate_data(city_data)["aggregates"]
+            for name in ("rolling_3_days", "rolling_2_days_morning"):
+                window = self.windows_by_name[name]
+                daily, hours_period = daily_totals(city_data, self.windows_by_name.get(window.hour_window))
+                expected = []
+                for index in range(window.days - 1, len(daily)):
+                    chunk = daily[index - window.days + 1:index + 1]
+                    expected.append(
+                        (
+                            daily[index][0],
+                            round(sum(row[1] for row in chunk) / (hours_period * window.days), 1),
+                            round(sum(row[2] for row in chunk) / window.days, 1),
+                        )
+                    )
+                actual = [(row["key"], row["average_temp"], row["good_weather_hours"]) for row in aggregates[name]]
+                assert actual == pytest.approx(expected), f"Скользящее окно {name} посчитано неверно"
+
+    def test_weekdays_grouping(self):
+        calc_data_service = DataCalculationTask(self.cities_forecasts, windows=WINDOWS)
+        for city_data in self.cities_forecasts:
+            rows = calc_data_service._calculate_data(city_data)["aggregates"]["weekdays"]
+            keys = [row["key"] for row in rows]
+            assert keys == sorted(keys, key=WEEKDAYS.index), "Дни недели не по порядку"
+            # 2022-05-10 - вторник
+            expected_keys = {
+                WEEKDAYS[(int(date[-2:]) - 9) % 7] for date, *_ in daily_averages(city_data, None)
+            }
+            assert set(keys) == expected_keys, "Дни недели определены неверно"
+
+    def test_vectorized_matches_python(self):
+        pytest.importorskip("numpy")
+        calc_data_service = DataCalculationTask(self.cities_forecasts, windows=WINDOWS)
+        assert calc_data_service.get_calculated_data_vectorized() == calc_data_service.get_calculated_data(), (
+            "Агрегаты векторизованного просчета не совпадают"
+        )
+
+    def test_validation(self):
+        with pytest.raises(ValueError):
+            HourWindow("night", 20, 5)
+        with pytest.raises(ValueError):
+            validate_windows((HourWindow("morning", 6, 11), HourWindow("morning", 7, 11)))
+        with pytest.raises(ValueError):
+            DataCalculationTask([], windows=(RollingWindow("rolling", 3, "unknown"),))
@@ -0,0 +1,183 @@
+"""
+Дополнительные агрегаты просчета: окна часов, скользящие окна по дням
+и средние по дням недели.
+
+Все окна часов (основное MIN_HOUR..MAX_HOUR и HourWindow) считаются за один
+проход по часам дня, скользящие окна и дни недели собираются из результатов
+по дням без повторного прохода по часам. Результат по городу - словарь
+aggregates: название окна -> строки {"key", "average_temp", "good_weather_hours"}.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from records import DayResult
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+@dataclass(frozen=True)
+class HourWindow:
+    """Окно часов min_hour..max_hour: средняя температура и часы без осадков по дням."""
+
+    name: str
+    min_hour: int
+    max_hour: int
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.min_hour < self.max_hour <= 23:
+            raise ValueError(f"Invalid hour window {self.min_hour}..{self.max_hour}")
+
+
+@dataclass(frozen=True)
+class RollingWindow:
+    """
+    Скользящее среднее за days дней с данными по окну часов hour_window
+    (None - основное окно). Ключ строки - последний день окна.
+    """
+
+    name: str
+    days: int
+    hour_window: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.days < 1:
+            raise ValueError(f"Invalid rolling window size {self.days}")
+
+
+@dataclass(frozen=True)
+class WeekdayWindow:
+    """Средние по дням недели по окну часов hour_window (None - основное окно)."""
+
+    name: str
+    hour_window: Optional[str] = None
+
+
+WindowSpec = Union[HourWindow, RollingWindow, WeekdayWindow]
+
+# утро, день и вечер - пример набора окон для forecast_weather(windows=...)
+DAYTIME_WINDOWS: Tuple[WindowSpec, ...] = (
+    HourWindow("morning", 6, 11),
+    HourWindow("afternoon", 12, 17),
+    HourWindow("evening", 18, 23),
+    RollingWindow("rolling_3_days", 3),
+    WeekdayWindow("weekdays"),
+)
+
+
+def hour_bounds(
+    windows: Sequence[WindowSpec], min_hour: int, max_hour: int
+) -> List[Tuple[int, int]]:
+    """Границы всех окон часов: основное окно первым, затем HourWindow по порядку."""
+    bounds = [(min_hour, max_hour)]
+    bounds.extend(
+        (window.min_hour, window.max_hour)
+        for window in windows
+        if isinstance(window, HourWindow)
+    )
+    return bounds
+
+
+def validate_windows(windows: Sequence[WindowSpec]) -> None:
+    """Проверка уникальности названий и ссылок на окна часов."""
+    names = [window.name for window in windows]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Window names must be unique: {names}")
+    hour_windows = {window.name for window in windows if isinstance(window, HourWindow)}
+    for window in windows:
+        reference = getattr(window, "hour_window", None)
+        if reference is not None and reference not in hour_windows:
+            raise ValueError(f"Window {window.name!r} refers to unknown hour window {reference!r}")
+
+
+def build_aggregates(
+    dates: Sequence[str],
+    window_day_results: Sequence[Sequence[DayResult]],
+    windows: Sequence[WindowSpec],
+    bounds: Sequence[Tuple[int, int]],
+) -> Dict[str, List[Dict]]:
+    """
+    Сборка агрегатов по городу.
+    window_day_results[i] - результаты по дням для окна часов bounds[i].
+    Дни без данных по времени в строки не попадают, как и в основном результате.
+    Часы окна min_hour..max_hour считаются включительно: сумма температур HourWindow
+    делится на max_hour - min_hour + 1. Основное окно (bounds[0]) сохраняет делитель
+    max_hour - min_hour основного результата, чтобы агрегаты по нему совпадали с ним.
+    """
+    hour_window_indexes: Dict[Optional[str], int] = {None: 0}
+    for window in windows:
+        if isinstance(window, HourWindow):
+            hour_window_indexes[window.name] = len(hour_window_indexes)
+
+    # итоги по дням для каждого окна часов: [(дата, сумма температур, часы без осадков)]
+    # и делитель суммы температур; целые суммы складываются без погрешности
+    daily: List[List[Tuple[str, int, int]]] = []
+    hours_periods: List[int] = []
+    for index, ((min_hour, max_hour), day_results) in enumerate(zip(bounds, window_day_results)):
+        hours_periods.append(max_hour - min_hour if index == 0 else max_hour - min_hour + 1)
+        daily.append(
+            [
+                (date, day_result[0], day_result[1])
+                for date, day_result in zip(dates, day_results)
+                if day_result is not None
+            ]
+        )
+
+    aggregates = {}
+    for window in windows:
+        if isinstance(window, HourWindow):
+            index = hour_window_indexes[window.name]
+            aggregates[window.name] = [
+                _aggregate_row(date, total_temp / hours_periods[index], good_weather_hours)
+                for date, total_temp, good_weather_hours in daily[index]
+            ]
+        else:
+            index = hour_window_indexes[window.hour_window]
+            if isinstance(window, RollingWindow):
+                aggregates[window.name] = _rolling_rows(daily[index], hours_periods[index], window.days)
+            else:
+                aggregates[window.name] = _weekday_rows(daily[index], hours_periods[index])
+    return aggregates
+
+
+def _aggregate_row(key: str, average_temp: float, good_weather_hours: float) -> Dict:
+    return {
+        "key": key,
+        "average_temp": round(average_temp, 1),
+        "good_weather_hours": round(good_weather_hours, 1),
+    }
+
+
+def _rolling_rows(daily: Sequence[Tuple[str, int, int]], hours_period: int, days: int) -> List[Dict]:
+    """
+    Скользящее среднее. Суммы окна обновляются на каждом шаге: добавляется
+    новый день и вычитается ушедший. Суммы целые, поэтому не накапливают
+    погрешность; у всех дней окна один делитель, деление - один раз на строку.
+    """
+    rows = []
+    temp_sum = hours_sum = 0
+    for index, (date, total_temp, good_weather_hours) in enumerate(daily):
+        temp_sum += total_temp
+        hours_sum += good_weather_hours
+        if index >= days:
+            _, dropped_temp, dropped_hours = daily[index - days]
+            temp_sum -= dropped_temp
+            hours_sum -= dropped_hours
+        if index >= days - 1:
+            rows.append(_aggregate_row(date, temp_sum / (hours_period * days), hours_sum / days))
+    return rows
+
+
+def _weekday_rows(daily: Sequence[Tuple[str, int, int]], hours_period: int) -> List[Dict]:
+    """Средние по дням недели, строки в порядке понедельник..воскресенье."""
+    sums: Dict[int, List[int]] = {}
+    for date, total_temp, good_weather_hours in daily:
+        weekday = datetime.date.fromisoformat(date).weekday()
+        weekday_sums = sums.setdefault(weekday, [0, 0, 0])
+        weekday_sums[0] += total_temp
+        weekday_sums[1] += good_weather_hours
+        weekday_sums[2] += 1
+    return [
+        _aggregate_row(WEEKDAYS[weekday], temp_sum / (hours_period * count), hours_sum / count)
+        for weekday, (temp_sum, hours_sum, count) in sorted(sums.items())
+    ]